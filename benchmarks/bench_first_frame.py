@@ -0,0 +1,167 @@
+"""
+去首帧流水线基准测试
+
+在本地用 ffmpeg testsrc2 生成合成测试视频（无需网络），
+按不同的编码预设、处理方式（智能剪切 / 整段编码）与并行数运行 VideoFirstFrameRemovalThread，
+输出墙钟时间、子进程 CPU 时间、吞吐（帧/秒）与输出文件大小。
+
+用法：
+    python benchmarks/bench_first_frame.py
+    python benchmarks/bench_first_frame.py --resolutions 1280x720,1920x1080 --durations 10,60 \
+        --presets ultrafast,veryfast,medium --parallelism 1,4 --clips 4 --json result.json
+"""
+
+import argparse
+import atexit
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# 使用临时数据目录，不创建或改动用户的数据库与日志（须在导入项目模块之前设置）
+if not os.environ.get('SORA2_DATA_DIR'):
+    os.environ['SORA2_DATA_DIR'] = tempfile.mkdtemp(prefix='sora2_bench_data_')
+    atexit.register(shutil.rmtree, os.environ['SORA2_DATA_DIR'], True)
+
+from PyQt5.QtCore import QCoreApplication  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from threads.video_first_frame_removal_thread import VideoFirstFrameRemovalThread  # noqa: E402
+from utils.ffmpeg_jobs import run_ffmpeg  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows 无 resource 模块，不统计 CPU 时间
+    resource = None
+
+FPS = 30
+GOP_SECONDS = 2
+
+
+def _csv(value: str, cast=str):
+    return [cast(v.strip()) for v in value.split(',') if v.strip()]
+
+
+def _children_cpu() -> float:
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def generate_clip(path: Path, resolution: str, duration: int):
+    """生成带音轨的合成测试视频（每 2 秒一个关键帧，便于智能剪切）"""
+    if path.exists():
+        return
+    run_ffmpeg([
+        "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={resolution}:rate={FPS}",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=44100",
+        "-t", str(duration),
+        "-c:v", "libx264", "-preset", "ultrafast", "-g", str(FPS * GOP_SECONDS),
+        "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest",
+        str(path)
+    ])
+
+
+def run_case(sources, work_dir: Path, preset: str, smart_cut: bool, parallelism: int) -> dict:
+    """复制测试视频后运行一次去首帧批处理（引擎会覆盖输入文件）"""
+    if work_dir.exists():
+        shutil.rmtree(work_dir)
+    work_dir.mkdir(parents=True)
+    files = []
+    for i, src in enumerate(sources):
+        dst = work_dir / f"{i}_{src.name}"
+        shutil.copyfile(src, dst)
+        files.append(str(dst))
+
+    thread = VideoFirstFrameRemovalThread(files, parallelism, preset=preset, smart_cut=smart_cut)
+    cpu_before = _children_cpu()
+    started = time.perf_counter()
+    thread.start()
+    thread.wait()
+    wall = time.perf_counter() - started
+    cpu = _children_cpu() - cpu_before
+
+    ok = [m for m in thread.modes if m]
+    return {
+        'wall_s': round(wall, 2),
+        'cpu_s': round(cpu, 2) if resource else None,
+        'succeeded': len(ok),
+        'smart': ok.count('smart'),
+        'output_bytes': sum(os.path.getsize(f) for f in files),
+    }
+
+
+_app = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='去首帧流水线基准测试（离线）')
+    parser.add_argument('--resolutions', default='640x360,1280x720', help='逗号分隔，如 1280x720,1920x1080')
+    parser.add_argument('--durations', default='10,30', help='视频时长（秒），逗号分隔')
+    parser.add_argument('--presets', default='ultrafast,veryfast,medium', help='libx264 预设，逗号分隔')
+    parser.add_argument('--parallelism', default=f"1,{max(1, (os.cpu_count() or 2) // 2)}",
+                        help='并行任务数，逗号分隔')
+    parser.add_argument('--modes', default='smart,encode', help='smart=智能剪切，encode=整段编码')
+    parser.add_argument('--clips', type=int, default=2, help='每组测试的视频数量')
+    parser.add_argument('--work-dir', default=None, help='测试视频目录（默认系统临时目录，可复用）')
+    parser.add_argument('--json', default=None, help='同时把结果写入 JSON 文件')
+    args = parser.parse_args(argv)
+
+    # 只保留警告以上的日志，避免逐文件日志淹没结果表
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+
+    # 线程信号需要 QCoreApplication，保存在模块变量中直到退出
+    global _app
+    _app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    root = Path(args.work_dir or Path(tempfile.gettempdir()) / 'sora2_bench_first_frame')
+    clip_dir = root / 'clips'
+    clip_dir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    header = (f"{'分辨率':>10} {'时长':>5} {'方式':>7} {'预设':>10} {'并行':>4} "
+              f"{'墙钟(s)':>8} {'CPU(s)':>8} {'帧/秒':>8} {'输出(MB)':>9} {'成功':>5}")
+    print(header)
+    print('-' * len(header))
+    for resolution in _csv(args.resolutions):
+        for duration in _csv(args.durations, int):
+            source = clip_dir / f"{resolution}_{duration}s.mp4"
+            generate_clip(source, resolution, duration)
+            sources = [source] * args.clips
+            # 每个输入视频去首帧后的输出帧数
+            frames = (duration * FPS - 1) * args.clips
+            for mode in _csv(args.modes):
+                # 智能剪切只重新编码第一个 GOP，预设的影响很小，只测默认预设
+                presets = ['veryfast'] if mode == 'smart' else _csv(args.presets)
+                for preset in presets:
+                    for parallelism in _csv(args.parallelism, int):
+                        case = run_case(sources, root / 'run', preset, mode == 'smart', parallelism)
+                        case.update({
+                            'resolution': resolution, 'duration_s': duration, 'mode': mode,
+                            'preset': preset, 'parallelism': parallelism, 'clips': args.clips,
+                            'frames_per_s': round(frames / case['wall_s'], 1) if case['wall_s'] else None,
+                        })
+                        results.append(case)
+                        cpu = f"{case['cpu_s']:8.2f}" if case['cpu_s'] is not None else f"{'-':>8}"
+                        print(f"{resolution:>10} {duration:>5} {mode:>7} {preset:>10} {parallelism:>4} "
+                              f"{case['wall_s']:8.2f} {cpu} {case['frames_per_s']:8.1f} "
+                              f"{case['output_bytes'] / 1024 / 1024:9.2f} {case['succeeded']:>3}/{args.clips}",
+                              flush=True)
+
+    shutil.rmtree(root / 'run', ignore_errors=True)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""
+高清放大调度基准测试
+
+在子进程中启动若干台本地 ComfyUI 替身服务器（benchmarks/fake_comfyui.py，无需 GPU），
+按界面的方式用 UpscaleScheduler 分配任务、VideoUpscaleThread 上传/提交/等待/下载，
+定时用 UpscaleProbeThread 刷新服务器负载，输出：
+
+- 墙钟时间与吞吐（任务/秒），以及相对理想并行时间的效率
+- 单个任务从提交到结束的延迟 P50 / P95 / P99 / 最大值
+- 调度器本身的耗时（next_assignments 与完成回调）
+- 本进程的峰值内存增量与峰值线程数，失败与重试次数
+
+用法：
+    python benchmarks/bench_upscale.py
+    python benchmarks/bench_upscale.py --servers 1,4,16 --jobs 500 --latency 0.2 --speeds 1,2 \
+        --failure-rate 0.05 --jobs-per-server 2 --json result.json
+"""
+
+import argparse
+import atexit
+import json
+import os
+import random
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# 使用临时数据目录，不创建或改动用户的数据库与日志（须在导入项目模块之前设置）
+if not os.environ.get('SORA2_DATA_DIR'):
+    os.environ['SORA2_DATA_DIR'] = tempfile.mkdtemp(prefix='sora2_bench_data_')
+    atexit.register(shutil.rmtree, os.environ['SORA2_DATA_DIR'], True)
+
+from PyQt5.QtCore import QCoreApplication, QEventLoop, QTimer  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from threads.upscale_probe_thread import UpscaleProbeThread  # noqa: E402
+from threads.video_upscale_thread import VideoUpscaleThread  # noqa: E402
+from utils.upscale_scheduler import UpscaleJob, UpscaleScheduler, estimate_work  # noqa: E402
+from utils.workflow_templates import workflow_registry  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows 无 resource 模块
+    resource = None
+
+FAKE_SERVER = Path(__file__).resolve().parent / 'fake_comfyui.py'
+# 内存与线程数的采样间隔（毫秒）
+SAMPLE_INTERVAL_MS = 100
+
+
+def _csv(value: str, cast=str):
+    return [cast(v.strip()) for v in value.split(',') if v.strip()]
+
+
+def _percentile(values, q: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def _process_sample():
+    """当前进程的 (常驻内存字节数, 线程数)；无法读取 /proc 时退回峰值内存，线程数为 Python 线程数"""
+    try:
+        with open('/proc/self/status', encoding='ascii') as f:
+            status = dict(line.split(':', 1) for line in f if ':' in line)
+        return int(status['VmRSS'].split()[0]) * 1024, int(status['Threads'])
+    except (OSError, KeyError, ValueError):
+        rss = 0
+        if resource is not None:
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            rss *= 1 if sys.platform == 'darwin' else 1024
+        return rss, threading.active_count()
+
+
+def generate_inputs(folder: Path, count: int, min_mb: float, max_mb: float, seed: int):
+    """生成大小不同的输入文件（替身服务器不解析视频内容，工作量按文件大小估算）"""
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        size = int(rng.uniform(min_mb, max_mb) * 1024 * 1024)
+        path = folder / f"input_{i:02d}_{size}.mp4"
+        if not path.exists():
+            with open(path, 'wb') as f:
+                f.write(os.urandom(size))
+        paths.append(path)
+    return paths
+
+
+def start_fake_servers(count: int, args):
+    """在子进程中启动替身服务器（不计入本进程的内存与 CPU），返回 (进程, URL列表)"""
+    cmd = [sys.executable, str(FAKE_SERVER), '--servers', str(count), '--port', '0',
+           '--latency', str(args.latency), '--seconds-per-mb', str(args.seconds_per_mb),
+           '--jitter', str(args.jitter), '--failure-rate', str(args.failure_rate), '--seed', str(args.seed)]
+    if args.speeds:
+        cmd += ['--speeds', args.speeds]
+    if args.output_size is not None:
+        cmd += ['--output-size', str(args.output_size)]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    urls = []
+    while len(urls) < count:
+        line = proc.stdout.readline()
+        if not line:
+            proc.kill()
+            raise RuntimeError("替身服务器启动失败")
+        if re.match(r'https?://', line.strip()):
+            urls.append(line.strip())
+    return proc, urls
+
+
+def ideal_seconds(sizes, args, servers: int) -> float:
+    """所有服务器都不空闲时的理想完成时间（不含上传/下载）"""
+    speeds = _csv(args.speeds, float) or [1.0]
+    total_speed = sum(speeds[i % len(speeds)] for i in range(servers))
+    work = sum(args.latency + args.seconds_per_mb * size / 1024 / 1024 for size in sizes)
+    return work / total_speed
+
+
+def run_case(urls, inputs, works, args, out_dir: Path) -> dict:
+    """按界面的调度流程处理一批任务"""
+    template = workflow_registry.get()
+    jobs = [UpscaleJob(i, str(inputs[i % len(inputs)]), works[i % len(inputs)]) for i in range(args.jobs)]
+    scheduler = UpscaleScheduler([{'url': url, 'name': f"s{i}"} for i, url in enumerate(urls)], jobs,
+                                 max_in_flight=args.jobs_per_server)
+    loop = QEventLoop()
+    active = []
+    started_at = {}
+    latencies = []
+    stats = {'failed': 0, 'retried': 0, 'schedule_s': 0.0, 'peak_rss': 0, 'peak_threads': 0}
+    probe = {'thread': None}
+
+    def sample():
+        rss, threads = _process_sample()
+        stats['peak_rss'] = max(stats['peak_rss'], rss)
+        stats['peak_threads'] = max(stats['peak_threads'], threads)
+
+    def dispatch():
+        t0 = time.perf_counter()
+        assignments = scheduler.next_assignments()
+        stats['schedule_s'] += time.perf_counter() - t0
+        for job, server in assignments:
+            output = out_dir / f"{job.index:05d}-hd.mp4"
+            t = VideoUpscaleThread(job.path, str(output), 'tiny', 2, server.url, template=template)
+            t.finished.connect(lambda success, message, _, j=job, thread=t: on_finished(j, success, message, thread))
+            active.append(t)
+            started_at[job.key] = time.monotonic()
+            t.start()
+        if not scheduler.has_work():
+            loop.quit()
+
+    def on_finished(job, success, message, thread):
+        latencies.append(time.monotonic() - started_at.pop(job.key))
+        active.remove(thread)
+        t0 = time.perf_counter()
+        requeued = scheduler.job_finished(job.key, success, thread.queued_at, thread.execution_seconds,
+                                          server_fault=thread.server_fault, retryable=thread.retryable,
+                                          error=message)
+        stats['schedule_s'] += time.perf_counter() - t0
+        if requeued:
+            stats['retried'] += 1
+        elif not success:
+            stats['failed'] += 1
+        dispatch()
+
+    def refresh():
+        if probe['thread'] and probe['thread'].isRunning():
+            return
+        probe['thread'] = UpscaleProbeThread(urls)
+        probe['thread'].probed.connect(lambda works_, loads, segments: (scheduler.update_loads(loads), dispatch()))
+        probe['thread'].start()
+
+    sampler = QTimer()
+    sampler.setInterval(SAMPLE_INTERVAL_MS)
+    sampler.timeout.connect(sample)
+    refresher = QTimer()
+    refresher.setInterval(args.refresh_ms)
+    refresher.timeout.connect(refresh)
+
+    baseline_rss, _ = _process_sample()
+    started = time.perf_counter()
+    sampler.start()
+    refresher.start()
+    refresh()  # 与界面一致：先探测服务器负载，再开始分配
+    loop.exec_()
+    wall = time.perf_counter() - started
+    sampler.stop()
+    refresher.stop()
+    sample()
+    if probe['thread']:
+        probe['thread'].wait()
+
+    succeeded = sum(1 for p in out_dir.iterdir() if p.name.endswith('-hd.mp4'))
+    return {
+        'wall_s': round(wall, 2),
+        'jobs_per_s': round(args.jobs / wall, 2) if wall else None,
+        'succeeded': succeeded,
+        'failed': stats['failed'],
+        'retried': stats['retried'],
+        'p50_s': round(_percentile(latencies, 0.50), 3),
+        'p95_s': round(_percentile(latencies, 0.95), 3),
+        'p99_s': round(_percentile(latencies, 0.99), 3),
+        'max_s': round(max(latencies), 3),
+        'mean_s': round(statistics.mean(latencies), 3),
+        'schedule_ms': round(stats['schedule_s'] * 1000, 1),
+        'peak_rss_delta_mb': round(max(0, stats['peak_rss'] - baseline_rss) / 1024 / 1024, 1),
+        'peak_threads': stats['peak_threads'],
+    }
+
+
+_app = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='高清放大调度基准测试（本地替身服务器，无需 GPU）')
+    parser.add_argument('--servers', default='1,2,4,8,16', help='服务器数量，逗号分隔')
+    parser.add_argument('--jobs', type=int, default=200, help='每组测试的任务数')
+    parser.add_argument('--jobs-per-server', type=int, default=2, help='每台服务器同时提交的任务数')
+    parser.add_argument('--latency', type=float, default=0.1, help='替身服务器每个任务的基础执行秒数')
+    parser.add_argument('--seconds-per-mb', type=float, default=0.1, help='按上传大小增加的执行秒数')
+    parser.add_argument('--speeds', default='', help='各服务器的速度倍数，逗号分隔，如 1,2（模拟不同显卡）')
+    parser.add_argument('--jitter', type=float, default=0.1, help='执行时间随机浮动比例')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='执行失败的概率（失败任务会换服务器重试）')
+    parser.add_argument('--output-size', type=int, default=None, help='输出文件字节数（默认与输入相同）')
+    parser.add_argument('--inputs', type=int, default=8, help='不同输入文件的数量（任务循环使用）')
+    parser.add_argument('--min-mb', type=float, default=0.25, help='输入文件最小大小（MB）')
+    parser.add_argument('--max-mb', type=float, default=1.0, help='输入文件最大大小（MB）')
+    parser.add_argument('--refresh-ms', type=int, default=2000, help='刷新服务器负载的间隔（毫秒）')
+    parser.add_argument('--seed', type=int, default=1, help='随机种子')
+    parser.add_argument('--work-dir', default=None, help='测试文件目录（默认系统临时目录，可复用）')
+    parser.add_argument('--json', default=None, help='同时把结果写入 JSON 文件')
+    args = parser.parse_args(argv)
+
+    # 只保留警告以上的日志，避免逐任务日志淹没结果表
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+
+    # 线程信号需要 QCoreApplication，保存在模块变量中直到退出
+    global _app
+    _app = QCoreApplication.instance() or QCoreApplication(sys.argv[:1])
+    root = Path(args.work_dir or Path(tempfile.gettempdir()) / 'sora2_bench_upscale')
+    input_dir = root / 'inputs'
+    input_dir.mkdir(parents=True, exist_ok=True)
+    inputs = generate_inputs(input_dir, args.inputs, args.min_mb, args.max_mb, args.seed)
+    works = [estimate_work(str(p), 2) for p in inputs]
+    sizes = [inputs[i % len(inputs)].stat().st_size for i in range(args.jobs)]
+
+    results = []
+    header = (f"{'服务器':>6} {'任务':>5} {'墙钟(s)':>8} {'任务/秒':>8} {'效率':>6} {'P50(s)':>7} {'P95(s)':>7} "
+              f"{'P99(s)':>7} {'最大(s)':>7} {'调度(ms)':>8} {'内存(MB)':>8} {'线程':>5} {'成功':>9} {'重试':>5}")
+    print(header)
+    print('-' * len(header))
+    for count in _csv(args.servers, int):
+        proc, urls = start_fake_servers(count, args)
+        out_dir = root / 'run'
+        shutil.rmtree(out_dir, ignore_errors=True)
+        out_dir.mkdir(parents=True)
+        try:
+            case = run_case(urls, inputs, works, args, out_dir)
+        finally:
+            proc.kill()
+            proc.wait()
+        ideal = ideal_seconds(sizes, args, count)
+        case.update({
+            'servers': count, 'jobs': args.jobs, 'jobs_per_server': args.jobs_per_server,
+            'ideal_s': round(ideal, 2),
+            'efficiency': round(ideal / case['wall_s'], 3) if case['wall_s'] else None,
+        })
+        results.append(case)
+        print(f"{count:>6} {args.jobs:>5} {case['wall_s']:8.2f} {case['jobs_per_s']:8.2f} "
+              f"{case['efficiency'] * 100:5.0f}% {case['p50_s']:7.2f} {case['p95_s']:7.2f} {case['p99_s']:7.2f} "
+              f"{case['max_s']:7.2f} {case['schedule_ms']:8.1f} {case['peak_rss_delta_mb']:8.1f} "
+              f"{case['peak_threads']:>5} {case['succeeded']:>4}/{args.jobs:<4} {case['retried']:>5}", flush=True)
+
+    shutil.rmtree(root / 'run', ignore_errors=True)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,498 @@
+"""
+本地 ComfyUI 替身服务器（用于高清放大的联调与基准测试）
+
+不需要 GPU：基于标准库 http.server 实现高清放大用到的接口，
+任务按配置的耗时“执行”，并像真实服务器一样推送 websocket 事件：
+
+- POST /upload/image        上传视频（同名文件自动改名）
+- POST /prompt              提交工作流，返回 prompt_id
+- GET  /history[/{id}]      执行记录（含 execution_start / execution_success 时间戳）
+- GET  /view                下载输出文件
+- GET  /queue, POST /queue  查询队列 / 删除排队中的任务
+- POST /interrupt           中断正在执行的任务
+- GET  /system_stats        显存信息
+- GET  /ws?clientId=...     执行事件（status / execution_start / executing / progress / executed / ...）
+
+每个任务的耗时 = (latency + seconds_per_mb × 上传大小MB) / speed，并按 jitter 随机浮动；
+failure_rate 为执行失败（execution_error）的概率；output_size 为输出文件字节数，
+为 None 时原样返回上传的视频（分段拼接等需要真实视频的场景）。
+
+用法（启动 4 台服务器后，在“服务器配置”中添加 http://127.0.0.1:8188 ~ 8191）：
+    python benchmarks/fake_comfyui.py --servers 4 --port 8188 --latency 5 --failure-rate 0.1
+"""
+
+import argparse
+import base64
+import dataclasses
+import hashlib
+import json
+import os
+import random
+import socket
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+# 下载输出文件时每次写入的字节数
+VIEW_CHUNK = 256 * 1024
+
+
+@dataclasses.dataclass
+class FakeConfig:
+    latency: float = 2.0  # 每个任务的基础执行秒数
+    seconds_per_mb: float = 0.0  # 按上传大小增加的执行秒数
+    speed: float = 1.0  # 服务器速度倍数（模拟不同显卡）
+    jitter: float = 0.0  # 执行时间随机浮动比例，如 0.2 表示 ±20%
+    failure_rate: float = 0.0  # 执行失败的概率
+    output_size: Optional[int] = None  # 输出文件字节数，None 时原样返回上传的视频
+    steps: int = 10  # 每个任务推送的 progress 事件数
+    workers: int = 1  # 同时执行的任务数（ComfyUI 一次只执行一个）
+    vram_total: int = 24 * 1024 ** 3
+    seed: Optional[int] = None
+
+
+@dataclasses.dataclass
+class _Prompt:
+    prompt_id: str
+    number: int
+    workflow: dict
+    client_id: Optional[str]
+    interrupted: bool = False
+
+
+class FakeComfyUI:
+    """一台模拟的 ComfyUI 服务器（在后台线程中运行）"""
+
+    def __init__(self, port: int = 0, config: Optional[FakeConfig] = None, host: str = "127.0.0.1"):
+        self.config = config or FakeConfig()
+        self._random = random.Random(self.config.seed)
+        self._lock = threading.Condition()
+        self._uploads: Dict[str, object] = {}  # 文件名 -> 内容（bytes）或大小（不保存内容时）
+        self._outputs: Dict[str, object] = {}
+        self._history: Dict[str, dict] = {}
+        self._pending: List[_Prompt] = []
+        self._running: Dict[str, _Prompt] = {}
+        self._clients: Dict[str, '_WebSocket'] = {}
+        self._number = 0
+        self._stopped = False
+        self.stats = {'uploads': 0, 'prompts': 0, 'completed': 0, 'failed': 0, 'interrupted': 0, 'deleted': 0}
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._threads = [threading.Thread(target=self._httpd.serve_forever, daemon=True, name=f"fake-comfy-{self.port}")]
+        self._threads += [
+            threading.Thread(target=self._work, daemon=True, name=f"fake-comfy-{self.port}-gpu{i}")
+            for i in range(max(1, self.config.workers))
+        ]
+
+    @property
+    def port(self) -> int:
+        return self._httpd.server_address[1]
+
+    @property
+    def url(self) -> str:
+        return f"http://{self._httpd.server_address[0]}:{self.port}"
+
+    def start(self) -> 'FakeComfyUI':
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        """停止服务器并断开所有 websocket（模拟服务器宕机）"""
+        with self._lock:
+            self._stopped = True
+            self._lock.notify_all()
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        for client in list(self._clients.values()):
+            client.close()
+        self._clients.clear()
+
+    # ---- 文件 ----
+
+    def upload(self, name: str, data: bytes) -> str:
+        with self._lock:
+            stem, ext = os.path.splitext(name)
+            counter = 1
+            while name in self._uploads:
+                name = f"{stem} ({counter}){ext}"
+                counter += 1
+            # 指定输出大小时不需要保存上传内容，只记录大小
+            self._uploads[name] = data if self.config.output_size is None else len(data)
+            self.stats['uploads'] += 1
+        return name
+
+    def output(self, name: str):
+        with self._lock:
+            return self._outputs.get(name)
+
+    # ---- 队列 ----
+
+    def queue_prompt(self, workflow: dict, client_id: Optional[str]) -> dict:
+        with self._lock:
+            self._number += 1
+            prompt = _Prompt(uuid.uuid4().hex, self._number, workflow, client_id)
+            self._pending.append(prompt)
+            self.stats['prompts'] += 1
+            self._lock.notify()
+        self._broadcast_status()
+        return {"prompt_id": prompt.prompt_id, "number": prompt.number, "node_errors": {}}
+
+    def queue_state(self) -> dict:
+        with self._lock:
+            def item(p):
+                return [p.number, p.prompt_id, p.workflow, {"client_id": p.client_id}, []]
+            return {
+                "queue_running": [item(p) for p in self._running.values()],
+                "queue_pending": [item(p) for p in self._pending],
+            }
+
+    def delete(self, prompt_ids: List[str]):
+        with self._lock:
+            before = len(self._pending)
+            self._pending = [p for p in self._pending if p.prompt_id not in prompt_ids]
+            self.stats['deleted'] += before - len(self._pending)
+        self._broadcast_status()
+
+    def interrupt(self, prompt_id: Optional[str] = None):
+        """中断正在执行的任务（未指定 prompt_id 时中断全部）"""
+        with self._lock:
+            for prompt in self._running.values():
+                if prompt_id is None or prompt.prompt_id == prompt_id:
+                    prompt.interrupted = True
+            self._lock.notify_all()
+
+    def history(self, prompt_id: Optional[str] = None) -> dict:
+        with self._lock:
+            if prompt_id is None:
+                return dict(self._history)
+            entry = self._history.get(prompt_id)
+            return {prompt_id: entry} if entry else {}
+
+    # ---- 执行 ----
+
+    def _work(self):
+        while True:
+            with self._lock:
+                while not self._pending and not self._stopped:
+                    self._lock.wait()
+                if self._stopped:
+                    return
+                prompt = self._pending.pop(0)
+                self._running[prompt.prompt_id] = prompt
+            try:
+                self._execute(prompt)
+            finally:
+                with self._lock:
+                    self._running.pop(prompt.prompt_id, None)
+                self._broadcast_status()
+
+    def _duration(self, source) -> float:
+        size = len(source) if isinstance(source, bytes) else (source or 0)
+        seconds = self.config.latency + self.config.seconds_per_mb * size / 1024 / 1024
+        if self.config.jitter:
+            seconds *= 1 + self._random.uniform(-self.config.jitter, self.config.jitter)
+        return max(0.0, seconds / max(self.config.speed, 1e-6))
+
+    def _execute(self, prompt: _Prompt):
+        pid, cid = prompt.prompt_id, prompt.client_id
+        # 输入视频为值等于已上传文件名的节点输入，输出节点为带 filename_prefix 输入的节点
+        with self._lock:
+            source = next((self._uploads[v] for node in prompt.workflow.values()
+                           for v in (node.get("inputs") or {}).values()
+                           if isinstance(v, str) and v in self._uploads), None)
+        output_node, prefix = next(((node_id, node["inputs"]["filename_prefix"])
+                                    for node_id, node in prompt.workflow.items()
+                                    if "filename_prefix" in (node.get("inputs") or {})), (None, "ComfyUI"))
+        duration = self._duration(source)
+        failed = self._random.random() < self.config.failure_rate
+
+        started = _now_ms()
+        messages = [["execution_start", {"prompt_id": pid, "timestamp": started}]]
+        self._send(cid, "execution_start", {"prompt_id": pid, "timestamp": started})
+        work_node = next((n for n in prompt.workflow if n != output_node), output_node)
+        self._send(cid, "executing", {"node": work_node, "prompt_id": pid})
+
+        steps = max(1, self.config.steps)
+        for step in range(steps):
+            with self._lock:
+                self._lock.wait_for(lambda: prompt.interrupted or self._stopped, timeout=duration / steps)
+                if prompt.interrupted or self._stopped:
+                    break
+            self._send(cid, "progress", {"value": step + 1, "max": steps, "prompt_id": pid, "node": work_node})
+        if self._stopped:
+            return
+
+        if prompt.interrupted:
+            data = {"prompt_id": pid, "node_id": work_node, "node_type": "Upscale", "executed": [],
+                    "timestamp": _now_ms()}
+            self._finish(pid, "error", messages + [["execution_interrupted", data]], {})
+            self.stats['interrupted'] += 1
+            self._send(cid, "execution_interrupted", data)
+            return
+        if failed:
+            data = {"prompt_id": pid, "node_id": work_node, "node_type": "Upscale",
+                    "exception_message": "CUDA out of memory (simulated)", "timestamp": _now_ms()}
+            self._finish(pid, "error", messages + [["execution_error", data]], {})
+            self.stats['failed'] += 1
+            self._send(cid, "execution_error", data)
+            return
+
+        name = f"{prefix}_00001.mp4"
+        with self._lock:
+            self._outputs[name] = source if self.config.output_size is None else self.config.output_size
+        output = {"gifs": [{"filename": name, "subfolder": "", "type": "output", "format": "video/h264-mp4"}]}
+        finished = _now_ms()
+        # 与 ComfyUI 一致：写入 history 后再推送结束事件，客户端收到事件后即可读取结果
+        self._finish(pid, "success", messages + [["execution_success", {"prompt_id": pid, "timestamp": finished}]],
+                     {output_node: output} if output_node else {})
+        self.stats['completed'] += 1
+        if output_node:
+            self._send(cid, "executed", {"node": output_node, "output": output, "prompt_id": pid})
+        self._send(cid, "executing", {"node": None, "prompt_id": pid})
+        self._send(cid, "execution_success", {"prompt_id": pid, "timestamp": finished})
+
+    def _finish(self, prompt_id: str, status: str, messages: list, outputs: dict):
+        with self._lock:
+            self._history[prompt_id] = {
+                "outputs": outputs,
+                "status": {"status_str": status, "completed": status == "success", "messages": messages},
+            }
+
+    # ---- websocket ----
+
+    def _send(self, client_id: Optional[str], msg_type: str, data: dict):
+        client = self._clients.get(client_id) if client_id else None
+        if client and not client.send_json({"type": msg_type, "data": data}):
+            self._clients.pop(client_id, None)
+
+    def _broadcast_status(self):
+        with self._lock:
+            remaining = len(self._pending) + len(self._running)
+        for client_id in list(self._clients):
+            self._send(client_id, "status", {"status": {"exec_info": {"queue_remaining": remaining}}})
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+class _WebSocket:
+    """服务器端 websocket（只发送文本帧，接收并丢弃客户端消息）"""
+
+    def __init__(self, conn: socket.socket):
+        self.conn = conn
+        self._lock = threading.Lock()
+
+    def send_json(self, message: dict) -> bool:
+        return self._send_frame(0x1, json.dumps(message).encode('utf-8'))
+
+    def _send_frame(self, opcode: int, payload: bytes) -> bool:
+        n = len(payload)
+        if n < 126:
+            header = struct.pack('!BB', 0x80 | opcode, n)
+        elif n < 65536:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, n)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, n)
+        try:
+            with self._lock:
+                self.conn.sendall(header + payload)
+            return True
+        except OSError:
+            return False
+
+    def _recv_exact(self, n: int) -> bytes:
+        data = b''
+        while len(data) < n:
+            chunk = self.conn.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("websocket closed")
+            data += chunk
+        return data
+
+    def serve(self):
+        """读取客户端帧直到连接关闭；收到关闭帧时回复关闭帧"""
+        try:
+            while True:
+                first, second = self._recv_exact(2)
+                opcode, length = first & 0x0F, second & 0x7F
+                if length == 126:
+                    length = struct.unpack('!H', self._recv_exact(2))[0]
+                elif length == 127:
+                    length = struct.unpack('!Q', self._recv_exact(8))[0]
+                mask = self._recv_exact(4) if second & 0x80 else b''
+                payload = self._recv_exact(length)
+                if mask:
+                    payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+                if opcode == 0x8:
+                    self._send_frame(0x8, payload[:2])
+                    return
+                if opcode == 0x9:
+                    self._send_frame(0xA, payload)
+        except (OSError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+
+
+def _make_handler(server: FakeComfyUI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _json(self, obj, status: int = 200):
+            data = json.dumps(obj).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _body(self) -> bytes:
+            return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+        def do_GET(self):
+            url = urlsplit(self.path)
+            query = parse_qs(url.query)
+            if url.path == "/ws":
+                return self._websocket(query.get("clientId", [""])[0])
+            if url.path == "/queue":
+                return self._json(server.queue_state())
+            if url.path == "/system_stats":
+                free = server.config.vram_total // (2 if server.queue_state()["queue_running"] else 1)
+                return self._json({"system": {"comfyui_version": "fake"}, "devices": [
+                    {"name": "fake", "type": "cuda", "vram_total": server.config.vram_total, "vram_free": free}
+                ]})
+            if url.path == "/history":
+                return self._json(server.history())
+            if url.path.startswith("/history/"):
+                return self._json(server.history(url.path[len("/history/"):]))
+            if url.path == "/view":
+                return self._view(query.get("filename", [""])[0])
+            self._json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            url = urlsplit(self.path)
+            if url.path == "/upload/image":
+                return self._upload()
+            body = self._body()
+            try:
+                payload = json.loads(body) if body else {}
+            except ValueError:
+                return self._json({"error": "invalid json"}, 400)
+            if url.path == "/prompt":
+                if not isinstance(payload.get("prompt"), dict):
+                    return self._json({"error": "no prompt"}, 400)
+                return self._json(server.queue_prompt(payload["prompt"], payload.get("client_id")))
+            if url.path == "/queue":
+                if payload.get("clear"):
+                    server.delete([item[1] for item in server.queue_state()["queue_pending"]])
+                server.delete(payload.get("delete") or [])
+                return self._json({})
+            if url.path == "/interrupt":
+                server.interrupt(payload.get("prompt_id"))
+                return self._json({})
+            self._json({"error": "not found"}, 404)
+
+        def _upload(self):
+            boundary = self.headers.get("Content-Type", "").partition("boundary=")[2].strip('"').encode()
+            body = self._body()
+            for part in body.split(b"--" + boundary) if boundary else []:
+                head, _, data = part.partition(b"\r\n\r\n")
+                if b'name="image"' in head and b'filename="' in head:
+                    filename = head.split(b'filename="', 1)[1].split(b'"', 1)[0].decode('utf-8', 'replace')
+                    name = server.upload(os.path.basename(filename) or "upload.mp4", data[:-2])
+                    return self._json({"name": name, "subfolder": "", "type": "input"})
+            self._json({"error": "no image field"}, 400)
+
+        def _view(self, filename: str):
+            content = server.output(filename)
+            if content is None:
+                return self._json({"error": "not found"}, 404)
+            size = len(content) if isinstance(content, bytes) else content
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(size))
+            self.end_headers()
+            zeros = b'\0' * VIEW_CHUNK
+            for offset in range(0, size, VIEW_CHUNK):
+                n = min(VIEW_CHUNK, size - offset)
+                self.wfile.write(content[offset:offset + n] if isinstance(content, bytes) else zeros[:n])
+
+        def _websocket(self, client_id: str):
+            key = self.headers.get("Sec-WebSocket-Key", "")
+            accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+            self.send_response(101)
+            self.send_header("Upgrade", "websocket")
+            self.send_header("Connection", "Upgrade")
+            self.send_header("Sec-WebSocket-Accept", accept)
+            self.end_headers()
+            self.wfile.flush()
+            ws = _WebSocket(self.connection)
+            server._clients[client_id] = ws
+            server._broadcast_status()
+            ws.serve()
+            if server._clients.get(client_id) is ws:
+                server._clients.pop(client_id, None)
+            self.close_connection = True
+
+    return Handler
+
+
+def start_servers(count: int, config: FakeConfig, port: int = 0, speeds: Optional[List[float]] = None) -> List[FakeComfyUI]:
+    """启动多台服务器（port 为 0 时使用随机端口，否则使用连续端口）；speeds 为各台的速度倍数"""
+    servers = []
+    for i in range(count):
+        server_config = dataclasses.replace(
+            config,
+            speed=speeds[i % len(speeds)] if speeds else config.speed,
+            seed=config.seed + i if config.seed is not None else None,
+        )
+        servers.append(FakeComfyUI(port + i if port else 0, server_config).start())
+    return servers
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='本地 ComfyUI 替身服务器（无需 GPU）')
+    parser.add_argument('--servers', type=int, default=1, help='服务器数量')
+    parser.add_argument('--port', type=int, default=8188, help='第一台服务器的端口，其余依次加一；0 为随机端口')
+    parser.add_argument('--latency', type=float, default=2.0, help='每个任务的基础执行秒数')
+    parser.add_argument('--seconds-per-mb', type=float, default=0.0, help='按上传大小增加的执行秒数')
+    parser.add_argument('--speeds', default='', help='各服务器的速度倍数，逗号分隔，如 1,1,2')
+    parser.add_argument('--jitter', type=float, default=0.0, help='执行时间随机浮动比例')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='执行失败的概率')
+    parser.add_argument('--output-size', type=int, default=None, help='输出文件字节数（默认原样返回上传的视频）')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    args = parser.parse_args(argv)
+
+    config = FakeConfig(latency=args.latency, seconds_per_mb=args.seconds_per_mb, jitter=args.jitter,
+                        failure_rate=args.failure_rate, output_size=args.output_size, seed=args.seed)
+    speeds = [float(s) for s in args.speeds.split(',') if s.strip()]
+    servers = start_servers(args.servers, config, args.port, speeds)
+    for server in servers:
+        print(server.url, flush=True)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        for server in servers:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -51,7 +51,7 @@ echo [3/5] 开始打包...
 echo 正在使用 PyInstaller 打包成单文件 exe...
 echo.
 
-python -m PyInstaller --onefile --windowed --name "Sora2" --hidden-import PyQt5 --hidden-import PyQt5.QtCore --hidden-import PyQt5.QtGui --hidden-import PyQt5.QtWidgets --hidden-import qfluentwidgets --hidden-import requests --hidden-import loguru --hidden-import sqlite3 --hidden-import imageio --hidden-import imageio_ffmpeg --collect-all qfluentwidgets --collect-all imageio_ffmpeg --add-data "sora2_up.json;." --add-data "README.md;." --noconfirm main.py
+python -m PyInstaller --onefile --windowed --name "Sora2" --hidden-import PyQt5 --hidden-import PyQt5.QtCore --hidden-import PyQt5.QtGui --hidden-import PyQt5.QtWidgets --hidden-import qfluentwidgets --hidden-import requests --hidden-import loguru --hidden-import sqlite3 --hidden-import imageio --hidden-import imageio_ffmpeg --collect-all qfluentwidgets --collect-all imageio_ffmpeg --add-data "sora2_up.json;." --add-data "sora2_up.mapping.json;." --add-data "README.md;." --noconfirm main.py
 
 if %errorlevel% neq 0 (
     echo.
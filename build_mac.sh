@@ -65,6 +65,7 @@ python3 -m PyInstaller --windowed --onedir \
     --hidden-import sqlite3 \
     --collect-all qfluentwidgets \
     --add-data "sora2_up.json:." \
+    --add-data "sora2_up.mapping.json:." \
     --add-data "README.md:." \
     --osx-bundle-identifier com.sora2.video.generator \
     --noconfirm main.py
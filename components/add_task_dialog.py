@@ -252,6 +252,6 @@ class AddTaskDialog(QDialog):
                 res = "9:16"
             else:
                 res = "16:9"
-        db_manager.save_config('add_task_default_resolution', res, 'string', '添加任务默认分辨率')
-        db_manager.save_config('add_task_default_duration', int(self.selected_duration), 'integer', '添加任务默认时长')
+        db_manager.save_config('add_task_default_resolution', res, 'string', '添加任务默认分辨率', wait=False)
+        db_manager.save_config('add_task_default_duration', int(self.selected_duration), 'integer', '添加任务默认时长', wait=False)
         self.accept()
@@ -2,23 +2,66 @@
 批量添加任务对话框
 """
 
-import csv
-import io
 from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor
 from PyQt5.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QFileDialog, 
-    QWidget, QTextEdit, QTableWidget, QTableWidgetItem, QHeaderView
+    QDialog, QVBoxLayout, QHBoxLayout, QFileDialog, QTableView, QHeaderView
 )
 from qfluentwidgets import (
-    TitleLabel, PushButton, PrimaryPushButton, BodyLabel, CardWidget, InfoBar, InfoBarPosition
+    TitleLabel, PushButton, PrimaryPushButton, BodyLabel, InfoBar, InfoBarPosition, ProgressBar
 )
 
+from components.row_table_model import RowTableModel
+from threads.csv_import_thread import CsvImportThread
+
+TEMPLATE_HEADERS = ['提示词', '分辨率', '时长(秒)']
+VALID_STATUS = '有效'
+
+
+def check_task_header(header):
+    """校验表头，返回错误信息"""
+    if len(header) < 3 or header[:3] != TEMPLATE_HEADERS:
+        return 'CSV文件格式不正确，请使用提供的模板'
+    return None
+
+
+def parse_task_row(header, row):
+    """校验一行数据，返回 [提示词, 分辨率, 时长, 状态]；列数不足的行跳过"""
+    if len(row) < 3:
+        return None
+    prompt = row[0].strip()
+    resolution = row[1].strip()
+    duration_str = row[2].strip()
+
+    if not prompt:
+        status = '提示词为空'
+    elif resolution not in ['16:9', '9:16']:
+        status = '分辨率无效'
+    else:
+        try:
+            duration = int(duration_str)
+            if duration not in [10, 15]:
+                status = '时长无效(仅支持10或15)'
+            else:
+                status = VALID_STATUS
+        except ValueError:
+            status = '时长格式错误'
+    return [prompt, resolution, duration_str, status]
+
+
+def _status_color(row, column):
+    if column != 3:
+        return None
+    return QColor(Qt.darkGreen) if row[3] == VALID_STATUS else QColor(Qt.red)
+
+
 class BatchAddTaskDialog(QDialog):
     """批量添加任务对话框"""
     
     def __init__(self, parent=None):
         super().__init__(parent)
         self.tasks_data = []  # 存储解析的任务数据
+        self.import_thread = None
         self.setWindowTitle("批量添加视频生成任务")
         self.setModal(True)
         self.resize(800, 600)
@@ -50,10 +93,16 @@ class BatchAddTaskDialog(QDialog):
         template_layout.addStretch()
         layout.addLayout(template_layout)
         
-        # 预览表格
-        self.preview_table = QTableWidget()
-        self.preview_table.setColumnCount(4)
-        self.preview_table.setHorizontalHeaderLabels(['提示词', '分辨率', '时长(秒)', '状态'])
+        # 导入进度
+        self.import_progress = ProgressBar()
+        self.import_progress.setRange(0, 100)
+        self.import_progress.setVisible(False)
+        layout.addWidget(self.import_progress)
+
+        # 预览表格（模型只保存行数据，视图按需绘制可见行）
+        self.preview_model = RowTableModel(TEMPLATE_HEADERS + ['状态'], foreground=_status_color, parent=self)
+        self.preview_table = QTableView()
+        self.preview_table.setModel(self.preview_model)
         self.preview_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.preview_table.verticalHeader().setVisible(False)
         layout.addWidget(self.preview_table)
@@ -138,111 +187,25 @@ A bustling city street at night,16:9,10"""
             )
     
     def parse_csv_file(self, file_path):
-        """解析CSV文件"""
+        """在后台线程中流式解析CSV文件，按块追加到预览表格"""
         try:
+            self.stop_import()
+
             self.tasks_data = []
-            self.preview_table.setRowCount(0)
-            
-            with open(file_path, 'r', encoding='utf-8-sig') as f:
-                # 使用csv模块读取
-                reader = csv.reader(f)
-                rows = list(reader)
-                
-                if len(rows) < 2:
-                    InfoBar.warning(
-                        title='警告',
-                        content='CSV文件内容为空或格式不正确',
-                        orient=Qt.Horizontal,
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=3000,
-                        parent=self
-                    )
-                    return
-                
-                # 检查表头
-                headers = rows[0]
-                if len(headers) < 3 or headers[0] != '提示词' or headers[1] != '分辨率' or headers[2] != '时长(秒)':
-                    InfoBar.warning(
-                        title='警告',
-                        content='CSV文件格式不正确，请使用提供的模板',
-                        orient=Qt.Horizontal,
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=3000,
-                        parent=self
-                    )
-                    return
-                
-                # 解析数据行
-                for i, row in enumerate(rows[1:], start=1):
-                    if len(row) >= 3:
-                        prompt = row[0].strip()
-                        resolution = row[1].strip()
-                        duration_str = row[2].strip()
-                        
-                        # 验证数据
-                        if not prompt:
-                            status = '提示词为空'
-                        elif resolution not in ['16:9', '9:16']:
-                            status = '分辨率无效'
-                        else:
-                            try:
-                                duration = int(duration_str)
-                                if duration not in [10, 15]:
-                                    status = '时长无效(仅支持10或15)'
-                                else:
-                                    # 有效数据
-                                    self.tasks_data.append({
-                                        'prompt': prompt,
-                                        'resolution': resolution,
-                                        'duration': duration
-                                    })
-                                    status = '有效'
-                            except ValueError:
-                                status = '时长格式错误'
-                        
-                        # 添加到预览表格
-                        row_position = self.preview_table.rowCount()
-                        self.preview_table.insertRow(row_position)
-                        
-                        self.preview_table.setItem(row_position, 0, QTableWidgetItem(prompt))
-                        self.preview_table.setItem(row_position, 1, QTableWidgetItem(resolution))
-                        self.preview_table.setItem(row_position, 2, QTableWidgetItem(duration_str))
-                        self.preview_table.setItem(row_position, 3, QTableWidgetItem(status))
-                        
-                        # 设置状态列的颜色
-                        status_item = self.preview_table.item(row_position, 3)
-                        if status == '有效':
-                            status_item.setForeground(Qt.darkGreen)
-                        else:
-                            status_item.setForeground(Qt.red)
-                
-                # 更新创建按钮状态
-                if self.tasks_data:
-                    self.create_btn.setEnabled(True)
-                    InfoBar.success(
-                        title='成功',
-                        content=f'成功解析 {len(self.tasks_data)} 个有效任务',
-                        orient=Qt.Horizontal,
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=2000,
-                        parent=self
-                    )
-                else:
-                    self.create_btn.setEnabled(False)
-                    InfoBar.warning(
-                        title='警告',
-                        content='没有找到有效的任务数据',
-                        orient=Qt.Horizontal,
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=3000,
-                        parent=self
-                    )
-                    
+            self.preview_model.clear()
+            self.create_btn.setEnabled(False)
+            self.select_file_btn.setEnabled(False)
+            self.import_progress.setValue(0)
+            self.import_progress.setVisible(True)
+
+            self.import_thread = CsvImportThread(file_path, parse_task_row, check_task_header)
+            self.import_thread.chunk_ready.connect(self.on_rows_parsed)
+            self.import_thread.progress.connect(self.on_import_progress)
+            self.import_thread.finished.connect(self.on_import_finished)
+            self.import_thread.start()
         except Exception as e:
+            self.select_file_btn.setEnabled(True)
+            self.import_progress.setVisible(False)
             InfoBar.error(
                 title='错误',
                 content=f'解析CSV文件失败: {str(e)}',
@@ -252,6 +215,84 @@ A bustling city street at night,16:9,10"""
                 duration=3000,
                 parent=self
             )
+
+    def stop_import(self):
+        """停止仍在进行的导入，其已排队的信号随后由各槽函数忽略"""
+        thread, self.import_thread = self.import_thread, None
+        if thread and thread.isRunning():
+            thread.cancel()
+            thread.wait()
+
+    def is_current_import(self) -> bool:
+        """信号是否来自当前的导入线程（切换文件或关闭对话框后旧线程的信号不再处理）"""
+        return self.import_thread is not None and self.sender() is self.import_thread
+
+    def on_rows_parsed(self, rows):
+        """追加一块解析结果"""
+        if not self.is_current_import():
+            return
+        self.preview_model.append_rows(rows)
+        for prompt, resolution, duration, status in rows:
+            if status == VALID_STATUS:
+                self.tasks_data.append({
+                    'prompt': prompt,
+                    'resolution': resolution,
+                    'duration': int(duration)
+                })
+
+    def on_import_progress(self, done, total):
+        if not self.is_current_import():
+            return
+        if total > 0:
+            self.import_progress.setValue(int(done * 100 / total))
+
+    def on_import_finished(self, success, message, count):
+        """导入结束：更新创建按钮状态并提示结果"""
+        if not self.is_current_import():
+            return
+        self.select_file_btn.setEnabled(True)
+        self.import_progress.setVisible(False)
+
+        if not success:
+            self.create_btn.setEnabled(bool(self.tasks_data))
+            InfoBar.warning(
+                title='警告',
+                content=message,
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+            return
+
+        if self.tasks_data:
+            self.create_btn.setEnabled(True)
+            InfoBar.success(
+                title='成功',
+                content=f'成功解析 {len(self.tasks_data)} 个有效任务',
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=2000,
+                parent=self
+            )
+        else:
+            self.create_btn.setEnabled(False)
+            InfoBar.warning(
+                title='警告',
+                content='没有找到有效的任务数据',
+                orient=Qt.Horizontal,
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+
+    def done(self, result):
+        # 关闭对话框时停止仍在进行的导入
+        self.stop_import()
+        super().done(result)
     
     def get_tasks_data(self):
         """获取解析的任务数据"""
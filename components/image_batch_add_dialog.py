@@ -5,18 +5,42 @@
 
 from pathlib import Path
 from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QDragEnterEvent, QDropEvent
+from PyQt5.QtGui import QColor, QDragEnterEvent, QDropEvent
 from PyQt5.QtWidgets import (
-    QDialog, QVBoxLayout, QHBoxLayout, QTableWidgetItem, QHeaderView, QFileDialog
+    QDialog, QVBoxLayout, QHBoxLayout, QHeaderView, QFileDialog
 )
 import csv
 from qfluentwidgets import (
     TitleLabel, BodyLabel, PushButton, PrimaryPushButton, InfoBar, InfoBarPosition,
-    TableWidget, ComboBox
+    TableView, ComboBox, ProgressBar
 )
 
-from threads.image_upload_thread import ImageUploadThread
-from utils.global_thread_pool import global_thread_pool
+from components.row_table_model import ChoiceItemDelegate, RowTableModel
+from threads.csv_import_thread import CsvImportThread
+from threads.batch_upload_thread import BatchUploadThread
+
+RESOLUTIONS = ("16:9", "9:16")
+DURATIONS = (10, 15)
+
+# 表格列
+COL_URL, COL_PROMPT, COL_RESOLUTION, COL_DURATION, COL_STATUS = range(5)
+
+_STATUS_COLORS = (
+    ("已上传", Qt.darkGreen),
+    ("上传中", Qt.darkBlue),
+    ("未提供图片", Qt.darkYellow),
+    ("上传失败", Qt.red),
+)
+
+
+def _status_color(row, column):
+    if column != COL_STATUS:
+        return None
+    status = row[COL_STATUS] or ""
+    for prefix, color in _STATUS_COLORS:
+        if status.startswith(prefix):
+            return QColor(color)
+    return None
 
 
 class ImageBatchAddDialog(QDialog):
@@ -31,6 +55,10 @@ class ImageBatchAddDialog(QDialog):
         self._default_resolution = default_resolution if default_resolution in ("16:9", "9:16") else "16:9"
         self._default_duration = default_duration if default_duration in (10, 15) else 10
         self._upload_threads = []
+        # 等待上传的 (行号, 本地路径)；同一时间只运行一个批量上传线程，其余排队合并为下一批
+        self._pending_uploads = []
+        self._import_thread = None
+        self._import_count = 0
         self.setAcceptDrops(True)
         self.init_ui()
 
@@ -81,10 +109,25 @@ class ImageBatchAddDialog(QDialog):
         opts.addStretch()
         layout.addLayout(opts)
 
-        # 表格
-        self.table = TableWidget()
-        self.table.setColumnCount(5)
-        self.table.setHorizontalHeaderLabels(["图片URL", "提示词", "分辨率", "时长(秒)", "状态"])
+        # 导入进度
+        self.import_progress = ProgressBar()
+        self.import_progress.setRange(0, 100)
+        self.import_progress.setVisible(False)
+        layout.addWidget(self.import_progress)
+
+        # 表格（模型只保存行数据；分辨率/时长在编辑时才创建下拉框）
+        self.model = RowTableModel(
+            ["图片URL", "提示词", "分辨率", "时长(秒)", "状态"],
+            editable_columns=(COL_PROMPT, COL_RESOLUTION, COL_DURATION),
+            foreground=_status_color,
+            parent=self
+        )
+        self.table = TableView()
+        self.table.setModel(self.model)
+        self.table.setItemDelegate(ChoiceItemDelegate(self.table, {
+            COL_RESOLUTION: RESOLUTIONS,
+            COL_DURATION: DURATIONS,
+        }))
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(QHeaderView.Stretch)
         self.table.verticalHeader().setVisible(False)
@@ -134,64 +177,105 @@ class ImageBatchAddDialog(QDialog):
             )
 
     def import_csv_file(self):
-        """导入CSV：image_path,prompt,resolution,duration"""
+        """导入CSV：image_path,prompt,resolution,duration（后台流式解析，按块追加）"""
         try:
+            if self._import_thread and self._import_thread.isRunning():
+                return
             file_path, _ = QFileDialog.getOpenFileName(self, "选择CSV文件", "", "CSV Files (*.csv)")
             if not file_path:
                 return
-            count = 0
-            rows = self._read_csv_rows_with_fallback(file_path)
-            for row in rows:
-                image_path = (row.get('image_path') or '').strip()
-                prompt = (row.get('prompt') or '').strip()
-                resolution = (row.get('resolution') or '').strip()
-                duration_str = (row.get('duration') or '').strip()
-                if not image_path:
-                    try:
-                        duration = int(duration_str) if duration_str else self._default_duration
-                    except Exception:
-                        duration = self._default_duration
-                    if resolution not in ("16:9", "9:16"):
-                        resolution = self._default_resolution
-                    self._append_row_no_image(prompt=prompt, resolution=resolution, duration=duration)
-                    count += 1
-                    continue
-                if resolution not in ("16:9", "9:16"):
-                    resolution = self._default_resolution
-                try:
-                    duration = int(duration_str) if duration_str else self._default_duration
-                except Exception:
-                    duration = self._default_duration
+            self._import_count = 0
+            self.import_csv_btn.setEnabled(False)
+            self.import_progress.setValue(0)
+            self.import_progress.setVisible(True)
+
+            self._import_thread = CsvImportThread(file_path, self._parse_csv_row)
+            self._import_thread.chunk_ready.connect(self._on_csv_rows)
+            self._import_thread.progress.connect(self._on_import_progress)
+            self._import_thread.finished.connect(self._on_import_finished)
+            self._import_thread.start()
+        except Exception as e:
+            self.import_csv_btn.setEnabled(True)
+            self.import_progress.setVisible(False)
+            InfoBar.error(
+                title='错误',
+                content=f'导入失败: {e}',
+                orient=Qt.Horizontal,  # type: ignore
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
 
-                if image_path.startswith('http://') or image_path.startswith('https://'):
-                    self._append_row_direct(url=image_path, prompt=prompt, resolution=resolution, duration=duration)
-                    count += 1
-                else:
-                    self._append_row_for_file(image_path)
-                    last_row = self.table.rowCount() - 1
-                    self.table.setItem(last_row, 1, QTableWidgetItem(prompt))
-                    res_widget = self.table.cellWidget(last_row, 2)
-                    dur_widget = self.table.cellWidget(last_row, 3)
-                    if res_widget and hasattr(res_widget, 'setCurrentText'):
-                        res_widget.setCurrentText(resolution)
-                    if dur_widget and hasattr(dur_widget, 'setCurrentText'):
-                        dur_widget.setCurrentText(str(duration))
-                    self._upload_image(image_path)
-                    count += 1
+    def _parse_csv_row(self, header: list[str], row: list[str]):
+        """在导入线程中校验一行，返回 (图片路径, 提示词, 分辨率, 时长)"""
+        values = dict(zip(header, row))
+        image_path = (values.get('image_path') or '').strip()
+        prompt = (values.get('prompt') or '').strip()
+        resolution = (values.get('resolution') or '').strip()
+        duration_str = (values.get('duration') or '').strip()
+        if resolution not in RESOLUTIONS:
+            resolution = self._default_resolution
+        try:
+            duration = int(duration_str) if duration_str else self._default_duration
+        except Exception:
+            duration = self._default_duration
+        return image_path, prompt, resolution, duration
+
+    def _stop_import(self):
+        """停止仍在进行的导入，其已排队的信号随后由各槽函数忽略"""
+        thread, self._import_thread = self._import_thread, None
+        if thread and thread.isRunning():
+            thread.cancel()
+            thread.wait()
+
+    def _is_current_import(self) -> bool:
+        """信号是否来自当前的导入线程（关闭对话框后旧线程的信号不再处理）"""
+        return self._import_thread is not None and self.sender() is self._import_thread
+
+    def _on_csv_rows(self, rows: list):
+        """追加一块导入结果；本地图片在追加后开始上传"""
+        if not self._is_current_import():
+            return
+        new_rows = []
+        local_files = []
+        for image_path, prompt, resolution, duration in rows:
+            if not image_path:
+                new_rows.append(self._make_row("", prompt, resolution, duration, "未提供图片"))
+            elif image_path.startswith('http://') or image_path.startswith('https://'):
+                new_rows.append(self._make_row(image_path, prompt, resolution, duration, "已上传"))
+            else:
+                local_files.append((len(new_rows), image_path))
+                new_rows.append(self._make_row(Path(image_path).name, prompt, resolution, duration, "上传中"))
+        first = self.model.append_rows(new_rows)
+        self._queue_uploads([(first + offset, image_path) for offset, image_path in local_files])
+        self._import_count += len(new_rows)
+
+    def _on_import_progress(self, done: int, total: int):
+        if not self._is_current_import():
+            return
+        if total > 0:
+            self.import_progress.setValue(int(done * 100 / total))
 
+    def _on_import_finished(self, success: bool, message: str, count: int):
+        if not self._is_current_import():
+            return
+        self.import_csv_btn.setEnabled(True)
+        self.import_progress.setVisible(False)
+        if success:
             InfoBar.success(
                 title='成功',
-                content=f'已导入 {count} 条记录',
+                content=f'已导入 {self._import_count} 条记录',
                 orient=Qt.Horizontal,  # type: ignore
                 isClosable=True,
                 position=InfoBarPosition.TOP,
                 duration=2000,
                 parent=self
             )
-        except Exception as e:
+        else:
             InfoBar.error(
                 title='错误',
-                content=f'导入失败: {e}',
+                content=f'导入失败: {message}',
                 orient=Qt.Horizontal,  # type: ignore
                 isClosable=True,
                 position=InfoBarPosition.TOP,
@@ -199,47 +283,20 @@ class ImageBatchAddDialog(QDialog):
                 parent=self
             )
 
+    def _make_row(self, url: str, prompt: str, resolution: str, duration, status: str) -> list:
+        if resolution not in RESOLUTIONS:
+            resolution = self._default_resolution
+        if duration not in DURATIONS:
+            duration = self._default_duration
+        return [url, prompt, resolution, str(duration), status]
+
     def _append_row_direct(self, url: str, prompt: str, resolution: str, duration: int):
         """直接追加一行（已上传URL）"""
-        row = self.table.rowCount()
-        self.table.insertRow(row)
-        self.table.setItem(row, 0, QTableWidgetItem(url))
-        self.table.setItem(row, 1, QTableWidgetItem(prompt))
-        # 分辨率下拉
-        res_combo = ComboBox()
-        res_combo.addItems(["16:9", "9:16"]) 
-        res_combo.setCurrentText(resolution if resolution in ("16:9", "9:16") else self._default_resolution)
-        self.table.setCellWidget(row, 2, res_combo)
-        # 时长下拉
-        dur_combo = ComboBox()
-        dur_combo.addItems(["10", "15"]) 
-        dur_combo.setCurrentText(str(duration if duration in (10, 15) else self._default_duration))
-        self.table.setCellWidget(row, 3, dur_combo)
-        status_item = QTableWidgetItem("已上传")
-        status_item.setForeground(Qt.darkGreen)
-        self.table.setItem(row, 4, status_item)
+        self.model.append_rows([self._make_row(url, prompt, resolution, duration, "已上传")])
 
     def _append_row_no_image(self, prompt: str, resolution: str, duration: int):
         """追加一行（不含图片，纯文本任务）"""
-        row = self.table.rowCount()
-        self.table.insertRow(row)
-        # 图片URL留空
-        self.table.setItem(row, 0, QTableWidgetItem(""))
-        self.table.setItem(row, 1, QTableWidgetItem(prompt))
-        # 分辨率下拉
-        res_combo = ComboBox()
-        res_combo.addItems(["16:9", "9:16"]) 
-        res_combo.setCurrentText(resolution if resolution in ("16:9", "9:16") else self._default_resolution)
-        self.table.setCellWidget(row, 2, res_combo)
-        # 时长下拉
-        dur_combo = ComboBox()
-        dur_combo.addItems(["10", "15"]) 
-        dur_combo.setCurrentText(str(duration if duration in (10, 15) else self._default_duration))
-        self.table.setCellWidget(row, 3, dur_combo)
-        # 状态
-        status_item = QTableWidgetItem("未提供图片")
-        status_item.setForeground(Qt.darkYellow)
-        self.table.setItem(row, 4, status_item)
+        self.model.append_rows([self._make_row("", prompt, resolution, duration, "未提供图片")])
 
     def dragEnterEvent(self, event: QDragEnterEvent):
         if event.mimeData().hasUrls():
@@ -253,17 +310,17 @@ class ImageBatchAddDialog(QDialog):
             event.ignore()
             return
         event.acceptProposedAction()
-        count = 0
         file_paths: list[str] = []
         for url in urls:
             fp = url.toLocalFile()
             if fp:
                 file_paths.append(fp)
+        uploads = []
         for fp in file_paths:
             if self._is_image_file(fp):
-                self._append_row_for_file(fp)
-                self._upload_image(fp)
-                count += 1
+                uploads.append((self._append_row_for_file(fp), fp))
+        self._queue_uploads(uploads)
+        count = len(uploads)
         if count > 0:
             InfoBar.info(
                 title='添加图片',
@@ -275,51 +332,51 @@ class ImageBatchAddDialog(QDialog):
                 parent=self
             )
 
-    def _append_row_for_file(self, file_path: str):
-        row = self.table.rowCount()
-        self.table.insertRow(row)
-        # 图片URL列先显示本地路径或占位
-        self.table.setItem(row, 0, QTableWidgetItem(Path(file_path).name))
-        # 提示词默认
-        self.table.setItem(row, 1, QTableWidgetItem(self._default_prompt))
-        # 分辨率下拉
-        res_combo = ComboBox()
-        res_combo.addItems(["16:9", "9:16"]) 
-        res_combo.setCurrentText(self._default_resolution)
-        self.table.setCellWidget(row, 2, res_combo)
-        
-        # 时长下拉
-        dur_combo = ComboBox()
-        dur_combo.addItems(["10", "15"]) 
-        dur_combo.setCurrentText(str(self._default_duration))
-        self.table.setCellWidget(row, 3, dur_combo)
-        # 状态
-        status_item = QTableWidgetItem("上传中")
-        status_item.setForeground(Qt.darkBlue)
-        self.table.setItem(row, 4, status_item)
-
-    def _upload_image(self, file_path: str):
-        token = "1c17b11693cb5ec63859b091c5b9c1b2"  # 与单任务上传一致的预设token
-        thread = ImageUploadThread(file_path, token)
-        thread.progress.connect(lambda msg: None)
-        # 闭包捕获行索引
-        row_index = self.table.rowCount() - 1
-        thread.finished.connect(lambda success, message, url: self._on_upload_finished(row_index, success, message, url))
-        global_thread_pool.submit(thread)
+    def _append_row_for_file(self, file_path: str) -> int:
+        """追加一行本地图片记录（图片URL列先显示文件名），返回行号"""
+        return self.model.append_rows([self._make_row(
+            Path(file_path).name, self._default_prompt, self._default_resolution, self._default_duration, "上传中"
+        )])
+
+    def _queue_uploads(self, uploads: list[tuple[int, str]]):
+        """加入上传队列；当前没有上传线程时立即开始一批"""
+        self._pending_uploads.extend(uploads)
+        if not self._upload_threads:
+            self._start_upload_batch()
+
+    def _start_upload_batch(self):
+        if not self._pending_uploads:
+            return
+        batch, self._pending_uploads = self._pending_uploads, []
+        rows = [row for row, _ in batch]
+        thread = BatchUploadThread([path for _, path in batch])
+        thread.file_progress.connect(
+            lambda index, sent, total: self._on_upload_progress(rows[index], sent, total)
+        )
+        thread.file_finished.connect(
+            lambda index, success, message, url: self._on_upload_finished(rows[index], success, message, url)
+        )
+        thread.finished.connect(lambda *_: self._on_upload_batch_finished(thread))
         self._upload_threads.append(thread)
+        thread.start()
+
+    def _on_upload_batch_finished(self, thread: BatchUploadThread):
+        if thread in self._upload_threads:
+            self._upload_threads.remove(thread)
+        self._start_upload_batch()
+
+    def _on_upload_progress(self, row: int, sent: int, total: int):
+        if total > 0 and sent < total:
+            self.model.set_value(row, COL_STATUS, f"上传中 {sent * 100 // total}%")
 
     def _on_upload_finished(self, row: int, success: bool, message: str, image_url: str):
-        if row < 0 or row >= self.table.rowCount():
+        if row < 0 or row >= self.model.rowCount():
             return
         if success and image_url:
-            self.table.setItem(row, 0, QTableWidgetItem(image_url))
-            status_item = QTableWidgetItem("已上传")
-            status_item.setForeground(Qt.darkGreen)
-            self.table.setItem(row, 4, status_item)
+            self.model.set_value(row, COL_URL, image_url)
+            self.model.set_value(row, COL_STATUS, "已上传")
         else:
-            status_item = QTableWidgetItem(f"上传失败: {message}")
-            status_item.setForeground(Qt.red)
-            self.table.setItem(row, 4, status_item)
+            self.model.set_value(row, COL_STATUS, f"上传失败: {message}")
 
     def _is_image_file(self, file_path: str) -> bool:
         image_extensions = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.bmp', '.tiff', '.tif'}
@@ -338,35 +395,17 @@ class ImageBatchAddDialog(QDialog):
             pass
 
     def apply_options_to_all_rows(self):
-        rows = self.table.rowCount()
-        for r in range(rows):
-            res_widget = self.table.cellWidget(r, 2)
-            dur_widget = self.table.cellWidget(r, 3)
-            if res_widget and hasattr(res_widget, 'setCurrentText'):
-                res_widget.setCurrentText(self._default_resolution)
-            if dur_widget and hasattr(dur_widget, 'setCurrentText'):
-                dur_widget.setCurrentText(str(self._default_duration))
+        self.model.set_column(COL_RESOLUTION, self._default_resolution)
+        self.model.set_column(COL_DURATION, str(self._default_duration))
 
     def get_tasks_data(self) -> list[dict]:
         """从表格收集任务数据"""
         tasks = []
-        rows = self.table.rowCount()
-        for r in range(rows):
-            url_item = self.table.item(r, 0)
-            prompt_item = self.table.item(r, 1)
-            res_widget = self.table.cellWidget(r, 2)
-            dur_widget = self.table.cellWidget(r, 3)
-            status_item = self.table.item(r, 4)
-
-            image_url = url_item.text().strip() if url_item else ""
-            prompt = (prompt_item.text().strip() if prompt_item else "")
-            resolution = "16:9"
-            if res_widget and hasattr(res_widget, 'currentText'):
-                resolution = res_widget.currentText().strip()
-            duration_str = str(self._default_duration)
-            if dur_widget and hasattr(dur_widget, 'currentText'):
-                duration_str = dur_widget.currentText().strip()
-            status = status_item.text() if status_item else ""
+        for url, prompt, resolution, duration_str, status in self.model.rows():
+            image_url = (url or "").strip()
+            prompt = (prompt or "").strip()
+            resolution = (resolution or "16:9").strip()
+            status = status or ""
 
             # 支持两类任务：
             # 1) 图生视频：图片URL存在且已上传成功
@@ -397,22 +436,10 @@ class ImageBatchAddDialog(QDialog):
 
         return tasks
 
-    def _read_csv_rows_with_fallback(self, file_path: str) -> list[dict]:
-        encodings = [
-            'utf-8-sig',
-            'utf-8',
-            'gbk',
-            'gb2312',
-            'big5',
-            'latin-1'
-        ]
-        last_err = None
-        for enc in encodings:
-            try:
-                with open(file_path, 'r', newline='', encoding=enc) as f:
-                    reader = csv.DictReader(f)
-                    return list(reader)
-            except Exception as e:
-                last_err = e
-                continue
-        raise last_err if last_err else Exception('无法读取CSV文件')
+    def done(self, result):
+        # 关闭对话框时停止仍在进行的导入，未开始的上传不再进行
+        self._stop_import()
+        self._pending_uploads = []
+        for thread in self._upload_threads:
+            thread.cancel()
+        super().done(result)
@@ -89,8 +89,8 @@ class PromptSettingsDialog(QDialog):
         self._scene_prompt = self.scene_prompt_edit.toPlainText().strip()
         # 保存到数据库配置表
         try:
-            db_manager.save_config('main_image_prompt', self._main_prompt, 'string', '主图处理提示词(白底图生成)')
-            db_manager.save_config('scene_generation_prompt', self._scene_prompt, 'string', '场景生成提示词(15秒产品介绍)')
+            db_manager.save_config('main_image_prompt', self._main_prompt, 'string', '主图处理提示词(白底图生成)', wait=False)
+            db_manager.save_config('scene_generation_prompt', self._scene_prompt, 'string', '场景生成提示词(15秒产品介绍)', wait=False)
         except Exception:
             pass
         InfoBar.success(
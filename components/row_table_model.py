@@ -0,0 +1,130 @@
+"""
+基于模型的行表格
+
+QTableWidget 每个单元格都是一个 QTableWidgetItem（下拉框更是一个独立控件），
+几万行时内存和界面开销都很大。这里用 QAbstractTableModel 只保存每行的原始值，
+由视图按需绘制可见区域；下拉选择通过委托在编辑时才创建编辑器。
+"""
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QComboBox
+from qfluentwidgets import TableItemDelegate
+
+# 前景色回调：接收 (行数据, 列号)，返回颜色或 None
+ForegroundFn = Callable[[List[Any], int], Optional[QColor]]
+
+
+class RowTableModel(QAbstractTableModel):
+    """以列表保存行数据的表格模型"""
+
+    def __init__(self, headers: Sequence[str], editable_columns: Iterable[int] = (),
+                 foreground: Optional[ForegroundFn] = None, parent=None):
+        super().__init__(parent)
+        self._headers = list(headers)
+        self._editable = set(editable_columns)
+        self._foreground = foreground
+        self._rows: List[List[Any]] = []
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._headers)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and 0 <= section < len(self._headers):
+            return self._headers[section]
+        return None
+
+    def data(self, index: QModelIndex, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        value = row[index.column()]
+        if role in (Qt.DisplayRole, Qt.EditRole, Qt.ToolTipRole):
+            return '' if value is None else str(value)
+        if role == Qt.ForegroundRole and self._foreground:
+            return self._foreground(row, index.column())
+        return None
+
+    def flags(self, index: QModelIndex):
+        flags = super().flags(index)
+        if index.isValid() and index.column() in self._editable:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index: QModelIndex, value, role=Qt.EditRole) -> bool:
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        self._rows[index.row()][index.column()] = value
+        self.dataChanged.emit(index, index, [role])
+        return True
+
+    def append_rows(self, rows: Sequence[Sequence[Any]]) -> int:
+        """批量追加行，返回第一行的行号"""
+        first = len(self._rows)
+        if not rows:
+            return first
+        self.beginInsertRows(QModelIndex(), first, first + len(rows) - 1)
+        self._rows.extend(list(r) for r in rows)
+        self.endInsertRows()
+        return first
+
+    def clear(self):
+        self.beginResetModel()
+        self._rows = []
+        self.endResetModel()
+
+    def row(self, row: int) -> List[Any]:
+        return self._rows[row]
+
+    def rows(self) -> List[List[Any]]:
+        return self._rows
+
+    def set_value(self, row: int, column: int, value: Any):
+        """更新单元格（不经过视图编辑）"""
+        if 0 <= row < len(self._rows):
+            self._rows[row][column] = value
+            index = self.index(row, column)
+            self.dataChanged.emit(index, index)
+
+    def set_column(self, column: int, value: Any):
+        """把整列设置为同一个值"""
+        if not self._rows:
+            return
+        for r in self._rows:
+            r[column] = value
+        self.dataChanged.emit(self.index(0, column), self.index(len(self._rows) - 1, column))
+
+
+class ChoiceItemDelegate(TableItemDelegate):
+    """指定列使用下拉框编辑，其余列沿用默认的行编辑器"""
+
+    def __init__(self, parent, choices: Dict[int, Sequence[str]]):
+        super().__init__(parent)
+        self._choices = {col: [str(c) for c in values] for col, values in choices.items()}
+
+    def createEditor(self, parent, option, index):
+        choices = self._choices.get(index.column())
+        if choices is None:
+            return super().createEditor(parent, option, index)
+        combo = QComboBox(parent)
+        combo.addItems(choices)
+        # 选中即提交，不需要再点击其他位置
+        combo.activated.connect(lambda _: self.commitData.emit(combo))
+        return combo
+
+    def setEditorData(self, editor, index):
+        if isinstance(editor, QComboBox):
+            editor.setCurrentText(index.data(Qt.EditRole))
+            return
+        super().setEditorData(editor, index)
+
+    def setModelData(self, editor, model, index):
+        if isinstance(editor, QComboBox):
+            model.setData(index, editor.currentText(), Qt.EditRole)
+            return
+        super().setModelData(editor, model, index)
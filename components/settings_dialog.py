@@ -94,19 +94,19 @@ class SettingsDialog(QDialog):
     def save_and_close(self):
         """保存设置并关闭"""
         api_key = self.api_key_input.text().strip()
-        db_manager.save_config('api_key', api_key, 'string', 'Sora API Key')
+        db_manager.save_config('api_key', api_key, 'string', 'Sora API Key', wait=False)
         
         # 不再保存ComfyUI服务器设置
         
         # 保存视频保存路径
         video_path = self.video_path_input.text().strip()
-        db_manager.save_config('video_save_path', video_path, 'string', '视频保存路径')
+        db_manager.save_config('video_save_path', video_path, 'string', '视频保存路径', wait=False)
 
         # 保存AI标题设置
         enabled = bool(self.ai_title_checkbox.isChecked())
-        db_manager.save_config('ai_title_enabled', enabled, 'boolean', 'AI标题开关')
+        db_manager.save_config('ai_title_enabled', enabled, 'boolean', 'AI标题开关', wait=False)
         prompt = self.ai_title_prompt_input.text().strip() or '只返回一个中文视频标题，不要返回任何解释或额外内容；不使用引号、编号、前后缀；不换行；不超过30字，风格有趣吸引人'
-        db_manager.save_config('ai_title_prompt', prompt, 'string', 'AI标题提示词')
+        db_manager.save_config('ai_title_prompt', prompt, 'string', 'AI标题提示词', wait=False)
 
         self.accept()
         
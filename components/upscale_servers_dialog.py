@@ -10,6 +10,9 @@ from qfluentwidgets import (
 
 from database_manager import db_manager
 
+# 健康检查的熔断状态显示文字
+HEALTH_STATE_TEXT = {'closed': '正常', 'open': '熔断', 'half_open': '试探中'}
+
 
 class UpscaleServersDialog(QDialog):
     """管理高清放大服务器的对话框"""
@@ -18,7 +21,7 @@ class UpscaleServersDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("高清放大服务器配置")
         self.setModal(True)
-        self.resize(700, 420)
+        self.resize(820, 420)
         self._server_rows = []  # 缓存行对应的服务器ID
         self.init_ui()
         self.load_servers()
@@ -31,9 +34,9 @@ class UpscaleServersDialog(QDialog):
 
         # 表格
         self.table = TableWidget()
-        # 4列：序号、名称、地址、启用
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["序号", "名称", "地址", "启用"])
+        # 5列：序号、名称、地址、启用、健康状态（最近一次处理时的检查结果，只读）
+        self.table.setColumnCount(5)
+        self.table.setHorizontalHeaderLabels(["序号", "名称", "地址", "启用", "健康状态"])
         header = self.table.horizontalHeader()
         if header:
             # 使用固定列宽，由我们按比例设置
@@ -46,7 +49,7 @@ class UpscaleServersDialog(QDialog):
         self.table.setEditTriggers(QAbstractItemView.DoubleClicked | QAbstractItemView.SelectedClicked)
 
         layout.addWidget(self.table)
-        # 初始化列宽比例：1:3:13:3
+        # 初始化列宽比例：1:3:10:2:5
         self.update_column_widths()
 
         # 操作按钮
@@ -77,12 +80,23 @@ class UpscaleServersDialog(QDialog):
         self._server_rows = []
 
         for s in servers:
-            self._append_server_row(s.get('id'), s.get('name'), s.get('url'), bool(s.get('enabled')))
+            self._append_server_row(s.get('id'), s.get('name'), s.get('url'), bool(s.get('enabled')), s)
         # 重新编号与列宽
         self.renumber_rows()
         self.update_column_widths()
 
-    def _append_server_row(self, server_id, name, url, enabled):
+    @staticmethod
+    def _health_text(server) -> str:
+        if not server or not server.get('last_checked_at'):
+            return "未检测"
+        text = HEALTH_STATE_TEXT.get(server.get('health_state'), server.get('health_state') or '')
+        if server.get('latency_ms') is not None and server.get('health_state') != 'open':
+            text += f" · {server['latency_ms']:.0f}ms"
+        if server.get('health_state') != 'closed' and server.get('last_error'):
+            text += f" · {server['last_error']}"
+        return text
+
+    def _append_server_row(self, server_id, name, url, enabled, server=None):
         row = self.table.rowCount()
         self.table.insertRow(row)
         self._server_rows.append(server_id)
@@ -113,6 +127,12 @@ class UpscaleServersDialog(QDialog):
         # 保存checkbox引用以便读取
         cell_widget._checkbox = checkbox  # type: ignore
 
+        health_item = QTableWidgetItem(self._health_text(server))
+        health_item.setFlags(health_item.flags() & ~Qt.ItemIsEditable)  # type: ignore
+        if server and server.get('last_error'):
+            health_item.setToolTip(f"最近错误: {server['last_error']}\n检查时间: {server.get('last_checked_at')}")
+        self.table.setItem(row, 4, health_item)
+
     def add_row(self):
         # 追加空白行供用户填写
         self._append_server_row(None, "服务器", "http://localhost:8188", True)
@@ -144,7 +164,7 @@ class UpscaleServersDialog(QDialog):
 
         if server_id:
             # 如果是已有记录，删除数据库
-            db_manager.delete_upscale_server(server_id)
+            db_manager.delete_upscale_server(server_id, wait=False)
 
     def save_and_close(self):
         rows = self.table.rowCount()
@@ -174,10 +194,10 @@ class UpscaleServersDialog(QDialog):
 
             server_id = self._server_rows[row]
             if server_id:
-                db_manager.update_upscale_server(server_id, name=name or url, url=url, enabled=enabled)
+                db_manager.update_upscale_server(server_id, name=name or url, url=url, enabled=enabled, wait=False)
             else:
                 # 新增，若未填名称则用地址作为名称
-                db_manager.add_upscale_server(name or url, url, enabled)
+                db_manager.add_upscale_server(name or url, url, enabled, wait=False)
 
         InfoBar.success(
             title='成功',
@@ -204,11 +224,11 @@ class UpscaleServersDialog(QDialog):
             item.setFlags(item.flags() & ~Qt.ItemIsEditable)  # type: ignore
 
     def update_column_widths(self):
-        """按比例 1:3:13:3 设置列宽"""
+        """按比例 1:3:10:2:5 设置列宽"""
         try:
-            total = 1 + 3 + 13 + 3
+            total = 1 + 3 + 10 + 2 + 5
             content_width = max(self.table.viewport().width(), 400)
-            parts = [1, 3, 13, 3]
+            parts = [1, 3, 10, 2, 5]
             widths = [int(content_width * p / total) for p in parts]
             for i, w in enumerate(widths):
                 self.table.setColumnWidth(i, max(w, 40))
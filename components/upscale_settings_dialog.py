@@ -5,10 +5,11 @@
 from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QHBoxLayout, QGroupBox, QDialogButtonBox
 from qfluentwidgets import (
-    TitleLabel, RadioButton, PushButton, PrimaryPushButton
+    TitleLabel, RadioButton, PushButton, PrimaryPushButton, SpinBox, BodyLabel, CheckBox
 )
 
 from database_manager import db_manager
+from utils.upscale_scheduler import DEFAULT_JOBS_PER_SERVER, MAX_JOBS_PER_SERVER, jobs_per_server
 
 class UpscaleSettingsDialog(QDialog):
     """高清放大设置对话框"""
@@ -17,7 +18,7 @@ class UpscaleSettingsDialog(QDialog):
         super().__init__(parent)
         self.setWindowTitle("高清放大设置")
         self.setModal(True)
-        self.resize(400, 300)
+        self.resize(400, 400)
         self.init_ui()
         self.load_settings()
         
@@ -68,6 +69,23 @@ class UpscaleSettingsDialog(QDialog):
         scale_layout.addWidget(self.scale_4_radio)
         
         layout.addWidget(scale_group)
+
+        # 调度设置：每台服务器同时提交的任务数（提前排队可减少GPU在上传/下载期间的空闲）
+        schedule_group = QGroupBox("任务调度")
+        schedule_layout = QVBoxLayout(schedule_group)
+        jobs_layout = QHBoxLayout()
+        jobs_layout.addWidget(BodyLabel("每台服务器同时提交任务数:"))
+        self.jobs_per_server_spin = SpinBox()
+        self.jobs_per_server_spin.setRange(1, MAX_JOBS_PER_SERVER)
+        self.jobs_per_server_spin.setValue(DEFAULT_JOBS_PER_SERVER)
+        jobs_layout.addWidget(self.jobs_per_server_spin)
+        jobs_layout.addStretch()
+        schedule_layout.addLayout(jobs_layout)
+
+        # 长视频按关键帧切段，分给多台服务器并行放大后再拼接
+        self.segment_checkbox = CheckBox("长视频分段并行处理（多服务器）")
+        schedule_layout.addWidget(self.segment_checkbox)
+        layout.addWidget(schedule_group)
         
         # 按钮布局
         button_layout = QHBoxLayout()
@@ -105,6 +123,9 @@ class UpscaleSettingsDialog(QDialog):
         elif scale == 4:
             self.scale_4_radio.setChecked(True)
 
+        self.jobs_per_server_spin.setValue(jobs_per_server())
+        self.segment_checkbox.setChecked(bool(db_manager.load_config('upscale_segment_enabled', False)))
+
     def save_and_close(self):
         """保存设置并关闭"""
         # 获取选中的模式
@@ -128,8 +149,12 @@ class UpscaleSettingsDialog(QDialog):
             scale = 2  # 默认值
             
         # 保存到数据库
-        db_manager.save_config('upscale_mode', mode, 'string', '高清放大模式')
-        db_manager.save_config('upscale_scale', scale, 'integer', '高清放大系数')
+        db_manager.save_config('upscale_mode', mode, 'string', '高清放大模式', wait=False)
+        db_manager.save_config('upscale_scale', scale, 'integer', '高清放大系数', wait=False)
+        db_manager.save_config('upscale_jobs_per_server', self.jobs_per_server_spin.value(), 'integer',
+                               '高清放大每台服务器同时提交的任务数', wait=False)
+        db_manager.save_config('upscale_segment_enabled', self.segment_checkbox.isChecked(), 'boolean',
+                               '高清放大长视频分段并行处理', wait=False)
         
         self.accept()
         
@@ -12,7 +12,8 @@ from qfluentwidgets import (
     TitleLabel, TextEdit, PushButton, BodyLabel, CardWidget, InfoBar, InfoBarPosition, ProgressBar
 )
 
-from threads.video_analysis_thread import VideoAnalysisThread
+from threads.video_analysis_thread import VideoAnalysisThread, format_scenes_prompt
+from utils.video_proxy import check_analysis_size
 from database_manager import db_manager
 from utils.file_utils import format_file_size
 from components.prompt_preview_dialog import PromptPreviewDialog
@@ -159,6 +160,13 @@ class VideoCloneDialog(QDialog):
         
         # 按钮布局
         button_layout = QHBoxLayout()
+
+        # 同一视频默认使用缓存的分析结果，需要时可忽略缓存重新分析
+        self.reanalyze_btn = PushButton("重新分析（忽略缓存）")
+        self.reanalyze_btn.setEnabled(False)
+        self.reanalyze_btn.clicked.connect(lambda: self.start_analysis(use_cache=False))
+        button_layout.addWidget(self.reanalyze_btn)
+
         button_layout.addStretch()
         
         self.cancel_btn = PushButton("关闭")
@@ -191,13 +199,11 @@ class VideoCloneDialog(QDialog):
         """检查视频文件大小"""
         try:
             file_size = os.path.getsize(file_path)
-            # 20MB = 20 * 1024 * 1024 bytes
-            max_size = 20 * 1024 * 1024
-            
-            if file_size > max_size:
+            size_error = check_analysis_size(file_size)
+            if size_error:
                 InfoBar.error(
                     title='文件过大',
-                    content=f'视频文件大小为 {format_file_size(file_size)}，超过20MB限制',
+                    content=f'视频文件大小为 {format_file_size(file_size)}，{size_error}',
                     orient=Qt.Horizontal,  # type: ignore
                     isClosable=True,
                     position=InfoBarPosition.TOP,
@@ -238,7 +244,7 @@ class VideoCloneDialog(QDialog):
             # 自动开始分析
             self.start_analysis()
             
-    def start_analysis(self):
+    def start_analysis(self, use_cache=True):
         """开始分析视频"""
         # 检查视频文件
         if not self.video_path:
@@ -275,7 +281,8 @@ class VideoCloneDialog(QDialog):
         # 创建分析线程
         self.analysis_thread = VideoAnalysisThread(
             self.video_path,
-            api_key
+            api_key,
+            use_cache=use_cache
         )
         self.analysis_thread.progress.connect(self.on_analysis_progress)
         self.analysis_thread.result.connect(self.on_analysis_result)
@@ -286,6 +293,7 @@ class VideoCloneDialog(QDialog):
         """显示加载状态"""
         # 禁用操作按钮
         self.browse_btn.setEnabled(False)
+        self.reanalyze_btn.setEnabled(False)
         self.cancel_btn.setEnabled(False)
         self.drop_area.setReadOnly(True)
         # 无分辨率/时长控件
@@ -298,6 +306,7 @@ class VideoCloneDialog(QDialog):
         """隐藏加载状态"""
         # 启用操作按钮
         self.browse_btn.setEnabled(True)
+        self.reanalyze_btn.setEnabled(bool(self.video_path))
         self.cancel_btn.setEnabled(True)
         self.drop_area.setReadOnly(False)
         # 无分辨率/时长控件
@@ -316,27 +325,16 @@ class VideoCloneDialog(QDialog):
         
         # 处理结果
         if isinstance(result, list):
-            result_text = ""
-            for item in result:
-                # 构建按场景的详细文本（仅解析内容，无额外说明）
-                result_text += f"时间: {item.get('time', '')}\n"
-                result_text += f"内容: {item.get('content', '')}\n"
-                if item.get('style'):
-                    result_text += f"风格: {item.get('style', '')}\n"
-                if item.get('narration'):
-                    result_text += f"旁白: {item.get('narration', '')}\n"
-                if item.get('dialogue'):
-                    result_text += f"人物对话: {item.get('dialogue', '')}\n"
-                if item.get('audio'):
-                    result_text += f"音频/音乐: {item.get('audio', '')}\n"
-                result_text += "\n"
-                
+            # 构建按场景的详细文本（仅解析内容，无额外说明）
+            result_text = format_scenes_prompt(result)
+
             # 复制到剪切板
             self.copy_to_clipboard(result_text)
-                
+
+            from_cache = self.analysis_thread is not None and self.analysis_thread.from_cache
             InfoBar.success(
                 title='成功',
-                content=f'视频分析完成，结果已复制到剪切板',
+                content='已使用缓存的分析结果，结果已复制到剪切板' if from_cache else '视频分析完成，结果已复制到剪切板',
                 orient=Qt.Horizontal,  # type: ignore
                 isClosable=True,
                 position=InfoBarPosition.TOP,
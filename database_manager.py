@@ -5,15 +5,23 @@
 
 import sqlite3
 import json
+import atexit
 import os
+import time
 import sys
 import platform
 from constants import API_BASE_URL
 from pathlib import Path
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Sequence, Tuple
 from datetime import datetime
+from concurrent.futures import Future
 from loguru import logger
 
+from models.task_model import Task, ChatTask
+from models.goods_video_model import GoodsVideo
+from utils.db_writer import DatabaseWriter
+from utils.db_log_sink import BufferedDbLogSink
+
 
 class DatabaseManager:
     """数据库管理器"""
@@ -42,9 +50,28 @@ class DatabaseManager:
 
         # 检查和初始化数据库
         self._check_and_init_database()
+
+        # 单写线程：所有写操作经由队列在写线程中批量提交，读操作走各自的 WAL 读连接
+        self._writer = DatabaseWriter(self.db_path)
+        self._writer.start()
+
+        # logs 表的缓冲写入：add_log 与带 db_log 标记的 loguru 日志批量落库
+        self.log_sink = BufferedDbLogSink(self._writer.submit)
+        self.log_sink.start()
+        logger.add(
+            self.log_sink.write,
+            level="INFO",
+            format="{message}",
+            filter=lambda record: record["extra"].get("db_log", False)
+        )
+        atexit.register(self.close)
     
     def _get_app_data_dir(self) -> str:
-        """获取应用数据目录（跨平台兼容）"""
+        """获取应用数据目录（跨平台兼容）；设置环境变量 SORA2_DATA_DIR 时使用该目录（如基准测试）"""
+        override = os.environ.get("SORA2_DATA_DIR")
+        if override:
+            return override
+
         system = platform.system()
         
         if system == "Darwin":  # macOS
@@ -165,6 +192,9 @@ class DatabaseManager:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
+        # WAL 模式：读连接与写线程互不阻塞
+        cursor.execute('PRAGMA journal_mode=WAL')
+
         # 创建logs表（如果不存在）
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS logs (
@@ -182,13 +212,19 @@ class DatabaseManager:
         self.create_config_table()
         self.create_tasks_table()
         self.create_chat_tasks_table()
-        # 创建高清放大服务器表
+        # 创建高清放大服务器表与任务队列表
         self.create_upscale_servers_table()
+        self.create_upscale_jobs_table()
+        # 创建上传缓存表
+        self.create_upload_cache_table()
+        # 创建视频分析结果缓存表
+        self.create_analysis_cache_table()
         # 删除已废弃的带货视频表（如果存在）
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
             cursor.execute('DROP TABLE IF EXISTS goods_videos')
+            cursor.execute('DROP TABLE IF EXISTS goods_videos_fts')
             conn.commit()
             conn.close()
             logger.info("已删除废弃的 goods_videos 表（如存在）")
@@ -198,37 +234,60 @@ class DatabaseManager:
     def init_db(self):
         """公开的初始化数据库方法"""
         self._init_database()
+
+    def close(self):
+        """停止后台写入（先落库缓冲日志，再提交所有已排队的写操作）"""
+        self.log_sink.stop()
+        self._writer.stop()
+
+    def _write(self, op, error_msg: str, default: Any = None, wait: bool = True):
+        """把写操作交给写线程执行
+
+        op 接收写连接并返回结果；失败时记录 error_msg 并以 default 作为结果。
+        wait=True 时阻塞等待提交并返回结果，否则立即返回 Future（GUI 线程应使用此方式）。
+        """
+        result: Future = Future()
+
+        def _done(raw: Future):
+            try:
+                result.set_result(raw.result())
+            except Exception as e:
+                logger.error(f"{error_msg}: {e}")
+                result.set_result(default)
+
+        self._writer.submit(op).add_done_callback(_done)
+        if wait:
+            return result.result()
+        return result
+
+    @staticmethod
+    def _resolved(value: Any, wait: bool = True):
+        """无需写库时按 wait 约定直接返回结果"""
+        if wait:
+            return value
+        future: Future = Future()
+        future.set_result(value)
+        return future
     
   
   
     def add_log(self, level: str, message: str) -> bool:
-        """添加日志记录"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                INSERT INTO logs (level, message)
-                VALUES (?, ?)
-            ''', (level, message))
-
-            conn.commit()
-            conn.close()
-            return True
-        except Exception as e:
-            logger.error(f"添加日志失败: {e}")
-            return False
+        """添加日志记录（进入缓冲区，由后台批量写入，不阻塞调用方）"""
+        self.log_sink.add(level, message)
+        return True
 
     def get_logs(self, limit: int = 100) -> List[Dict[str, Any]]:
         """获取日志记录"""
         try:
+            # 读取前先把缓冲区中的日志落库
+            self.log_sink.flush(wait=True)
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
 
             cursor.execute('''
                 SELECT id, level, message, created_at
                 FROM logs
-                ORDER BY created_at DESC
+                ORDER BY created_at DESC, id DESC
                 LIMIT ?
             ''', (limit,))
 
@@ -249,23 +308,17 @@ class DatabaseManager:
             return []
 
     
-    def clear_logs(self) -> bool:
+    def clear_logs(self, wait: bool = True):
         """清空日志"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('DELETE FROM logs')
+        # 先把缓冲区排入写队列，保证清空后不会再写入旧日志
+        self.log_sink.flush()
 
-            conn.commit()
-            conn.close()
+        def op(conn):
+            conn.execute('DELETE FROM logs')
             logger.info("日志已清空")
             return True
-        except Exception as e:
-            logger.error(f"清空日志失败: {e}")
-            return False
+        return self._write(op, "清空日志失败", False, wait)
 
-    
     def create_config_table(self) -> bool:
         """创建config配置表"""
         try:
@@ -285,30 +338,7 @@ class DatabaseManager:
             ''')
 
             # 插入默认配置
-            default_configs = [
-                ('api_key', '', 'string', 'Sora API Key'),
-                ('api_base_url', API_BASE_URL, 'string', 'API Base URL'),
-                ('image_token', '1c17b11693cb5ec63859b091c5b9c1b2', 'string', '图床Token'),
-                ('default_model', 'sora-2', 'string', '默认模型'),
-                ('default_duration', '10', 'integer', '默认时长(秒)'),
-                ('add_task_default_resolution', '16:9', 'string', '添加任务默认分辨率'),
-                ('add_task_default_duration', '10', 'integer', '添加任务默认时长'),
-                ('auto_download', 'true', 'boolean', '自动下载视频'),
-                ('video_save_path', '', 'string', '视频保存路径'),
-                ('theme', 'auto', 'string', '主题设置(light/dark/auto)'),
-                # AI 标题相关默认配置
-                ('ai_title_enabled', 'false', 'boolean', 'AI标题开关'),
-                ('ai_title_prompt', '只返回一个中文视频标题，不要返回任何解释或额外内容；不使用引号、编号、前后缀；不换行；不超过30字，风格有趣吸引人', 'string', 'AI标题提示词'),
-                # 提示词设置默认值
-                ('main_image_prompt', '根据提供的商品主图生成标准电商白底图：\n- 背景：纯白(#FFFFFF)，干净无纹理；\n- 主体：保持原始外观与质感，不改变颜色与结构；\n- 抠图：边缘干净无锯齿，无残留背景；\n- 光线：均匀柔和，无明显阴影或色偏；\n- 构图：产品居中，适度留白，画面整洁；\n- 分辨率：至少 2048×2048；\n- 输出：PNG(透明背景)或JPEG(白底)，适合电商展示。', 'string', '主图处理提示词(白底图生成)'),
-                ('scene_generation_prompt', '请基于白底图与商品标题生成一个 15 秒的产品介绍视频脚本与镜头计划。要求：\n1) 产品简短描述与核心卖点(中文)。\n2) 旁白文案(中文、自然口语，节奏紧凑)。\n3) 背景音乐风格：轻快现代，音量不压旁白。\n4) 运镜设计：推进/摇移/环绕等，流畅自然。\n5) 时间轴划分为 2–3 个镜头，每个镜头标注【时长/画面内容/镜头运动/旁白/字幕】。\n6) 画面以白底图为核心，可加入品牌色点缀。\n7) 结尾包含行动号召(如“立即了解/购买”)。\n总时长严格控制在 15 秒。\n请按如下格式输出：\nShot 1（0–5s）：画面内容…｜镜头运动…｜旁白…｜字幕…\nShot 2（5–10s）：…\nShot 3（10–15s）：…', 'string', '场景生成提示词(15秒产品介绍)')
-            ]
-
-            for key, value, type_, desc in default_configs:
-                cursor.execute('''
-                    INSERT OR IGNORE INTO config (key, value, type, description)
-                    VALUES (?, ?, ?, ?)
-                ''', (key, value, type_, desc))
+            self._insert_default_configs(cursor)
 
             conn.commit()
             conn.close()
@@ -317,6 +347,58 @@ class DatabaseManager:
             logger.error(f"创建config表失败: {e}")
             return False
 
+    @staticmethod
+    def _default_configs() -> List[tuple]:
+        """默认配置项 (key, value, type, description)"""
+        return [
+            ('api_key', '', 'string', 'Sora API Key'),
+            ('api_base_url', API_BASE_URL, 'string', 'API Base URL'),
+            ('image_token', '1c17b11693cb5ec63859b091c5b9c1b2', 'string', '图床Token'),
+            ('default_model', 'sora-2', 'string', '默认模型'),
+            ('default_duration', '10', 'integer', '默认时长(秒)'),
+            ('add_task_default_resolution', '16:9', 'string', '添加任务默认分辨率'),
+            ('add_task_default_duration', '10', 'integer', '添加任务默认时长'),
+            ('auto_download', 'true', 'boolean', '自动下载视频'),
+            ('video_save_path', '', 'string', '视频保存路径'),
+            ('theme', 'auto', 'string', '主题设置(light/dark/auto)'),
+            ('upload_cache_ttl_hours', '24', 'integer', '图片上传缓存有效期(小时)'),
+            ('upload_compress_enabled', 'true', 'boolean', '上传前压缩图片'),
+            ('upload_max_dimension', '2048', 'integer', '上传图片最长边(像素)'),
+            ('upload_image_quality', '85', 'integer', '上传图片压缩质量(1-100)'),
+            ('upload_image_format', 'jpeg', 'string', '上传图片压缩格式(jpeg/webp)'),
+            ('upload_parallelism', '4', 'integer', '图片并行上传数'),
+            ('clone_analysis_workers', '3', 'integer', '批量克隆并发分析数'),
+            ('analysis_proxy_enabled', 'true', 'boolean', '分析前压缩视频'),
+            ('analysis_proxy_height', '480', 'integer', '分析代理视频最大高度(像素)'),
+            ('ffmpeg_parallelism', '0', 'integer', 'ffmpeg并行任务数(0为按CPU核数自动)'),
+            ('upscale_jobs_per_server', '2', 'integer', '高清放大每台服务器同时提交的任务数'),
+            ('upscale_segment_enabled', 'false', 'boolean', '高清放大长视频分段并行处理'),
+            ('upscale_workflow', 'sora2_up', 'string', '高清放大使用的工作流模板'),
+            # AI 标题相关默认配置
+            ('ai_title_enabled', 'false', 'boolean', 'AI标题开关'),
+            ('ai_title_prompt', '只返回一个中文视频标题，不要返回任何解释或额外内容；不使用引号、编号、前后缀；不换行；不超过30字，风格有趣吸引人', 'string', 'AI标题提示词'),
+            # 提示词设置默认值
+            ('main_image_prompt', '根据提供的商品主图生成标准电商白底图：\n- 背景：纯白(#FFFFFF)，干净无纹理；\n- 主体：保持原始外观与质感，不改变颜色与结构；\n- 抠图：边缘干净无锯齿，无残留背景；\n- 光线：均匀柔和，无明显阴影或色偏；\n- 构图：产品居中，适度留白，画面整洁；\n- 分辨率：至少 2048×2048；\n- 输出：PNG(透明背景)或JPEG(白底)，适合电商展示。', 'string', '主图处理提示词(白底图生成)'),
+            ('scene_generation_prompt', '请基于白底图与商品标题生成一个 15 秒的产品介绍视频脚本与镜头计划。要求：\n1) 产品简短描述与核心卖点(中文)。\n2) 旁白文案(中文、自然口语，节奏紧凑)。\n3) 背景音乐风格：轻快现代，音量不压旁白。\n4) 运镜设计：推进/摇移/环绕等，流畅自然。\n5) 时间轴划分为 2–3 个镜头，每个镜头标注【时长/画面内容/镜头运动/旁白/字幕】。\n6) 画面以白底图为核心，可加入品牌色点缀。\n7) 结尾包含行动号召(如“立即了解/购买”)。\n总时长严格控制在 15 秒。\n请按如下格式输出：\nShot 1（0–5s）：画面内容…｜镜头运动…｜旁白…｜字幕…\nShot 2（5–10s）：…\nShot 3（10–15s）：…', 'string', '场景生成提示词(15秒产品介绍)')
+        ]
+
+    def _insert_default_configs(self, cursor):
+        """插入缺失的默认配置（已存在的键保持不变）"""
+        for key, value, type_, desc in self._default_configs():
+            cursor.execute('''
+                INSERT OR IGNORE INTO config (key, value, type, description)
+                VALUES (?, ?, ?, ?)
+            ''', (key, value, type_, desc))
+
+    def reset_config(self, wait: bool = True):
+        """清空config表并恢复默认配置"""
+        def op(conn):
+            conn.execute('DELETE FROM config')
+            self._insert_default_configs(conn)
+            logger.info("配置已恢复默认")
+            return True
+        return self._write(op, "恢复默认配置失败", False, wait)
+
     def create_tasks_table(self) -> bool:
         """创建tasks任务表"""
         try:
@@ -350,6 +432,9 @@ class DatabaseManager:
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks(status)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at)')
 
+            # 提示词全文索引（由触发器与tasks表保持同步）
+            self._create_fts_index(cursor, 'tasks', 'prompt')
+
             conn.commit()
             conn.close()
             return True
@@ -357,6 +442,51 @@ class DatabaseManager:
             logger.error(f"创建tasks表失败: {e}")
             return False
 
+    def _create_fts_index(self, cursor, table: str, column: str):
+        """为 table.column 创建 FTS5 外部内容索引及同步触发器
+
+        优先使用 trigram 分词器（支持中文子串匹配），SQLite 不支持时退回默认分词器。
+        首次创建时会用现有数据重建索引。
+        """
+        fts = f"{table}_fts"
+        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (fts,))
+        exists = cursor.fetchone() is not None
+        if not exists:
+            try:
+                cursor.execute(f"""
+                    CREATE VIRTUAL TABLE {fts} USING fts5(
+                        {column}, content='{table}', content_rowid='id', tokenize='trigram'
+                    )
+                """)
+            except sqlite3.OperationalError:
+                logger.warning("SQLite 不支持 trigram 分词器，全文索引使用默认分词器")
+                cursor.execute(f"""
+                    CREATE VIRTUAL TABLE {fts} USING fts5(
+                        {column}, content='{table}', content_rowid='id'
+                    )
+                """)
+
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} ON {table} BEGIN
+                INSERT INTO {fts}({fts}, rowid, {column}) VALUES ('delete', old.id, old.{column});
+                INSERT INTO {fts}(rowid, {column}) VALUES (new.id, new.{column});
+            END
+        """)
+
+        if not exists:
+            cursor.execute(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+            logger.info(f"{fts} 全文索引已创建")
+
     def create_chat_tasks_table(self) -> bool:
         """创建chat_tasks表 - 记录Chat模式的任务"""
         try:
@@ -403,6 +533,20 @@ class DatabaseManager:
                 )
             ''')
 
+            # 调度器学习到的处理速度（秒/百万像素帧）与健康检查结果，早期版本的表没有这些列
+            cursor.execute('PRAGMA table_info(upscale_servers)')
+            columns = {row[1] for row in cursor.fetchall()}
+            for column, definition in (
+                ('seconds_per_mpf', 'REAL'),
+                ('health_state', "TEXT DEFAULT 'closed'"),  # 熔断状态 closed/open/half_open
+                ('consecutive_failures', 'INTEGER DEFAULT 0'),
+                ('latency_ms', 'REAL'),
+                ('last_error', 'TEXT'),
+                ('last_checked_at', 'TIMESTAMP'),
+            ):
+                if column not in columns:
+                    cursor.execute(f'ALTER TABLE upscale_servers ADD COLUMN {column} {definition}')
+
             # 为url建立唯一索引，避免重复配置同一地址
             cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_upscale_servers_url ON upscale_servers(url)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_upscale_servers_enabled ON upscale_servers(enabled)')
@@ -415,6 +559,55 @@ class DatabaseManager:
             logger.error(f"创建upscale_servers表失败: {e}")
             return False
 
+    def create_upscale_jobs_table(self) -> bool:
+        """创建高清放大任务队列表（程序关闭或停止处理后可以继续）"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+
+            # state: queued / uploading / running / downloading / done / failed
+            # running 与 downloading 状态记录服务器、prompt_id 与 client_id，重启后据此重新连接
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS upscale_jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    batch_id TEXT NOT NULL,
+                    row_index INTEGER NOT NULL,
+                    input_path TEXT NOT NULL,
+                    output_path TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'queued',
+                    server_url TEXT,
+                    prompt_id TEXT,
+                    client_id TEXT,
+                    error TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            # 输入文件哈希（按路径+大小+修改时间复用）与设置指纹：重新导入时识别已完成的任务，早期版本的表没有这些列
+            cursor.execute('PRAGMA table_info(upscale_jobs)')
+            columns = {row[1] for row in cursor.fetchall()}
+            for column, definition in (
+                ('input_hash', 'TEXT'),
+                ('input_size', 'INTEGER'),
+                ('input_mtime', 'REAL'),
+                ('fingerprint', 'TEXT'),
+            ):
+                if column not in columns:
+                    cursor.execute(f'ALTER TABLE upscale_jobs ADD COLUMN {column} {definition}')
+
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_upscale_jobs_batch ON upscale_jobs(batch_id, row_index)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_upscale_jobs_state ON upscale_jobs(state)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_upscale_jobs_input_path ON upscale_jobs(input_path)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_upscale_jobs_input_hash ON upscale_jobs(input_hash)')
+
+            conn.commit()
+            conn.close()
+            logger.info("upscale_jobs表创建成功")
+            return True
+        except Exception as e:
+            logger.error(f"创建upscale_jobs表失败: {e}")
+            return False
+
     def create_goods_videos_table(self) -> bool:
         """创建带货视频表"""
         try:
@@ -440,6 +633,9 @@ class DatabaseManager:
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_goods_videos_task_id ON goods_videos(task_id)')
             cursor.execute('CREATE INDEX IF NOT EXISTS idx_goods_videos_title ON goods_videos(title)')
 
+            # 标题全文索引
+            self._create_fts_index(cursor, 'goods_videos', 'title')
+
             conn.commit()
             conn.close()
             logger.info("goods_videos表创建成功")
@@ -450,108 +646,64 @@ class DatabaseManager:
 
     # === 带货视频 CRUD 方法 ===
     def add_goods_video(self, title: str, main_image: str = None, white_image: str = None,
-                        prompt: str = None, task_id: Optional[int] = None) -> Optional[int]:
+                        prompt: str = None, task_id: Optional[int] = None, wait: bool = True):
         """新增一条带货视频记录，返回插入的ID"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
+        def op(conn):
+            cursor = conn.execute('''
                 INSERT INTO goods_videos (title, main_image, white_image, prompt, task_id, created_at, updated_at)
                 VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
             ''', (title, main_image, white_image, prompt, task_id))
-            conn.commit()
             new_id = cursor.lastrowid
-            conn.close()
             logger.info(f"新增 goods_videos 记录: id={new_id}, title={title}")
             return int(new_id)
-        except Exception as e:
-            logger.error(f"新增 goods_videos 失败: {e}")
-            return None
+        return self._write(op, "新增 goods_videos 失败", None, wait)
 
-    def update_goods_video(self, goods_id: int, updates: Dict[str, Any]) -> bool:
+    def update_goods_video(self, goods_id: int, updates: Dict[str, Any], wait: bool = True):
         """根据ID更新带货视频记录，updates为要更新的字段字典"""
         if not updates:
-            return True
-        try:
-            # 允许更新的字段白名单
-            allowed = {"title", "main_image", "white_image", "prompt", "task_id", "updated_at"}
-            set_clauses = []
-            values: List[Any] = []
-            for k, v in updates.items():
-                if k in allowed and k != "updated_at":
-                    set_clauses.append(f"{k} = ?")
-                    values.append(v)
-            # 始终更新更新时间
-            set_clauses.append("updated_at = CURRENT_TIMESTAMP")
-            sql = f"UPDATE goods_videos SET {', '.join(set_clauses)} WHERE id = ?"
-            values.append(goods_id)
-
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute(sql, tuple(values))
-            conn.commit()
-            conn.close()
+            return self._resolved(True, wait)
+        # 允许更新的字段白名单
+        allowed = {"title", "main_image", "white_image", "prompt", "task_id", "updated_at"}
+        set_clauses = []
+        values: List[Any] = []
+        for k, v in updates.items():
+            if k in allowed and k != "updated_at":
+                set_clauses.append(f"{k} = ?")
+                values.append(v)
+        # 始终更新更新时间
+        set_clauses.append("updated_at = CURRENT_TIMESTAMP")
+        sql = f"UPDATE goods_videos SET {', '.join(set_clauses)} WHERE id = ?"
+        values.append(goods_id)
+
+        def op(conn):
+            conn.execute(sql, tuple(values))
             logger.info(f"更新 goods_videos 记录: id={goods_id}, updates={updates}")
             return True
-        except Exception as e:
-            logger.error(f"更新 goods_videos 失败: {e}")
-            return False
+        return self._write(op, "更新 goods_videos 失败", False, wait)
 
-    def get_goods_videos(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        """分页查询带货视频记录"""
+    def get_goods_videos(self, limit: int = 50, offset: int = 0,
+                         columns: Optional[Sequence[str]] = None) -> List[GoodsVideo]:
+        """分页查询带货视频记录（columns 为投影列）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, title, main_image, white_image, prompt, task_id, created_at, updated_at
+            return self._query_records(GoodsVideo, columns, '''
+                SELECT {columns}
                 FROM goods_videos
                 ORDER BY created_at DESC
                 LIMIT ? OFFSET ?
             ''', (limit, offset))
-            rows = cursor.fetchall()
-            conn.close()
-
-            result: List[Dict[str, Any]] = []
-            for r in rows:
-                result.append({
-                    'id': r[0],
-                    'title': r[1],
-                    'main_image': r[2],
-                    'white_image': r[3],
-                    'prompt': r[4],
-                    'task_id': r[5],
-                    'created_at': r[6],
-                    'updated_at': r[7],
-                })
-            return result
         except Exception as e:
             logger.error(f"查询 goods_videos 失败: {e}")
             return []
 
-    def get_goods_video_by_id(self, goods_id: int) -> Optional[Dict[str, Any]]:
+    def get_goods_video_by_id(self, goods_id: int) -> Optional[GoodsVideo]:
         """根据ID获取带货视频记录"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id, title, main_image, white_image, prompt, task_id, created_at, updated_at
+            rows = self._query_records(GoodsVideo, None, '''
+                SELECT {columns}
                 FROM goods_videos
                 WHERE id = ?
             ''', (goods_id,))
-            row = cursor.fetchone()
-            conn.close()
-            if not row:
-                return None
-            return {
-                'id': row[0],
-                'title': row[1],
-                'main_image': row[2],
-                'white_image': row[3],
-                'prompt': row[4],
-                'task_id': row[5],
-                'created_at': row[6],
-                'updated_at': row[7],
-            }
+            return rows[0] if rows else None
         except Exception as e:
             logger.error(f"获取 goods_videos 失败: {e}")
             return None
@@ -564,14 +716,16 @@ class DatabaseManager:
 
             if enabled_only:
                 cursor.execute('''
-                    SELECT id, name, url, enabled, created_at, updated_at
+                    SELECT id, name, url, enabled, created_at, updated_at, seconds_per_mpf,
+                           health_state, consecutive_failures, latency_ms, last_error, last_checked_at
                     FROM upscale_servers
                     WHERE enabled = 1
                     ORDER BY id ASC
                 ''')
             else:
                 cursor.execute('''
-                    SELECT id, name, url, enabled, created_at, updated_at
+                    SELECT id, name, url, enabled, created_at, updated_at, seconds_per_mpf,
+                           health_state, consecutive_failures, latency_ms, last_error, last_checked_at
                     FROM upscale_servers
                     ORDER BY id ASC
                 ''')
@@ -584,7 +738,13 @@ class DatabaseManager:
                     'url': row[2],
                     'enabled': bool(row[3]),
                     'created_at': row[4],
-                    'updated_at': row[5]
+                    'updated_at': row[5],
+                    'seconds_per_mpf': row[6],
+                    'health_state': row[7] or 'closed',
+                    'consecutive_failures': row[8] or 0,
+                    'latency_ms': row[9],
+                    'last_error': row[10],
+                    'last_checked_at': row[11]
                 })
 
             conn.close()
@@ -593,107 +753,373 @@ class DatabaseManager:
             logger.error(f"获取upscale服务器列表失败: {e}")
             return []
 
-    def add_upscale_server(self, name: str, url: str, enabled: bool = True) -> bool:
+    def add_upscale_server(self, name: str, url: str, enabled: bool = True, wait: bool = True):
         """添加高清放大服务器"""
+        def op(conn):
+            conn.execute('''
+                INSERT OR IGNORE INTO upscale_servers (name, url, enabled)
+                VALUES (?, ?, ?)
+            ''', (name, url, 1 if enabled else 0))
+            logger.info(f"添加高清放大服务器: {name} -> {url}")
+            return True
+        return self._write(op, "添加upscale服务器失败", False, wait)
+
+    def update_upscale_server(self, server_id: int, name: Optional[str] = None, url: Optional[str] = None,
+                              enabled: Optional[bool] = None, wait: bool = True):
+        """更新高清放大服务器"""
+        set_clauses = []
+        values: List[Any] = []
+
+        if name is not None:
+            set_clauses.append("name = ?")
+            values.append(name)
+        if url is not None:
+            set_clauses.append("url = ?")
+            values.append(url)
+        if enabled is not None:
+            set_clauses.append("enabled = ?")
+            values.append(1 if enabled else 0)
+
+        set_clauses.append("updated_at = CURRENT_TIMESTAMP")
+        values.append(server_id)
+
+        def op(conn):
+            conn.execute(f'''
+                UPDATE upscale_servers
+                SET {", ".join(set_clauses)}
+                WHERE id = ?
+            ''', values)
+            return True
+        return self._write(op, "更新upscale服务器失败", False, wait)
+
+    def update_upscale_server_speed(self, server_id: int, seconds_per_mpf: float, wait: bool = True):
+        """保存调度器学习到的服务器处理速度（秒/百万像素帧）"""
+        def op(conn):
+            conn.execute('UPDATE upscale_servers SET seconds_per_mpf = ? WHERE id = ?',
+                         (float(seconds_per_mpf), server_id))
+            return True
+        return self._write(op, "保存upscale服务器速度失败", False, wait)
+
+    def update_upscale_server_health(self, server_id: int, health_state: str, consecutive_failures: int,
+                                     latency_ms: Optional[float], last_error: Optional[str], wait: bool = True):
+        """保存服务器健康检查结果与熔断状态"""
+        def op(conn):
+            conn.execute('''
+                UPDATE upscale_servers
+                SET health_state = ?, consecutive_failures = ?, latency_ms = ?, last_error = ?,
+                    last_checked_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', (health_state, int(consecutive_failures), latency_ms, last_error, server_id))
+            return True
+        return self._write(op, "保存upscale服务器健康状态失败", False, wait)
+
+    def delete_upscale_server(self, server_id: int, wait: bool = True):
+        """删除高清放大服务器"""
+        def op(conn):
+            cursor = conn.execute('DELETE FROM upscale_servers WHERE id = ?', (server_id,))
+            return cursor.rowcount > 0
+        return self._write(op, "删除upscale服务器失败", False, wait)
+
+    def get_enabled_upscale_servers(self) -> List[Dict[str, Any]]:
+        """获取已启用的高清放大服务器列表"""
+        return self.get_upscale_servers(enabled_only=True)
+
+    def add_upscale_jobs(self, batch_id: str, jobs: List[Dict[str, Any]], wait: bool = True):
+        """
+        新建一批高清放大任务，返回各任务ID
+
+        每个任务包含 row_index、input_path、output_path，
+        可选 input_hash、input_size、input_mtime、fingerprint（设置指纹）。
+        """
+        def op(conn):
+            ids = []
+            for job in jobs:
+                cursor = conn.execute('''
+                    INSERT INTO upscale_jobs (batch_id, row_index, input_path, output_path,
+                                              input_hash, input_size, input_mtime, fingerprint)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (batch_id, job['row_index'], job['input_path'], job['output_path'], job.get('input_hash'),
+                      job.get('input_size'), job.get('input_mtime'), job.get('fingerprint')))
+                ids.append(cursor.lastrowid)
+            return ids
+        return self._write(op, "添加高清放大任务失败", [], wait)
+
+    def update_upscale_job(self, job_id: int, wait: bool = True, **fields):
+        """更新任务状态（state、server_url、prompt_id、client_id、error、fingerprint，传 None 表示清空）"""
+        allowed = ('state', 'server_url', 'prompt_id', 'client_id', 'error', 'fingerprint')
+        columns = [key for key in allowed if key in fields]
+        if not columns:
+            return self._resolved(False, wait)
+        values = [fields[key] for key in columns] + [job_id]
+
+        def op(conn):
+            conn.execute(f'''
+                UPDATE upscale_jobs
+                SET {", ".join(f"{key} = ?" for key in columns)}, updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', values)
+            return True
+        return self._write(op, "更新高清放大任务失败", False, wait)
+
+    def get_upscale_jobs(self, batch_id: str) -> List[Dict[str, Any]]:
+        """获取一批任务（按表格行排序）"""
         try:
             conn = sqlite3.connect(self.db_path)
+            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
-
             cursor.execute('''
-                INSERT OR IGNORE INTO upscale_servers (name, url, enabled)
-                VALUES (?, ?, ?)
-            ''', (name, url, 1 if enabled else 0))
+                SELECT id, batch_id, row_index, input_path, output_path, state, server_url, prompt_id,
+                       client_id, error, created_at, updated_at
+                FROM upscale_jobs
+                WHERE batch_id = ?
+                ORDER BY row_index ASC
+            ''', (batch_id,))
+            jobs = [dict(row) for row in cursor.fetchall()]
+            conn.close()
+            return jobs
+        except Exception as e:
+            logger.error(f"获取高清放大任务失败: {e}")
+            return []
 
-            conn.commit()
+    def get_upscale_input_hashes(self, paths: List[str]) -> Dict[str, Dict[str, Any]]:
+        """已记录的输入文件哈希：路径 -> {'hash', 'size', 'mtime'}（同一路径取最新记录）"""
+        result = {}
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            for start in range(0, len(paths), 500):
+                chunk = paths[start:start + 500]
+                cursor.execute(f'''
+                    SELECT input_path, input_hash, input_size, input_mtime
+                    FROM upscale_jobs
+                    WHERE input_hash IS NOT NULL AND input_path IN ({", ".join("?" * len(chunk))})
+                    ORDER BY id ASC
+                ''', chunk)
+                for path, file_hash, size, mtime in cursor.fetchall():
+                    result[path] = {'hash': file_hash, 'size': size, 'mtime': mtime}
             conn.close()
-            logger.info(f"添加高清放大服务器: {name} -> {url}")
-            return True
         except Exception as e:
-            logger.error(f"添加upscale服务器失败: {e}")
-            return False
+            logger.error(f"查询高清放大输入哈希失败: {e}")
+        return result
 
-    def update_upscale_server(self, server_id: int, name: Optional[str] = None, url: Optional[str] = None, enabled: Optional[bool] = None) -> bool:
-        """更新高清放大服务器"""
+    def get_upscale_done_outputs(self, input_hashes: List[str], fingerprint: str) -> Dict[str, List[str]]:
+        """相同输入内容与相同设置下已完成任务的输出：输入哈希 -> 输出路径列表"""
+        result: Dict[str, List[str]] = {}
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
+            for start in range(0, len(input_hashes), 500):
+                chunk = input_hashes[start:start + 500]
+                cursor.execute(f'''
+                    SELECT input_hash, output_path
+                    FROM upscale_jobs
+                    WHERE state = 'done' AND fingerprint = ? AND input_hash IN ({", ".join("?" * len(chunk))})
+                ''', [fingerprint] + chunk)
+                for file_hash, output_path in cursor.fetchall():
+                    result.setdefault(file_hash, []).append(output_path)
+            conn.close()
+        except Exception as e:
+            logger.error(f"查询已完成的高清放大任务失败: {e}")
+        return result
 
-            set_clauses = []
-            values: List[Any] = []
+    def is_upscale_output(self, path: str) -> bool:
+        """该文件是否是已完成任务的输出"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM upscale_jobs WHERE state = 'done' AND output_path = ? LIMIT 1", (path,))
+            row = cursor.fetchone()
+            conn.close()
+            return row is not None
+        except Exception as e:
+            logger.error(f"查询高清放大输出失败: {e}")
+            return False
 
-            if name is not None:
-                set_clauses.append("name = ?")
-                values.append(name)
-            if url is not None:
-                set_clauses.append("url = ?")
-                values.append(url)
-            if enabled is not None:
-                set_clauses.append("enabled = ?")
-                values.append(1 if enabled else 0)
+    def get_unfinished_upscale_batch(self) -> Optional[str]:
+        """最近一批仍有未完成任务的批次ID"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT batch_id FROM upscale_jobs
+                WHERE state NOT IN ('done', 'failed')
+                ORDER BY id DESC
+                LIMIT 1
+            ''')
+            row = cursor.fetchone()
+            conn.close()
+            return row[0] if row else None
+        except Exception as e:
+            logger.error(f"查询未完成的高清放大任务失败: {e}")
+            return None
 
-            set_clauses.append("updated_at = CURRENT_TIMESTAMP")
-            values.append(server_id)
+    def discard_upscale_batches(self, keep_batch_id: Optional[str] = None, wait: bool = True):
+        """删除其他批次中未成功的任务（开始新批次后旧批次不再继续），已完成的记录保留"""
+        def op(conn):
+            cursor = conn.execute('''
+                DELETE FROM upscale_jobs WHERE state != 'done' AND batch_id != ?
+            ''', (keep_batch_id or '',))
+            return cursor.rowcount
+        return self._write(op, "清理高清放大任务失败", 0, wait)
+
+    def create_analysis_cache_table(self) -> bool:
+        """创建视频分析结果缓存表（文件内容 SHA-256 + 分析版本 -> 场景与提示词）"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
 
-            if not set_clauses:
-                conn.close()
-                return True
+            # 早期版本以路径指纹为键，结构不同，缓存可直接丢弃重建
+            cursor.execute('PRAGMA table_info(analysis_cache)')
+            columns = {row[1] for row in cursor.fetchall()}
+            if columns and 'file_hash' not in columns:
+                cursor.execute('DROP TABLE analysis_cache')
 
-            cursor.execute(f'''
-                UPDATE upscale_servers
-                SET {", ".join(set_clauses)}
-                WHERE id = ?
-            ''', values)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    file_hash TEXT NOT NULL,
+                    analysis_version TEXT NOT NULL,
+                    file_path TEXT,
+                    result_json TEXT NOT NULL,
+                    prompt TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (file_hash, analysis_version)
+                )
+            ''')
 
             conn.commit()
             conn.close()
+            logger.info("analysis_cache表创建成功")
             return True
         except Exception as e:
-            logger.error(f"更新upscale服务器失败: {e}")
+            logger.error(f"创建analysis_cache表失败: {e}")
             return False
 
-    def delete_upscale_server(self, server_id: int) -> bool:
-        """删除高清放大服务器"""
+    def get_analysis_cache(self, file_hash: str, analysis_version: str) -> Optional[Dict[str, Any]]:
+        """查询视频分析缓存，返回 {'result': 场景列表, 'prompt': 提示词}"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
-            cursor.execute('DELETE FROM upscale_servers WHERE id = ?', (server_id,))
-            conn.commit()
+            cursor.execute(
+                'SELECT result_json, prompt FROM analysis_cache WHERE file_hash = ? AND analysis_version = ?',
+                (file_hash, analysis_version)
+            )
+            row = cursor.fetchone()
             conn.close()
-            return cursor.rowcount > 0
+            if not row:
+                return None
+            return {'result': json.loads(row[0]), 'prompt': row[1] or ''}
         except Exception as e:
-            logger.error(f"删除upscale服务器失败: {e}")
-            return False
+            logger.error(f"查询分析缓存失败: {e}")
+            return None
 
-    def get_enabled_upscale_servers(self) -> List[Dict[str, Any]]:
-        """获取已启用的高清放大服务器列表"""
-        return self.get_upscale_servers(enabled_only=True)
+    def save_analysis_cache(self, file_hash: str, analysis_version: str, file_path: str, result: Any,
+                            prompt: str, wait: bool = True):
+        """保存视频分析结果（同一文件的旧版本结果一并删除）"""
+        result_json = json.dumps(result, ensure_ascii=False)
 
-    def save_config(self, key: str, value: Any, type_: str = 'string', description: Optional[str] = None) -> bool:
-        """保存配置到config表"""
+        def op(conn):
+            conn.execute(
+                'DELETE FROM analysis_cache WHERE file_hash = ? AND analysis_version != ?',
+                (file_hash, analysis_version)
+            )
+            conn.execute('''
+                INSERT OR REPLACE INTO analysis_cache (file_hash, analysis_version, file_path, result_json, prompt)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (file_hash, analysis_version, file_path, result_json, prompt))
+            return True
+        return self._write(op, "保存分析缓存失败", False, wait)
+
+    def delete_analysis_cache(self, file_hash: Optional[str] = None, wait: bool = True):
+        """删除指定文件的分析缓存；file_hash 为空时清空全部，返回删除的条数"""
+        def op(conn):
+            if file_hash:
+                cursor = conn.execute('DELETE FROM analysis_cache WHERE file_hash = ?', (file_hash,))
+            else:
+                cursor = conn.execute('DELETE FROM analysis_cache')
+            return cursor.rowcount
+        return self._write(op, "删除分析缓存失败", 0, wait)
+
+    def create_upload_cache_table(self) -> bool:
+        """创建上传缓存表（文件内容 SHA-256 -> 远程URL）"""
         try:
             conn = sqlite3.connect(self.db_path)
             cursor = conn.cursor()
 
-            # 转换值为字符串
-            if isinstance(value, bool):
-                value_str = 'true' if value else 'false'
-            elif isinstance(value, (dict, list)):
-                value_str = json.dumps(value)
-            else:
-                value_str = str(value)
-
             cursor.execute('''
-                INSERT OR REPLACE INTO config (key, value, type, description, updated_at)
-                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
-            ''', (key, value_str, type_, description))
+                CREATE TABLE IF NOT EXISTS upload_cache (
+                    file_hash TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    size INTEGER,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    expires_at REAL NOT NULL
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_upload_cache_expires_at ON upload_cache(expires_at)')
 
             conn.commit()
             conn.close()
+            logger.info("upload_cache表创建成功")
             return True
         except Exception as e:
-            logger.error(f"保存配置失败: {e}")
+            logger.error(f"创建upload_cache表失败: {e}")
             return False
 
+    def get_upload_cache(self, file_hash: str) -> Optional[str]:
+        """查询未过期的上传缓存，返回远程URL"""
+        try:
+            conn = sqlite3.connect(self.db_path)
+            cursor = conn.cursor()
+            cursor.execute(
+                'SELECT url FROM upload_cache WHERE file_hash = ? AND expires_at > ?',
+                (file_hash, time.time())
+            )
+            row = cursor.fetchone()
+            conn.close()
+            return row[0] if row else None
+        except Exception as e:
+            logger.error(f"查询上传缓存失败: {e}")
+            return None
+
+    def save_upload_cache(self, file_hash: str, url: str, size: Optional[int] = None,
+                          ttl_seconds: float = 24 * 3600, wait: bool = True):
+        """记录上传结果，并顺带清理已过期的缓存"""
+        now = time.time()
+
+        def op(conn):
+            conn.execute('''
+                INSERT OR REPLACE INTO upload_cache (file_hash, url, size, expires_at)
+                VALUES (?, ?, ?, ?)
+            ''', (file_hash, url, size, now + ttl_seconds))
+            conn.execute('DELETE FROM upload_cache WHERE expires_at <= ?', (now,))
+            return True
+        return self._write(op, "保存上传缓存失败", False, wait)
+
+    def clear_upload_cache(self, wait: bool = True):
+        """清空上传缓存"""
+        def op(conn):
+            cursor = conn.execute('DELETE FROM upload_cache')
+            return cursor.rowcount
+        return self._write(op, "清空上传缓存失败", 0, wait)
+
+    def save_config(self, key: str, value: Any, type_: str = 'string', description: Optional[str] = None,
+                    wait: bool = True):
+        """保存配置到config表"""
+        # 转换值为字符串
+        if isinstance(value, bool):
+            value_str = 'true' if value else 'false'
+        elif isinstance(value, (dict, list)):
+            value_str = json.dumps(value)
+        else:
+            value_str = str(value)
+
+        def op(conn):
+            conn.execute('''
+                INSERT OR REPLACE INTO config (key, value, type, description, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (key, value_str, type_, description))
+            return True
+        return self._write(op, "保存配置失败", False, wait)
+
     def load_config(self, key: str, default: Any = None) -> Any:
         """从config表加载配置"""
         try:
@@ -724,139 +1150,156 @@ class DatabaseManager:
             logger.error(f"加载配置失败: {e}")
             return default
 
-    def add_task(self, task_data: Dict[str, Any]) -> bool:
+    def add_task(self, task_data: Dict[str, Any], wait: bool = True):
         """添加任务到tasks表"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            images_json = json.dumps(task_data.get('images', []))
-
-            cursor.execute('''
+        images_json = json.dumps(task_data.get('images', []))
+        params = (
+            task_data.get('task_id'),
+            task_data.get('prompt'),
+            task_data.get('model', 'sora-2'),
+            task_data.get('orientation', 'portrait'),
+            task_data.get('size', 'small'),
+            task_data.get('duration', 10),
+            images_json,
+            task_data.get('status', 'pending'),
+            task_data.get('progress', 0),
+            task_data.get('error_message')
+        )
+
+        def op(conn):
+            conn.execute('''
                 INSERT INTO tasks
                 (task_id, prompt, model, orientation, size, duration, images,
                  status, progress, error_message)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                task_data.get('task_id'),
-                task_data.get('prompt'),
-                task_data.get('model', 'sora-2'),
-                task_data.get('orientation', 'portrait'),
-                task_data.get('size', 'small'),
-                task_data.get('duration', 10),
-                images_json,
-                task_data.get('status', 'pending'),
-                task_data.get('progress', 0),
-                task_data.get('error_message')
-            ))
-
-            conn.commit()
-            conn.close()
+            ''', params)
             logger.info(f"添加任务成功: {task_data.get('task_id')}")
             return True
-        except Exception as e:
-            logger.error(f"添加任务失败: {e}")
-            return False
+        return self._write(op, "添加任务失败", False, wait)
+
+    def _query_records(self, record_cls, columns, sql: str, params: tuple = (),
+                       column_exprs: Optional[Dict[str, str]] = None) -> list:
+        """按投影列查询并通过 row_factory 直接生成行记录对象
 
-    def get_tasks(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
-        """获取任务列表"""
+        sql 中的 {columns} 占位符会替换为投影列表达式；column_exprs 用于联表时的列名映射。
+        """
+        cols = record_cls.columns(columns)
+        exprs = column_exprs or {}
+        select_list = ", ".join(exprs.get(c, c) for c in cols)
+        conn = sqlite3.connect(self.db_path)
         try:
-            conn = sqlite3.connect(self.db_path)
+            conn.row_factory = record_cls.row_factory(cols)
             cursor = conn.cursor()
+            cursor.execute(sql.format(columns=select_list), params)
+            return cursor.fetchall()
+        finally:
+            conn.close()
 
+    def get_tasks(self, status: Optional[str] = None, limit: int = 50,
+                  columns: Optional[Sequence[str]] = None) -> List[Task]:
+        """获取任务列表
+
+        Args:
+            status: 按状态过滤，None 表示全部
+            limit: 最大返回条数
+            columns: 投影列（如 ('task_id', 'status')），None 表示全部列
+        """
+        try:
             if status:
-                cursor.execute('''
-                    SELECT id, task_id, prompt, model, orientation, size, duration, images,
-                           video_url, thumbnail_url, status, error_message, progress,
-                           created_at, started_at, completed_at, updated_at
+                return self._query_records(Task, columns, '''
+                    SELECT {columns}
                     FROM tasks
                     WHERE status = ?
                     ORDER BY created_at DESC
                     LIMIT ?
                 ''', (status, limit))
-            else:
-                cursor.execute('''
-                    SELECT id, task_id, prompt, model, orientation, size, duration, images,
-                           video_url, thumbnail_url, status, error_message, progress,
-                           created_at, started_at, completed_at, updated_at
-                    FROM tasks
-                    ORDER BY created_at DESC
-                    LIMIT ?
-                ''', (limit,))
-
-            tasks = []
-            for row in cursor.fetchall():
-                task = {
-                    'id': row[0],
-                    'task_id': row[1],
-                    'prompt': row[2],
-                    'model': row[3],
-                    'orientation': row[4],
-                    'size': row[5],
-                    'duration': row[6],
-                    'images': json.loads(row[7]) if row[7] else [],
-                    'video_url': row[8],
-                    'thumbnail_url': row[9],
-                    'status': row[10],
-                    'error_message': row[11],
-                    'progress': row[12],
-                    'created_at': row[13],
-                    'started_at': row[14],
-                    'completed_at': row[15],
-                    'updated_at': row[16]
-                }
-                tasks.append(task)
-
-            conn.close()
-            return tasks
+            return self._query_records(Task, columns, '''
+                SELECT {columns}
+                FROM tasks
+                ORDER BY created_at DESC
+                LIMIT ?
+            ''', (limit,))
         except Exception as e:
             logger.error(f"获取任务失败: {e}")
             return []
 
-    def get_tasks_paginated(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
-        """获取任务列表（支持分页）"""
+    def get_tasks_paginated(self, limit: int = 50, offset: int = 0,
+                            columns: Optional[Sequence[str]] = None) -> List[Task]:
+        """获取任务列表（支持分页，columns 为投影列）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                SELECT id, task_id, prompt, model, orientation, size, duration, images,
-                       video_url, thumbnail_url, status, error_message, progress,
-                       created_at, started_at, completed_at, updated_at
+            return self._query_records(Task, columns, '''
+                SELECT {columns}
                 FROM tasks
                 ORDER BY created_at DESC
                 LIMIT ? OFFSET ?
             ''', (limit, offset))
-
-            tasks = []
-            for row in cursor.fetchall():
-                task = {
-                    'id': row[0],
-                    'task_id': row[1],
-                    'prompt': row[2],
-                    'model': row[3],
-                    'orientation': row[4],
-                    'size': row[5],
-                    'duration': row[6],
-                    'images': json.loads(row[7]) if row[7] else [],
-                    'video_url': row[8],
-                    'thumbnail_url': row[9],
-                    'status': row[10],
-                    'error_message': row[11],
-                    'progress': row[12],
-                    'created_at': row[13],
-                    'started_at': row[14],
-                    'completed_at': row[15],
-                    'updated_at': row[16]
-                }
-                tasks.append(task)
-
-            conn.close()
-            return tasks
         except Exception as e:
             logger.error(f"获取任务失败: {e}")
             return []
 
+    def search_tasks(self, query: str, status: Optional[str] = None, limit: int = 50,
+                     cursor: Optional[Tuple[str, int]] = None,
+                     columns: Optional[Sequence[str]] = None) -> Tuple[List[Task], Optional[Tuple[str, int]]]:
+        """按提示词全文搜索任务，结果按创建时间倒序
+
+        Args:
+            query: 搜索词，空白分隔的多个词之间为 AND 关系
+            status: 按状态过滤，None 表示全部
+            limit: 每页条数
+            cursor: 上一页返回的游标 (created_at, id)，None 表示第一页
+            columns: 投影列，None 表示全部列
+
+        Returns:
+            (任务列表, 下一页游标)；没有更多结果时游标为 None
+        """
+        terms = [t for t in (query or '').split() if t]
+        if not terms:
+            return [], None
+        try:
+            cols = list(Task.columns(columns))
+            # 游标需要 created_at 与 id
+            for key in ('created_at', 'id'):
+                if key not in cols:
+                    cols.append(key)
+
+            where: List[str] = []
+            params: List[Any] = []
+            # trigram 至少需要3个字符，更短的词用 LIKE 在候选集上过滤
+            fts_terms = [t for t in terms if len(t) >= 3]
+            like_terms = [t for t in terms if len(t) < 3]
+            if fts_terms:
+                where.append("t.id IN (SELECT rowid FROM tasks_fts WHERE tasks_fts MATCH ?)")
+                params.append(" AND ".join('"' + t.replace('"', '""') + '"' for t in fts_terms))
+            for t in like_terms:
+                where.append("t.prompt LIKE ? ESCAPE '\\'")
+                escaped = t.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+                params.append(f"%{escaped}%")
+            if status:
+                where.append("t.status = ?")
+                params.append(status)
+            if cursor:
+                where.append("(t.created_at < ? OR (t.created_at = ? AND t.id < ?))")
+                params.extend([cursor[0], cursor[0], cursor[1]])
+            params.append(limit + 1)
+
+            rows = self._query_records(Task, cols, f'''
+                SELECT {{columns}}
+                FROM tasks t
+                WHERE {" AND ".join(where)}
+                ORDER BY t.created_at DESC, t.id DESC
+                LIMIT ?
+            ''', tuple(params), column_exprs={c: f"t.{c}" for c in Task.FIELDS})
+
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                last = rows[-1]
+                next_cursor = (last.created_at, last.id)
+            return rows, next_cursor
+        except Exception as e:
+            logger.error(f"搜索任务失败: {e}")
+            return [], None
+
     def get_tasks_count(self) -> int:
         """获取任务总数"""
         try:
@@ -872,55 +1315,39 @@ class DatabaseManager:
             logger.error(f"获取任务总数失败: {e}")
             return 0
 
-    def update_task(self, task_id: str, updates: Dict[str, Any]) -> bool:
+    def update_task(self, task_id: str, updates: Dict[str, Any], wait: bool = True):
         """更新任务"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            set_clauses = []
-            values = []
+        set_clauses = []
+        values = []
 
-            for key, value in updates.items():
-                if key == 'images':
-                    value = json.dumps(value)
+        for key, value in updates.items():
+            if key == 'images':
+                value = json.dumps(value)
 
-                set_clauses.append(f"{key} = ?")
-                values.append(value)
+            set_clauses.append(f"{key} = ?")
+            values.append(value)
 
-            set_clauses.append("updated_at = CURRENT_TIMESTAMP")
-            values.append(task_id)
+        set_clauses.append("updated_at = CURRENT_TIMESTAMP")
+        values.append(task_id)
 
-            cursor.execute(f'''
+        def op(conn):
+            conn.execute(f'''
                 UPDATE tasks
                 SET {", ".join(set_clauses)}
                 WHERE task_id = ?
             ''', values)
-
-            conn.commit()
-            conn.close()
             logger.info(f"更新任务成功: {task_id}")
             return True
-        except Exception as e:
-            logger.error(f"更新任务失败: {e}")
-            return False
+        return self._write(op, "更新任务失败", False, wait)
 
-    def delete_task(self, task_id: str) -> bool:
+    def delete_task(self, task_id: str, wait: bool = True):
         """删除任务(同时会自动删除chat_tasks表中的关联记录)"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
+        def op(conn):
             # 先删除chat_tasks表中的记录(如果存在)
-            cursor.execute('DELETE FROM chat_tasks WHERE task_id = ?', (task_id,))
-            chat_deleted = cursor.rowcount
-            
-            # 再删除tasks表中的记录
-            cursor.execute('DELETE FROM tasks WHERE task_id = ?', (task_id,))
-            tasks_deleted = cursor.rowcount
+            chat_deleted = conn.execute('DELETE FROM chat_tasks WHERE task_id = ?', (task_id,)).rowcount
 
-            conn.commit()
-            conn.close()
+            # 再删除tasks表中的记录
+            tasks_deleted = conn.execute('DELETE FROM tasks WHERE task_id = ?', (task_id,)).rowcount
 
             if tasks_deleted > 0:
                 if chat_deleted > 0:
@@ -931,29 +1358,19 @@ class DatabaseManager:
             else:
                 logger.warning(f"未找到要删除的任务: {task_id}")
                 return False
-        except Exception as e:
-            logger.error(f"删除任务失败: {e}")
-            return False
-    
-    def add_chat_task(self, task_id: str, model: str) -> bool:
-        """添加Chat模式任务记录"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
+        return self._write(op, "删除任务失败", False, wait)
 
-            cursor.execute('''
+    def add_chat_task(self, task_id: str, model: str, wait: bool = True):
+        """添加Chat模式任务记录"""
+        def op(conn):
+            conn.execute('''
                 INSERT OR IGNORE INTO chat_tasks (task_id, model)
                 VALUES (?, ?)
             ''', (task_id, model))
-
-            conn.commit()
-            conn.close()
             logger.info(f"Chat任务记录已添加: {task_id} (model: {model})")
             return True
-        except Exception as e:
-            logger.error(f"添加Chat任务记录失败: {e}")
-            return False
-    
+        return self._write(op, "添加Chat任务记录失败", False, wait)
+
     def is_chat_task(self, task_id: str) -> bool:
         """检查是否为Chat模式任务"""
         try:
@@ -969,59 +1386,41 @@ class DatabaseManager:
             logger.error(f"检查Chat任务状态失败: {e}")
             return False
     
-    def get_chat_tasks(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """获取所有Chat模式任务列表"""
+    def get_chat_tasks(self, limit: int = 50, columns: Optional[Sequence[str]] = None) -> List[ChatTask]:
+        """获取所有Chat模式任务列表（columns 为投影列）"""
         try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('''
-                SELECT ct.task_id, ct.model, ct.created_at,
-                       t.prompt, t.status, t.video_url
+            return self._query_records(ChatTask, columns, '''
+                SELECT {columns}
                 FROM chat_tasks ct
                 LEFT JOIN tasks t ON ct.task_id = t.task_id
                 ORDER BY ct.created_at DESC
                 LIMIT ?
-            ''', (limit,))
-
-            columns = ['task_id', 'model', 'created_at', 'prompt', 'status', 'video_url']
-            chat_tasks = []
-            
-            for row in cursor.fetchall():
-                task = dict(zip(columns, row))
-                chat_tasks.append(task)
-
-            conn.close()
-            return chat_tasks
+            ''', (limit,), column_exprs={
+                'task_id': 'ct.task_id',
+                'model': 'ct.model',
+                'created_at': 'ct.created_at',
+                'prompt': 't.prompt',
+                'status': 't.status',
+                'video_url': 't.video_url',
+            })
         except Exception as e:
             logger.error(f"获取Chat任务列表失败: {e}")
             return []
 
-    def clear_tasks(self) -> bool:
+    def clear_tasks(self, wait: bool = True):
         """清空所有任务"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            cursor.execute('DELETE FROM tasks')
-
-            conn.commit()
-            conn.close()
+        def op(conn):
+            conn.execute('DELETE FROM tasks')
             logger.info("所有任务已清空")
             return True
-        except Exception as e:
-            logger.error(f"清空任务失败: {e}")
-            return False
+        return self._write(op, "清空任务失败", False, wait)
 
-    def delete_completed_tasks(self) -> int:
+    def delete_completed_tasks(self, wait: bool = True):
         """删除所有状态为 completed 和 failed 的任务，同时清理关联的 chat_tasks 记录。
         返回删除的任务数量。"""
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
+        def op(conn):
             # 先删除关联的 chat_tasks 记录（若未启用外键约束，手动清理）
-            cursor.execute('''
+            conn.execute('''
                 DELETE FROM chat_tasks
                 WHERE task_id IN (
                     SELECT task_id FROM tasks WHERE status IN ('completed', 'failed')
@@ -1029,17 +1428,11 @@ class DatabaseManager:
             ''')
 
             # 再删除已完成/失败的任务
-            cursor.execute("DELETE FROM tasks WHERE status IN ('completed', 'failed')")
-            deleted_count = cursor.rowcount
-
-            conn.commit()
-            conn.close()
+            deleted_count = conn.execute("DELETE FROM tasks WHERE status IN ('completed', 'failed')").rowcount
 
             logger.info(f"已删除 {deleted_count} 条已完成/失败任务")
             return deleted_count
-        except Exception as e:
-            logger.error(f"删除已完成任务失败: {e}")
-            return 0
+        return self._write(op, "删除已完成任务失败", 0, wait)
 
     def get_task_statistics(self) -> Dict[str, int]:
         """获取任务统计信息"""
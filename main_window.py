@@ -70,8 +70,12 @@ from utils.file_utils import open_folder, open_file_location, format_file_size
 from utils.log_utils import pack_logs, get_log_file_count
 from utils.db_utils import check_database_health, get_database_info
 from utils.api_utils import extract_video_url_from_response, parse_api_error
+from utils.qt_future import watch_future
 from constants import GITEE_RELEASES_URL
 
+# 关闭窗口时等待后台线程退出的最长时间（秒）
+CLOSE_WAIT_SECONDS = 3
+
 
 class MainWindow(FluentWindow):
     """主窗口"""
@@ -144,6 +148,14 @@ class MainWindow(FluentWindow):
             self.global_thread_pool.shutdown(wait=False)
             logger.info("全局线程池已关闭")
         
+        # 取消下载、高清放大与批量分析：线程在一秒左右内自行退出并清理临时文件
+        threads = (self.task_interface.shutdown() + self.upscale_interface.shutdown()
+                   + self.batch_clone_interface.shutdown())
+        deadline = time.monotonic() + CLOSE_WAIT_SECONDS
+        for t in threads:
+            if not t.wait(max(0, int((deadline - time.monotonic()) * 1000))):
+                logger.warning(f"线程未能在关闭窗口前退出: {t}")
+
         # 停止视频生成线程
         if self._video_thread and self._video_thread.isRunning():
             self._video_thread.quit()
@@ -406,11 +418,9 @@ class MainWindow(FluentWindow):
     def on_task_created(self, task_id: str, task_data: Dict[str, Any]):
         """任务创建成功回调"""
         try:
-            # 保存任务到数据库
-            db_manager.add_task(task_data)
-            
-            # 刷新任务列表
-            self.task_interface.load_tasks()
+            # 保存任务到数据库（写线程提交后再刷新任务列表）
+            future = db_manager.add_task(task_data, wait=False)
+            watch_future(future, lambda _: self.task_interface.load_tasks(), self)
             
             logger.info(f"任务已保存到数据库: {task_id}")
 
@@ -449,10 +459,10 @@ class MainWindow(FluentWindow):
                     'video_url': video_url,
                     'completed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 }
-                db_manager.update_task(task_id, updates)
-                
-                # 刷新任务列表
-                self.task_interface.load_tasks()
+                future = db_manager.update_task(task_id, updates, wait=False)
+
+                # 提交后刷新任务列表
+                watch_future(future, lambda _: self.task_interface.load_tasks(), self)
         else:
             InfoBar.error(
                 title='生成失败',
@@ -470,10 +480,10 @@ class MainWindow(FluentWindow):
                     'status': 'failed',
                     'completed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                 }
-                db_manager.update_task(task_id, updates)
-                
-                # 刷新任务列表
-                self.task_interface.load_tasks()
+                future = db_manager.update_task(task_id, updates, wait=False)
+
+                # 提交后刷新任务列表
+                watch_future(future, lambda _: self.task_interface.load_tasks(), self)
 
     def on_image_loaded(self, image_url: str, pixmap: QPixmap):
         """图片加载完成回调"""
@@ -509,10 +519,10 @@ class MainWindow(FluentWindow):
                         'video_url': video_url,
                         'completed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                     }
-                    db_manager.update_task(task_id, updates)
-                    
-                    # 刷新任务列表
-                    self.task_interface.load_tasks()
+                    future = db_manager.update_task(task_id, updates, wait=False)
+
+                    # 提交后刷新任务列表
+                    watch_future(future, lambda _: self.task_interface.load_tasks(), self)
             else:
                 InfoBar.error(
                     title='生成失败',
@@ -530,10 +540,10 @@ class MainWindow(FluentWindow):
                         'status': 'failed',
                         'completed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                     }
-                    db_manager.update_task(task_id, updates)
-                    
-                    # 刷新任务列表
-                    self.task_interface.load_tasks()
+                    future = db_manager.update_task(task_id, updates, wait=False)
+
+                    # 提交后刷新任务列表
+                    watch_future(future, lambda _: self.task_interface.load_tasks(), self)
 
         except Exception as e:
             logger.error(f"处理Chat任务结果失败: {e}")
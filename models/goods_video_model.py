@@ -0,0 +1,11 @@
+"""
+带货视频数据模型
+"""
+
+from models.record import Record
+
+
+class GoodsVideo(Record):
+    """goods_videos 表的行记录"""
+    FIELDS = ('id', 'title', 'main_image', 'white_image', 'prompt', 'task_id', 'created_at', 'updated_at')
+    __slots__ = FIELDS
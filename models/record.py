@@ -0,0 +1,81 @@
+"""
+轻量级行记录基类
+
+数据库读路径不再为每行构造字典，而是通过 sqlite3 的 row_factory
+直接生成带 __slots__ 的记录对象，只保存查询时投影的列。
+为兼容现有的 task.get('xxx') 写法，提供与字典一致的 get / [] / in 访问。
+"""
+
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+
+class Record:
+    """带 __slots__ 的行记录基类，子类通过 FIELDS 声明全部可用列"""
+    __slots__ = ()
+
+    # 子类覆盖：表中可投影的列（按默认查询顺序）
+    FIELDS: Tuple[str, ...] = ()
+
+    @classmethod
+    def columns(cls, columns: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+        """校验并返回投影列，None 表示全部列"""
+        if columns is None:
+            return cls.FIELDS
+        cols = tuple(columns)
+        unknown = [c for c in cols if c not in cls.FIELDS]
+        if unknown:
+            raise ValueError(f"{cls.__name__} 不支持的列: {unknown}")
+        return cols
+
+    @classmethod
+    def row_factory(cls, columns: Tuple[str, ...]):
+        """生成 sqlite3 的 row_factory，按 columns 顺序填充槽位"""
+        slots = tuple(cls._slot_name(c) for c in columns)
+        new = cls.__new__
+
+        def factory(cursor, row):
+            obj = new(cls)
+            for name, value in zip(slots, row):
+                object.__setattr__(obj, name, value)
+            return obj
+
+        return factory
+
+    @classmethod
+    def _slot_name(cls, column: str) -> str:
+        """列名到槽位名的映射，子类可重写（如需延迟解码的列）"""
+        return column
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """与 dict.get 一致：未投影的列返回默认值"""
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            return default
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __contains__(self, key: str) -> bool:
+        if key not in self.FIELDS:
+            return False
+        try:
+            getattr(self, key)
+            return True
+        except AttributeError:
+            return False
+
+    def keys(self) -> Tuple[str, ...]:
+        """已投影的列名"""
+        return tuple(k for k in self.FIELDS if k in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为普通字典（仅包含已投影的列）"""
+        return {k: getattr(self, k) for k in self.keys()}
+
+    def __repr__(self) -> str:
+        body = ", ".join(f"{k}={getattr(self, k)!r}" for k in self.keys())
+        return f"{type(self).__name__}({body})"
@@ -2,10 +2,13 @@
 任务数据模型
 """
 
+import json
 from dataclasses import dataclass, field
 from typing import List, Optional
 from datetime import datetime
 
+from models.record import Record
+
 @dataclass
 class TaskModel:
     """任务模型"""
@@ -29,4 +32,38 @@ class TaskModel:
 
     def __post_init__(self):
         if self.images is None:
-            self.images = []
\ No newline at end of file
+            self.images = []
+
+class Task(Record):
+    """tasks 表的轻量级行记录（DB 层与 UI 共用）
+
+    images 列以原始 JSON 字符串保存，访问 task.images 时才解码。
+    """
+    FIELDS = (
+        'id', 'task_id', 'prompt', 'model', 'orientation', 'size', 'duration', 'images',
+        'video_url', 'thumbnail_url', 'status', 'error_message', 'progress',
+        'created_at', 'started_at', 'completed_at', 'updated_at'
+    )
+    __slots__ = tuple('_images' if f == 'images' else f for f in FIELDS)
+
+    @classmethod
+    def _slot_name(cls, column: str) -> str:
+        return '_images' if column == 'images' else column
+
+    @property
+    def images(self) -> List[str]:
+        raw = self._images
+        if not raw:
+            return []
+        if isinstance(raw, str):
+            try:
+                return json.loads(raw)
+            except ValueError:
+                return []
+        return list(raw)
+
+
+class ChatTask(Record):
+    """chat_tasks 关联 tasks 的行记录"""
+    FIELDS = ('task_id', 'model', 'created_at', 'prompt', 'status', 'video_url')
+    __slots__ = FIELDS
@@ -0,0 +1,100 @@
+"""
+批量图片上传线程
+
+一个线程负责一整批图片：内部按配置的并发数并行上传，所有文件共用一个会话（连接池），
+逐个文件报告字节进度与结果，整批结束后发出汇总信号。
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Optional
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from loguru import logger
+
+from database_manager import db_manager
+from utils.cancellation import CancelToken
+from utils.file_upload import create_session, upload_image
+
+DEFAULT_PARALLELISM = 4
+
+
+class BatchUploadThread(QThread):
+    """批量图片上传线程"""
+    file_progress = pyqtSignal(int, int, int)  # index, bytes_sent, total_bytes
+    file_finished = pyqtSignal(int, bool, str, str)  # index, success, message, image_url
+    progress = pyqtSignal(int, int, int)  # 已完成文件数, 文件总数, 整批进度百分比
+    finished = pyqtSignal(int, int, list)  # succeeded, failed, urls（按输入顺序，失败为空字符串）
+
+    def __init__(self, file_paths: List[str], parallelism: Optional[int] = None):
+        super().__init__()
+        self.file_paths = list(file_paths)
+        if parallelism is None:
+            parallelism = db_manager.load_config('upload_parallelism', DEFAULT_PARALLELISM)
+        try:
+            parallelism = int(parallelism)
+        except (TypeError, ValueError):
+            parallelism = DEFAULT_PARALLELISM
+        self.parallelism = max(1, min(parallelism, 16))
+        self.cancel_token = CancelToken()
+        # 每个文件的完成比例，用于计算整批进度
+        self._fractions = [0.0] * len(self.file_paths)
+        self._fraction_sum = 0.0
+        self._done = 0
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """取消：尚未开始的文件不再上传，正在上传的文件在发送下一个数据块前中止"""
+        self.cancel_token.cancel()
+
+    def _upload_one(self, index: int, session) -> str:
+        if self.cancel_token.cancelled:
+            raise RuntimeError("上传已取消")
+        return upload_image(self.file_paths[index], session,
+                            progress=lambda sent, total: self._on_file_progress(index, sent, total),
+                            cancelled=self.cancel_token)
+
+    def _on_file_progress(self, index: int, sent: int, total: int):
+        self.file_progress.emit(index, sent, total)
+        self._update_fraction(index, sent / total if total else 1.0)
+
+    def _update_fraction(self, index: int, fraction: float):
+        with self._lock:
+            self._fraction_sum += fraction - self._fractions[index]
+            self._fractions[index] = fraction
+            percent = int(self._fraction_sum * 100 / len(self._fractions))
+            done = self._done
+        self.progress.emit(done, len(self.file_paths), percent)
+
+    def run(self):
+        total = len(self.file_paths)
+        urls = [''] * total
+        succeeded = failed = 0
+        if not total:
+            self.finished.emit(0, 0, urls)
+            return
+
+        logger.info(f"开始批量上传 {total} 张图片，并发数 {self.parallelism}")
+        session = create_session(self.parallelism)
+        try:
+            with ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix="upload") as pool:
+                futures = {pool.submit(self._upload_one, i, session): i for i in range(total)}
+                for future in as_completed(futures):
+                    index = futures[future]
+                    try:
+                        url = future.result()
+                        urls[index] = url
+                        succeeded += 1
+                        self.file_finished.emit(index, True, "图片上传成功", url)
+                    except Exception as e:
+                        failed += 1
+                        logger.error(f"图片上传失败: {self.file_paths[index]} - {e}")
+                        self.file_finished.emit(index, False, str(e), "")
+                    with self._lock:
+                        self._done += 1
+                    self._update_fraction(index, 1.0)
+        finally:
+            session.close()
+
+        logger.info(f"批量上传完成：成功 {succeeded}，失败 {failed}")
+        self.finished.emit(succeeded, failed, urls)
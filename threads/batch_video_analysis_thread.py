@@ -0,0 +1,166 @@
+"""
+批量视频分析线程
+
+在一个线程内并发调度整批视频的“压缩 → 上传 → 分析”：
+- 上传与分析分别使用各自的工作线程池，形成流水线：
+  第 N 个视频在等待分析结果时，第 N+1 个视频已经在上传
+- 已上传但尚未分析的视频数量受限，避免上传远远跑在分析前面
+- 每个视频完成即通过信号回传结果，界面按到达顺序更新
+- 结果按文件内容哈希写入 analysis_cache 表，同一文件再次分析时直接读取缓存
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set, Tuple
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from loguru import logger
+
+from database_manager import db_manager
+from threads.video_analysis_thread import ANALYSIS_VERSION, analyze_video_url, format_scenes_prompt
+from utils.cancellation import CancelToken, Cancelled
+from utils.file_upload import UploadCancelled, create_session, upload_file
+from utils.file_utils import file_sha256
+from utils.video_proxy import prepare_analysis_video
+
+DEFAULT_WORKERS = 3
+
+
+class BatchVideoAnalysisThread(QThread):
+    """批量视频分析线程"""
+    item_status = pyqtSignal(int, str)  # index, 状态文本
+    item_result = pyqtSignal(int, object, str, bool)  # index, 场景列表, 提示词, 是否来自缓存
+    item_error = pyqtSignal(int, str)  # index, 错误信息
+    finished = pyqtSignal(int, int)  # succeeded, failed
+
+    def __init__(self, items: List[Tuple[int, str]], api_key: str, workers: Optional[int] = None,
+                 use_cache: bool = True, refresh: Optional[Set[int]] = None):
+        """
+        Args:
+            items: (索引, 视频路径) 列表，索引原样回传给界面
+            api_key: 分析接口的 API Key
+            workers: 上传与分析各自的并发数，默认读取配置 clone_analysis_workers
+            use_cache: False 时忽略已有缓存重新分析
+            refresh: 需要重新分析的索引，先删除其已有缓存
+        """
+        super().__init__()
+        self.items = list(items)
+        self.api_key = api_key
+        self.use_cache = use_cache
+        self.refresh = set(refresh or ())
+        if workers is None:
+            workers = db_manager.load_config('clone_analysis_workers', DEFAULT_WORKERS)
+        try:
+            workers = int(workers)
+        except (TypeError, ValueError):
+            workers = DEFAULT_WORKERS
+        self.workers = max(1, min(workers, 8))
+        self.cancel_token = CancelToken()
+        self._lock = threading.Lock()
+        self._succeeded = 0
+        self._failed = 0
+        self._upload_percent = {}
+
+    def cancel(self):
+        """停止调度新视频，并中止正在进行的上传"""
+        self.cancel_token.cancel()
+
+    def _count(self, ok: bool):
+        with self._lock:
+            if ok:
+                self._succeeded += 1
+            else:
+                self._failed += 1
+
+    def _on_upload_progress(self, index: int, sent: int, total: int):
+        percent = sent * 100 // total if total else 100
+        if self._upload_percent.get(index) != percent:
+            self._upload_percent[index] = percent
+            self.item_status.emit(index, f"上传中 {percent}%")
+
+    def _upload(self, index: int, path: str, file_hash: str, slots, analysis_pool, session):
+        try:
+            self.item_status.emit(index, "压缩中")
+            upload_path = prepare_analysis_video(path, cancelled=self.cancel_token)
+            self.item_status.emit(index, "上传中")
+            video_url = upload_file(
+                upload_path, session,
+                progress=lambda sent, total: self._on_upload_progress(index, sent, total),
+                cancelled=self.cancel_token,
+                timeout=300
+            )
+        except UploadCancelled:
+            self.item_error.emit(index, "已取消")
+            slots.release()
+            return
+        except Exception as e:
+            logger.error(f"视频上传失败: {path} - {e}")
+            self._count(False)
+            self.item_error.emit(index, f"上传失败: {e}")
+            slots.release()
+            return
+        # 上传完成后立即交给分析线程池，上传线程继续处理下一个视频
+        self.item_status.emit(index, "等待分析")
+        analysis_pool.submit(self._analyze, index, path, file_hash, video_url, slots, session)
+
+    def _analyze(self, index: int, path: str, file_hash: str, video_url: str, slots, session):
+        try:
+            if self.cancel_token.cancelled:
+                self.item_error.emit(index, "已取消")
+                return
+            self.item_status.emit(index, "分析中")
+            scenes = analyze_video_url(video_url, self.api_key, session, cancelled=self.cancel_token)
+            prompt = format_scenes_prompt(scenes)
+            db_manager.save_analysis_cache(file_hash, ANALYSIS_VERSION, path, scenes, prompt, wait=False)
+            self._count(True)
+            self.item_result.emit(index, scenes, prompt, False)
+        except Cancelled:
+            self.item_error.emit(index, "已取消")
+        except Exception as e:
+            logger.error(f"视频分析失败: {path} - {e}")
+            self._count(False)
+            self.item_error.emit(index, f"视频分析失败: {e}")
+        finally:
+            slots.release()
+
+    def run(self):
+        logger.info(f"开始批量分析 {len(self.items)} 个视频，并发数 {self.workers}")
+        # 同时在途（上传中/待分析/分析中）的视频数上限：每个分析线程最多预取一个
+        slots = threading.Semaphore(self.workers * 2)
+        session = create_session(self.workers * 2)
+        try:
+            # 退出 with 时先等待上传池（其中会继续向分析池提交），再等待分析池
+            with ThreadPoolExecutor(self.workers, thread_name_prefix="clone-analyze") as analysis_pool, \
+                    ThreadPoolExecutor(self.workers, thread_name_prefix="clone-upload") as upload_pool:
+                for index, path in self.items:
+                    if self.cancel_token.cancelled:
+                        break
+                    try:
+                        file_hash = file_sha256(path)
+                    except OSError as e:
+                        self._count(False)
+                        self.item_error.emit(index, f"读取文件失败: {e}")
+                        continue
+
+                    if index in self.refresh:
+                        db_manager.delete_analysis_cache(file_hash, wait=False)
+                        cached = None
+                    else:
+                        cached = db_manager.get_analysis_cache(file_hash, ANALYSIS_VERSION) if self.use_cache else None
+                    if cached:
+                        self._count(True)
+                        self.item_result.emit(index, cached['result'], cached['prompt'], True)
+                        continue
+
+                    while not slots.acquire(timeout=0.2):
+                        if self.cancel_token.cancelled:
+                            break
+                    if self.cancel_token.cancelled:
+                        break
+                    self.item_status.emit(index, "排队上传")
+                    upload_pool.submit(self._upload, index, path, file_hash, slots, analysis_pool, session)
+        finally:
+            session.close()
+
+        logger.info(f"批量分析结束：成功 {self._succeeded}，失败 {self._failed}")
+        self.finished.emit(self._succeeded, self._failed)
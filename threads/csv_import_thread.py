@@ -0,0 +1,68 @@
+"""
+CSV 流式导入线程
+
+在后台线程中嗅探编码、按块解析并校验数据行，每解析完一块就通过信号
+交给界面追加到表格模型中，导入几万行的表格时界面也不会卡顿。
+"""
+
+from typing import Any, Callable, List, Optional
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from loguru import logger
+
+from utils.cancellation import CancelToken
+from utils.csv_stream import CsvChunkReader
+
+# 表头校验：返回错误信息，None 表示通过
+HeaderCheck = Callable[[List[str]], Optional[str]]
+# 行解析：接收 (表头, 数据行)，返回要交给界面的记录；返回 None 表示跳过该行
+RowParser = Callable[[List[str], List[str]], Any]
+
+
+class CsvImportThread(QThread):
+    """CSV 流式导入线程"""
+    progress = pyqtSignal(int, int)  # bytes_read, total_bytes
+    chunk_ready = pyqtSignal(list)  # 已解析的一块记录
+    finished = pyqtSignal(bool, str, int)  # success, message, row_count
+
+    def __init__(self, file_path: str, parse_row: RowParser, header_check: Optional[HeaderCheck] = None,
+                 chunk_size: int = 500):
+        super().__init__()
+        self.file_path = file_path
+        self.parse_row = parse_row
+        self.header_check = header_check
+        self.chunk_size = chunk_size
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def run(self):
+        count = 0
+        try:
+            with CsvChunkReader(self.file_path) as reader:
+                logger.info(f"开始导入CSV: {self.file_path} (编码: {reader.encoding})")
+                header = reader.header
+                if not header:
+                    self.finished.emit(False, 'CSV文件内容为空或格式不正确', 0)
+                    return
+                if self.header_check:
+                    error = self.header_check(header)
+                    if error:
+                        self.finished.emit(False, error, 0)
+                        return
+
+                for rows in reader.chunks(self.chunk_size):
+                    if self.cancel_token.cancelled:
+                        self.finished.emit(False, '导入已取消', count)
+                        return
+                    items = [item for item in (self.parse_row(header, row) for row in rows) if item is not None]
+                    count += len(items)
+                    self.chunk_ready.emit(items)
+                    self.progress.emit(reader.bytes_read, reader.total_bytes)
+
+            logger.info(f"CSV导入完成，共 {count} 行")
+            self.finished.emit(True, f'已导入 {count} 条记录', count)
+        except Exception as e:
+            logger.error(f"CSV导入失败: {e}")
+            self.finished.emit(False, f'解析CSV文件失败: {e}', count)
@@ -110,19 +110,14 @@ class GoodsVideoPipelineThread(QThread):
         self.progress.emit(msg)
         logger.info(msg)
 
+    # 带 db_log 标记的日志同时写入日志文件与 logs 表（批量异步落库）
+    _db_logger = logger.bind(db_log=True)
+
     def _log_info(self, msg: str):
-        try:
-            db_manager.add_log('INFO', f"[GoodsPipeline] {msg}")
-        except Exception:
-            pass
-        logger.info(msg)
+        self._db_logger.info(f"[GoodsPipeline] {msg}")
 
     def _log_error(self, msg: str):
-        try:
-            db_manager.add_log('ERROR', f"[GoodsPipeline] {msg}")
-        except Exception:
-            pass
-        logger.error(msg)
+        self._db_logger.error(f"[GoodsPipeline] {msg}")
 
     def run(self):
         try:
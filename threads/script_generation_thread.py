@@ -10,6 +10,7 @@ import requests
 from constants import API_CHAT_COMPLETIONS_URL
 from PyQt5.QtCore import QThread, pyqtSignal
 from database_manager import db_manager
+from utils.cancellation import CancelToken
 
 
 class ScriptGenerationThread(QThread):
@@ -24,10 +25,10 @@ class ScriptGenerationThread(QThread):
         self.aspect_ratio = aspect_ratio
         self.duration = duration
         self.count = count
-        self._running = True
+        self.cancel_token = CancelToken()
 
     def stop(self):
-        self._running = False
+        self.cancel_token.cancel()
 
     def run(self):
         try:
@@ -56,7 +57,7 @@ class ScriptGenerationThread(QThread):
             scene_prompt = scene_prompt.replace('{aspect_ratio}', self.aspect_ratio).replace('{duration}', str(self.duration))
 
             for i in range(self.count):
-                if not self._running:
+                if self.cancel_token.cancelled:
                     break
                 payload = {
                     'model': 'gpt-5-chat-latest',
@@ -74,6 +75,8 @@ class ScriptGenerationThread(QThread):
                 }
 
                 resp = requests.post(base_url, json=payload, headers=headers, timeout=60)
+                if self.cancel_token.cancelled:
+                    break
                 if resp.status_code != 200:
                     self.error.emit(f'提示词生成失败: {resp.status_code} - {resp.text}')
                     continue
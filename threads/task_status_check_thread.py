@@ -9,6 +9,7 @@ from loguru import logger
 from sora_client import SoraClient
 from constants import API_BASE_URL
 from database_manager import db_manager
+from utils.cancellation import CancelToken
 
 class TaskStatusCheckThread(QThread):
     """任务状态检查线程"""
@@ -16,23 +17,25 @@ class TaskStatusCheckThread(QThread):
 
     def __init__(self):
         super().__init__()
-        self.running = True
+        self.cancel_token = CancelToken()
         self.check_interval = 10  # 10秒检查一次
 
     def run(self):
         """循环检查未完成的任务状态"""
-        while self.running:
+        while not self.cancel_token.cancelled:
             try:
                 # 只获取未完成的任务（排除已完成和失败的任务）
                 # 先获取进行中的任务
-                processing_tasks = db_manager.get_tasks(status='processing', limit=50)
+                # 轮询只需要 task_id 与 status 两列
+                poll_columns = ('task_id', 'status')
+                processing_tasks = db_manager.get_tasks(status='processing', limit=50, columns=poll_columns)
                 # 再获取待处理的任务
-                pending_tasks = db_manager.get_tasks(status='pending', limit=50)
+                pending_tasks = db_manager.get_tasks(status='pending', limit=50, columns=poll_columns)
                 # 合并任务列表
                 tasks = processing_tasks + pending_tasks
 
                 for task in tasks:
-                    if not self.running:
+                    if self.cancel_token.cancelled:
                         break
 
                     task_id = task.get('task_id')
@@ -152,16 +155,13 @@ class TaskStatusCheckThread(QThread):
                         except Exception as e:
                             logger.error(f"检查任务 {task_id} 状态失败: {e}")
 
-                # 等待下一次检查
-                for _ in range(self.check_interval):
-                    if not self.running:
-                        break
-                    self.sleep(1)
+                # 等待下一次检查（停止时立即返回）
+                self.cancel_token.wait(self.check_interval)
 
             except Exception as e:
                 logger.error(f"任务状态检查线程出错: {e}")
-                self.sleep(5)  # 出错时等待5秒再重试
+                self.cancel_token.wait(5)  # 出错时等待5秒再重试
 
     def stop(self):
         """停止线程"""
-        self.running = False
+        self.cancel_token.cancel()
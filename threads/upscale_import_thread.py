@@ -0,0 +1,38 @@
+"""
+高清放大导入线程
+
+在后台扫描视频文件夹并计算文件哈希，识别已完成的输出与重复的输入，
+导入大文件夹时界面不会卡顿。
+"""
+
+from typing import Optional
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from loguru import logger
+
+from utils.cancellation import CancelToken
+from utils.upscale_import import plan_import
+
+
+class UpscaleImportThread(QThread):
+    """扫描高清放大视频文件夹"""
+    progress = pyqtSignal(int, int)  # 已检查的视频数, 视频总数
+    finished = pyqtSignal(object, str)  # ImportPlan（失败或取消时为 None）, 错误信息
+
+    def __init__(self, folder: str, fingerprint: Optional[str]):
+        super().__init__()
+        self.folder = folder
+        self.fingerprint = fingerprint
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        self.cancel_token.cancel()
+
+    def run(self):
+        try:
+            plan = plan_import(self.folder, self.fingerprint, progress=self.progress.emit,
+                               cancelled=self.cancel_token)
+            self.finished.emit(plan, "")
+        except Exception as e:
+            logger.error(f"扫描视频文件夹失败: {self.folder} - {e}")
+            self.finished.emit(None, str(e))
@@ -0,0 +1,35 @@
+"""
+分段放大结果拼接线程
+"""
+
+from typing import List
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from loguru import logger
+
+from utils.cancellation import CancelToken
+from utils.video_segments import concat_segments
+
+
+class UpscaleMergeThread(QThread):
+    """按顺序拼接放大后的各段，并复制原视频的音轨"""
+    finished = pyqtSignal(bool, str)  # success, message
+
+    def __init__(self, segment_paths: List[str], source_path: str, output_path: str):
+        super().__init__()
+        self.segment_paths = list(segment_paths)
+        self.source_path = source_path
+        self.output_path = output_path
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        """结束 ffmpeg 子进程，不留下不完整的输出文件"""
+        self.cancel_token.cancel()
+
+    def run(self):
+        try:
+            concat_segments(self.segment_paths, self.source_path, self.output_path, cancelled=self.cancel_token)
+            self.finished.emit(True, "分段拼接完成")
+        except Exception as e:
+            logger.error(f"分段拼接失败: {self.output_path} - {e}")
+            self.finished.emit(False, f"分段拼接失败: {str(e)}")
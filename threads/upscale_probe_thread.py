@@ -0,0 +1,89 @@
+"""
+高清放大调度前的探测线程
+
+- 读取每个视频的分辨率、帧率与时长，估算任务工作量（ffmpeg 只解析文件头）
+- 并行查询每台 ComfyUI 服务器的 /queue 与 /system_stats
+- 分段模式下，把工作量过大的长视频按关键帧切成多段（复制码流），以便多台服务器并行处理
+调度器本身只在 GUI 线程中运行，网络与 ffmpeg 调用都放在这里完成。
+"""
+
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Sequence, Tuple
+
+from PyQt5.QtCore import QThread, pyqtSignal
+from loguru import logger
+
+from utils.cancellation import CancelToken
+from utils.ffmpeg_jobs import probe_video_info
+from utils.file_upload import create_session
+from utils.upscale_scheduler import estimate_work, query_server_load, segment_counts
+from utils.video_segments import split_video
+
+
+class UpscaleProbeThread(QThread):
+    """探测视频工作量与服务器负载"""
+    # works: {index: 百万像素帧或None}, loads: {url: ServerLoad},
+    # segments: {index: (帧率, [VideoSegment])}（只包含已切分的视频）
+    probed = pyqtSignal(object, object, object)
+
+    def __init__(self, server_urls: Sequence[str], videos: Sequence[Tuple[int, str]] = (), scale: int = 2,
+                 segment: bool = False):
+        super().__init__()
+        self.server_urls = list(server_urls)
+        self.videos = list(videos)
+        self.scale = scale
+        self.segment = segment
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        """停止切分（已切分的临时文件会被删除）"""
+        self.cancel_token.cancel()
+
+    def run(self):
+        works = {}
+        loads = {}
+        session = create_session(max(1, len(self.server_urls)))
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, min(8, len(self.server_urls))),
+                                    thread_name_prefix="upscale-probe") as pool:
+                futures = {url: pool.submit(query_server_load, session, url) for url in self.server_urls}
+                for index, path in self.videos:
+                    works[index] = estimate_work(path, self.scale)
+                for url, future in futures.items():
+                    loads[url] = future.result()
+        except Exception as e:
+            logger.error(f"探测高清放大任务失败: {e}")
+        finally:
+            session.close()
+
+        segments = {}
+        if self.segment and self.videos:
+            reachable = sum(1 for load in loads.values() if load.reachable)
+            paths = dict(self.videos)
+            for index, count in segment_counts(works, reachable).items():
+                if self.cancel_token.cancelled:
+                    break
+                segments.update(self._split(index, paths[index], count))
+        if self.cancel_token.cancelled:
+            for _, parts in segments.values():
+                shutil.rmtree(os.path.dirname(parts[0].path), ignore_errors=True)
+            return
+        self.probed.emit(works, loads, segments)
+
+    def _split(self, index: int, path: str, count: int) -> dict:
+        info = probe_video_info(path)
+        if not info:
+            return {}
+        work_dir = tempfile.mkdtemp(prefix='upscale_segments_')
+        try:
+            parts = split_video(path, count, info.fps, work_dir, cancelled=self.cancel_token)
+        except Exception as e:
+            logger.warning(f"视频分段失败，整段处理: {path} - {e}")
+            parts = []
+        if not parts:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return {index: (info.fps, parts)} if parts else {}
+
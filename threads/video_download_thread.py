@@ -8,6 +8,7 @@ from PyQt5.QtCore import QThread, pyqtSignal
 from loguru import logger
 from pathlib import Path
 from database_manager import db_manager
+from utils.cancellation import Cancelled, CancelToken
 from utils.title_utils import generate_ai_title, sanitize_filename
 
 class VideoDownloadThread(QThread):
@@ -21,10 +22,18 @@ class VideoDownloadThread(QThread):
         self.save_path = save_path
         self.api_key = api_key
         self.task_prompt = task_prompt
+        self.cancel_token = CancelToken()
+
+    def cancel(self):
+        """取消下载（在写入下一个数据块前生效，删除未下载完的文件）"""
+        self.cancel_token.cancel()
 
     def run(self):
         """执行下载"""
+        part_path = None
         try:
+            # 在线程池中排队时可能已被取消
+            self.cancel_token.check()
             logger.info(f"开始下载视频: {self.video_url}")
             self.progress.emit('正在下载视频...')
 
@@ -47,7 +56,9 @@ class VideoDownloadThread(QThread):
             
             # 使用普通requests下载视频，不带特殊认证头
             logger.info(f"发送下载请求到: {self.video_url}")
-            response = requests.get(self.video_url, stream=True, timeout=300)  # 5分钟超时
+            self.cancel_token.check()
+            # 连接超时10秒；读取超时按单个数据块计算，取消时最多等待一个数据块
+            response = requests.get(self.video_url, stream=True, timeout=(10, 60))
             response.raise_for_status()
             
             # 获取文件大小
@@ -61,8 +72,11 @@ class VideoDownloadThread(QThread):
             # 确保保存目录存在
             os.makedirs(os.path.dirname(self.save_path), exist_ok=True)
             
-            with open(self.save_path, 'wb') as f:
+            # 先写入 .part 临时文件，下载完成后再替换为目标文件，取消或失败时不留下不完整的视频
+            part_path = self.save_path + '.part'
+            with response, open(part_path, 'wb') as f:
                 for chunk in response.iter_content(chunk_size=8192):
+                    self.cancel_token.check()
                     if chunk:
                         f.write(chunk)
                         downloaded_size += len(chunk)
@@ -72,13 +86,24 @@ class VideoDownloadThread(QThread):
                             progress_mb = downloaded_size // (1024 * 1024)
                             total_mb = total_size // (1024 * 1024) if total_size > 0 else '?'
                             logger.info(f"已下载: {progress_mb}MB / {total_mb}MB")
+            os.replace(part_path, self.save_path)
+            part_path = None
             
             logger.info(f"视频下载完成: {self.save_path}")
             file_size = os.path.getsize(self.save_path)
             logger.info(f"最终文件大小: {file_size} bytes")
             self.finished.emit(True, '视频下载完成', self.save_path)
                 
+        except Cancelled as e:
+            logger.info(f"视频下载已取消: {self.video_url}")
+            self.finished.emit(False, str(e), '')
         except Exception as e:
             error_msg = f'下载出错: {str(e)}'
             logger.error(f"下载失败: URL={self.video_url}, 错误={e}")
             self.finished.emit(False, error_msg, '')
+        finally:
+            if part_path and os.path.exists(part_path):
+                try:
+                    os.remove(part_path)
+                except OSError:
+                    pass
@@ -1,91 +1,116 @@
 """
 子线程：批量移除视频首帧（覆盖原视频）
+
+每个文件优先使用智能剪切（只重新编码第一个 GOP，见 utils/video_trim）；
+多个 ffmpeg 子进程并行处理：并行数按 CPU 核数与每个任务的编码线程数计算，
+每个文件的进度取自 ffmpeg `-progress` 输出；取消时结束所有正在运行的 ffmpeg。
 """
 
 import os
-import subprocess
-from typing import List
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
 from PyQt5.QtCore import QThread, pyqtSignal
 from loguru import logger
-import imageio_ffmpeg
+
+from utils.cancellation import CancelToken
+from utils.ffmpeg_jobs import FfmpegCancelled, ffmpeg_parallelism
+from utils.video_trim import DEFAULT_PRESET, remove_first_frame
+
+# 每个 ffmpeg 任务的 libx264 编码线程数
+THREADS_PER_JOB = 2
 
 
 class VideoFirstFrameRemovalThread(QThread):
     """批量移除视频首帧（覆盖原文件）"""
     progress = pyqtSignal(str)  # 进度消息
+    item_progress = pyqtSignal(str, int)  # path, 百分比
+    overall_progress = pyqtSignal(int, int, int)  # 已完成文件数, 文件总数, 整批进度百分比
     item_finished = pyqtSignal(bool, str, str)  # success, path, error
     finished_summary = pyqtSignal(int, int)  # total, success_count
 
-    def __init__(self, file_paths: List[str]):
+    def __init__(self, file_paths: List[str], parallelism: Optional[int] = None,
+                 preset: str = DEFAULT_PRESET, smart_cut: bool = True):
         super().__init__()
-        self.file_paths = file_paths
+        self.file_paths = list(file_paths)
+        self.parallelism = parallelism or ffmpeg_parallelism(THREADS_PER_JOB, len(self.file_paths))
+        self.preset = preset
+        self.smart_cut = smart_cut
+        self.modes: List[Optional[str]] = [None] * len(self.file_paths)  # 每个文件实际使用的方式
+        self.cancel_token = CancelToken()
+        self._lock = threading.Lock()
+        self._fractions = [0.0] * len(self.file_paths)
+        self._percents = [-1] * len(self.file_paths)
+        self._done = 0
 
-    def run(self):
-        total = len(self.file_paths)
-        logger.info(f"首帧移除任务启动，总文件数: {total}")
-        success_count = 0
-        for idx, path in enumerate(self.file_paths, start=1):
-            try:
-                self.progress.emit(f"[{idx}/{total}] 处理: {os.path.basename(path)}")
-                logger.info(f"开始处理[{idx}/{total}] 文件: {path}")
-                if not os.path.isfile(path):
-                    logger.warning(f"文件不存在: {path}")
-                    raise FileNotFoundError("文件不存在")
+    def cancel(self):
+        """停止处理：未开始的文件不再处理，正在运行的 ffmpeg 被结束（原文件保持不变）"""
+        self.cancel_token.cancel()
 
-                # 输出到临时文件，然后覆盖原文件
-                tmp_out = path + ".tmp.mp4"
+    def _on_fraction(self, index: int, fraction: float):
+        percent = int(fraction * 100)
+        with self._lock:
+            self._fractions[index] = fraction
+            if percent == self._percents[index]:
+                return
+            self._percents[index] = percent
+            overall = int(sum(self._fractions) * 100 / len(self._fractions))
+            done = self._done
+        self.item_progress.emit(self.file_paths[index], percent)
+        self.overall_progress.emit(done, len(self.file_paths), overall)
 
-                # ffmpeg命令：移除第一帧视频并重置时间戳
-                # -y 覆盖输出；-hide_banner 减少日志；-loglevel error 仅输出错误
-                ffmpeg_exe = imageio_ffmpeg.get_ffmpeg_exe()
-                cmd = [
-                    ffmpeg_exe,
-                    "-hide_banner",
-                    "-loglevel", "error",
-                    "-y",
-                    "-i", path,
-                    "-vf", "select='not(eq(n,0))',setpts=PTS-STARTPTS",
-                    "-af", "asetpts=PTS-STARTPTS",
-                    "-c:v", "libx264",
-                    "-c:a", "aac",
-                    "-movflags", "+faststart",
-                    tmp_out
-                ]
-                logger.debug(f"执行ffmpeg命令: {' '.join(cmd)}")
+    def _process(self, index: int) -> bool:
+        path = self.file_paths[index]
+        if self.cancel_token.cancelled:
+            return False
+        tmp_out = path + ".tmp.mp4"
+        try:
+            logger.info(f"开始处理[{index + 1}/{len(self.file_paths)}] 文件: {path}")
+            if not os.path.isfile(path):
+                logger.warning(f"文件不存在: {path}")
+                raise FileNotFoundError("文件不存在")
 
-                proc = subprocess.run(cmd, capture_output=True, text=True)
-                if proc.returncode != 0:
-                    err = (proc.stderr or "ffmpeg执行失败").strip()
-                    logger.error(f"ffmpeg处理失败 code={proc.returncode} file={path} err={err}")
-                    # 清理临时文件
-                    if os.path.exists(tmp_out):
-                        try:
-                            os.remove(tmp_out)
-                        except Exception:
-                            pass
-                    self.item_finished.emit(False, path, err)
-                    continue
+            # 优先只重新编码第一个 GOP，其余码流直接复制；不满足条件时整段重新编码
+            mode = remove_first_frame(
+                path, tmp_out, THREADS_PER_JOB,
+                progress=lambda fraction: self._on_fraction(index, fraction),
+                cancelled=self.cancel_token,
+                preset=self.preset,
+                smart_cut=self.smart_cut
+            )
+            self.modes[index] = mode
 
-                # 覆盖原文件
+            # 覆盖原文件
+            os.replace(tmp_out, path)
+            logger.info(f"首帧移除成功({'智能剪切' if mode == 'smart' else '整段编码'}): {path}")
+            self.item_finished.emit(True, path, "")
+            return True
+        except FfmpegCancelled:
+            logger.info(f"首帧移除已取消: {path}")
+            self.item_finished.emit(False, path, "已取消")
+            return False
+        except Exception as e:
+            logger.error(f"首帧移除失败 file={path} err={e}")
+            self.item_finished.emit(False, path, str(e))
+            return False
+        finally:
+            # 失败或取消时清理临时文件
+            if os.path.exists(tmp_out):
                 try:
-                    os.replace(tmp_out, path)
-                except Exception as e:
-                    logger.error(f"覆盖原文件失败 file={path} err={e}")
-                    # 回滚：删除临时文件
-                    if os.path.exists(tmp_out):
-                        try:
-                            os.remove(tmp_out)
-                        except Exception:
-                            pass
-                    self.item_finished.emit(False, path, str(e))
-                    continue
-
-                success_count += 1
-                logger.info(f"首帧移除成功: {path}")
-                self.item_finished.emit(True, path, "")
-            except Exception as e:
-                logger.exception(f"处理异常 file={path} err={e}")
-                self.item_finished.emit(False, path, str(e))
+                    os.remove(tmp_out)
+                except Exception:
+                    pass
+            with self._lock:
+                self._done += 1
+            self._on_fraction(index, 1.0)
 
+    def run(self):
+        total = len(self.file_paths)
+        logger.info(f"首帧移除任务启动，总文件数: {total}，并行数: {self.parallelism}")
+        self.progress.emit(f"开始处理 {total} 个视频（并行 {self.parallelism} 个）")
+        with ThreadPoolExecutor(max_workers=self.parallelism, thread_name_prefix="first-frame") as pool:
+            results = list(pool.map(self._process, range(total)))
+        success_count = sum(results)
         logger.info(f"首帧移除任务完成: 成功/总 = {success_count}/{total}")
         self.finished_summary.emit(total, success_count)
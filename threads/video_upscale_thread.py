@@ -2,224 +2,236 @@
 视频高清放大线程
 """
 
-import json
 import time
-import requests
 from pathlib import Path
+
+import requests
 from PyQt5.QtCore import QThread, pyqtSignal
 
+from database_manager import db_manager
+from utils.cancellation import CancelToken
+from utils.comfyui_client import ComfyUIClient, ComfyUIError, execution_seconds
+from utils.file_upload import create_session
+from utils.upscale_scheduler import JOB_DOWNLOADING, JOB_QUEUED, JOB_RUNNING, JOB_UPLOADING
+from utils.workflow_templates import WorkflowTemplate, workflow_registry
+
 class VideoUpscaleThread(QThread):
     """视频高清放大线程"""
     progress = pyqtSignal(str)
     finished = pyqtSignal(bool, str, str)  # success, message, output_path
 
-    def __init__(self, video_path, output_path, mode, scale, comfyui_server):
+    def __init__(self, video_path, output_path, mode, scale, comfyui_server, frame_rate=None,
+                 template: WorkflowTemplate = None, job_id: int = None, resume_prompt_id: str = None,
+                 resume_client_id: str = None):
         super().__init__()
         self.video_path = video_path
         self.output_path = output_path
         self.mode = mode
         self.scale = scale
         self.comfyui_server = comfyui_server
+        # 分段任务使用原视频帧率输出，保证各段拼接后时间轴连续
+        self.frame_rate = frame_rate
+        # 本批次选择的工作流模板（已解析，每个任务深拷贝一份）
+        self.template = template
+        # 持久化任务：记录上传/执行/下载状态；resume_prompt_id 为上次运行时已提交的任务，优先重新连接
+        self.job_id = job_id
+        self.resume_prompt_id = resume_prompt_id
+        self.resume_client_id = resume_client_id
+        self.reattached = False  # 是否沿用了上次提交的任务（未重新提交）
+        # 供调度器学习服务器速度：任务进入服务器队列的时间与服务器报告的执行时长
+        self.queued_at = None
+        self.execution_seconds = None
+        # 失败原因分类，供调度器决定是否熔断服务器、是否换服务器重试
+        self.server_fault = False
+        self.retryable = False
+        # 不使用系统代理（ComfyUI 服务器通常在局域网内）
+        self.session = create_session(2)
+        self._transfer_percent = -1
+        # 协作式取消：上传/下载分块、websocket 接收与轮询等待都会检查令牌
+        self.cancel_token = CancelToken()
+        self.prompt_id = None  # 当前等待的服务器任务，取消时从服务器队列删除或中断
+        self.detached = False  # 程序退出时停止等待，服务器上的任务保留给下次启动重新连接
+
+    def cancel(self):
+        """请求停止（线程稍后自行退出并取消服务器上的任务）"""
+        self.cancel_token.cancel()
+
+    def detach(self):
+        """程序退出时停止线程，但不取消服务器上的任务、不改写保存的状态，下次启动时重新连接"""
+        self.detached = True
+        self.cancel_token.cancel()
 
     def _base(self):
         return (self.comfyui_server or "").rstrip('/')
 
     def run(self):
         """执行高清放大"""
+        client = None
         try:
             self.progress.emit("开始高清放大处理...")
             
-            # 读取sora2_up.json模板
-            template_path = Path(__file__).parent.parent / "sora2_up.json"
-            if not template_path.exists():
-                self.finished.emit(False, "sora2_up.json模板文件不存在", "")
-                return
-                
-            # 读取模板文件
-            with open(template_path, 'r', encoding='utf-8') as f:
-                workflow = json.load(f)
-                
-            # 修改模板参数
-            # 设置视频文件路径
-            video_filename = Path(self.video_path).name
-            workflow["14"]["inputs"]["video"] = video_filename  # 节点14是VHS_LoadVideo
-            
-            # 设置模式和放大系数 (节点11是FlashVSRNode)
-            workflow["11"]["inputs"]["mode"] = self.mode
-            workflow["11"]["inputs"]["scale"] = self.scale
-            
-            # 设置输出文件名前缀 (节点12是VHS_VideoCombine)
-            output_prefix = Path(self.output_path).stem
-            workflow["12"]["inputs"]["filename_prefix"] = output_prefix
-            
-            # 上传视频文件到ComfyUI (使用正确的API端点)
-            self.progress.emit("正在上传视频文件...")
-            with open(self.video_path, 'rb') as video_file:
-                files = {'image': (video_filename, video_file, 'video/mp4')}
-                upload_response = requests.post(f"{self._base()}/upload/image", files=files)
-            
-            if upload_response.status_code != 200:
-                self.finished.emit(False, f"上传视频文件失败: {upload_response.status_code}: {upload_response.text}", "")
-                return
-                
-            # 发送工作流到ComfyUI
-            self.progress.emit("正在发送处理请求...")
-            workflow_response = requests.post(
-                f"{self._base()}/prompt",
-                json={"prompt": workflow}
-            )
-            
-            if workflow_response.status_code != 200:
-                self.finished.emit(False, f"发送处理请求失败: {workflow_response.status_code}: {workflow_response.text}", "")
-                return
-                
-            # 获取prompt_id
-            prompt_data = workflow_response.json()
-            prompt_id = prompt_data.get("prompt_id") or prompt_data.get("data", {}).get("prompt_id")
-            
-            if not prompt_id:
-                self.finished.emit(False, "未能获取处理任务ID", "")
-                return
-                
-            # 轮询处理状态
-            self.progress.emit("正在处理视频，请稍候...")
-            max_wait_time = 600  # 最大等待10分钟
-            check_interval = 5   # 每5秒检查一次
-            wait_time = 0
-            
-            # 初始化output_info
-            output_info = {}
-            
-            while wait_time < max_wait_time:
-                # 检查处理状态
-                try:
-                    status_response = requests.get(f"{self._base()}/history")
-                    if status_response.status_code == 200:
-                        history_data = status_response.json()
-                        # 查找我们的prompt_id
-                        if prompt_id in history_data:
-                            # 处理完成，获取输出信息
-                            output_info = history_data[prompt_id].get("outputs", {})
-                            self.progress.emit(f"处理完成，输出信息: {output_info}")
-                            break
-                        # 检查是否在history中（较新的ComfyUI版本）
-                        for key, value in history_data.items():
-                            if key == prompt_id or (isinstance(value, dict) and value.get('prompt', [None])[0] == prompt_id):
-                                # 处理完成，获取输出信息
-                                output_info = value.get("outputs", {})
-                                self.progress.emit(f"处理完成，输出信息: {output_info}")
-                                break
-                except Exception as e:
-                    self.progress.emit(f"检查状态时出错: {str(e)}")
-                    
-                time.sleep(check_interval)
-                wait_time += check_interval
-                self.progress.emit(f"处理中... ({wait_time}/{max_wait_time}秒)")
-                
-            if wait_time >= max_wait_time:
-                self.finished.emit(False, "处理超时", "")
-                return
-                
+            template = self.template or workflow_registry.get()
+            client = ComfyUIClient(self._base(), self.session, self.resume_client_id)
+
+            history_entry = None
+            if self.resume_prompt_id:
+                history_entry = self._reattach(client)
+                self.reattached = history_entry is not None
+            if history_entry is None:
+                history_entry = self._submit(client, template)
+            output_info = history_entry.get("outputs", {})
+            self.execution_seconds = execution_seconds(history_entry)
+            self.progress.emit(f"处理完成，输出信息: {output_info}")
+
             # 下载处理后的视频
             self.progress.emit("正在下载处理后的视频...")
+            self._persist(JOB_DOWNLOADING)
             
             # 使用通用的下载方法
-            if self.download_output(output_info, self.output_path):
+            if self.download_output(client, output_info, self.output_path, template.output_node):
                 self.finished.emit(True, "高清放大处理完成", self.output_path)
             else:
+                self.server_fault = self.retryable = True
                 self.finished.emit(False, "无法下载处理后的视频", "")
             
         except Exception as e:
-            self.finished.emit(False, f"处理过程中出现错误: {str(e)}", "")
+            if self.cancel_token.cancelled:
+                self._cancelled(client)
+            else:
+                self._failed(e, client)
+        finally:
+            self.session.close()
+
+    def _failed(self, error: Exception, client=None):
+        """按失败原因分类，供调度器决定是否熔断服务器、是否换服务器重试"""
+        workflow_error = isinstance(error, ComfyUIError) and not error.server_fault
+        if client is not None and self.prompt_id and not workflow_error:
+            # 超时或与服务器失去联系时任务可能仍在原服务器上执行，换服务器重试前先取消，避免继续占用显卡
+            client.cancel_prompt(self.prompt_id)
+        if isinstance(error, ComfyUIError):
+            # 工作流执行出错也允许换一台服务器重试（如显存不足），但不计入服务器熔断
+            self.server_fault = error.server_fault
+            self.retryable = True
+            self.finished.emit(False, str(error), "")
+        elif isinstance(error, requests.RequestException):
+            # 连接失败、超时等网络错误
+            self.server_fault = self.retryable = True
+            self.finished.emit(False, f"服务器通信失败: {str(error)}", "")
+        else:
+            self.finished.emit(False, f"处理过程中出现错误: {str(error)}", "")
+
+    def _cancelled(self, client):
+        """被取消：取消服务器上的任务，并把持久化状态恢复为排队（下次重新提交）"""
+        if self.detached:
+            self.finished.emit(False, "已取消", "")
+            return
+        if client is not None and self.prompt_id:
+            client.cancel_prompt(self.prompt_id)
+        self._persist(JOB_QUEUED, prompt_id=None, client_id=None)
+        self.finished.emit(False, "已取消", "")
 
-    def download_output(self, output_info: dict, save_path: str) -> bool:
-        """下载输出文件（支持视频、GIF等多种格式）"""
+    def _submit(self, client: ComfyUIClient, template: WorkflowTemplate) -> dict:
+        """上传视频、提交工作流并等待执行结束，返回 history 记录"""
+        # 上传视频文件到ComfyUI（流式上传，显示字节进度）
+        self._persist(JOB_UPLOADING, prompt_id=None, client_id=None)
+        self.progress.emit("正在上传视频文件...")
+        video_filename = client.upload_video(
+            self.video_path, progress=lambda sent, total: self._emit_transfer("上传", sent, total),
+            cancelled=self.cancel_token
+        )
+
+        # 按模板映射填入参数：视频文件名使用服务器保存的名称（同名文件已存在时会被改名）
+        workflow = template.build(
+            video=video_filename,
+            filename_prefix=Path(self.output_path).stem,
+            mode=self.mode,
+            scale=self.scale,
+            frame_rate=round(self.frame_rate, 3) if self.frame_rate else None,
+        )
+
+        # 先连接 websocket 再提交工作流，避免错过执行事件
+        ws = client.connect_events()
+        self.progress.emit("正在发送处理请求...")
         try:
-            self.progress.emit(f"开始下载输出文件，输出信息: {output_info}")
-            self.progress.emit(f"保存路径: {save_path}")
-
-            # 检查所有输出内容
-            for node_id, node_output in output_info.items():
-                self.progress.emit(f"节点 {node_id} 输出: {node_output}")
-
-                # 检查视频输出
-                if "videos" in node_output:
-                    self.progress.emit(f"找到视频输出: {node_output['videos']}")
-                    for video_info in node_output["videos"]:
-                        if self._download_file(video_info, save_path, "视频"):
-                            return True
-
-                # 检查GIF输出（实际的mp4文件）
-                if "gifs" in node_output:
-                    self.progress.emit(f"找到GIF输出: {node_output['gifs']}")
-                    for gif_info in node_output["gifs"]:
-                        if self._download_file(gif_info, save_path, "GIF/视频"):
-                            return True
-
-                # 检查图片输出
-                if "images" in node_output:
-                    self.progress.emit(f"找到图片输出: {node_output['images']}")
-                    for image_info in node_output["images"]:
-                        if self._download_file(image_info, save_path, "图片"):
-                            return True
-
-            self.progress.emit(f"没有找到任何可下载的输出文件")
-            return False
+            self.cancel_token.check()
+            prompt_id = client.queue_prompt(workflow)
+        except Exception:
+            client.close_events(ws)
+            raise
+        self.queued_at = time.monotonic()
+        self.prompt_id = prompt_id
+        # 等待写入完成：程序此后退出也能在重启时找回这个任务
+        self._persist(JOB_RUNNING, wait=True, prompt_id=prompt_id, client_id=client.client_id)
 
-        except Exception as e:
-            self.progress.emit(f"下载输出文件时发生异常: {str(e)}")
-            import traceback
-            self.progress.emit(f"异常堆栈: {traceback.format_exc()}")
-            return False
+        # 等待执行完成（websocket 事件，不可用时轮询 /history/{prompt_id}）
+        self.progress.emit("正在处理视频，请稍候...")
+        return client.wait_for_completion(prompt_id, ws, workflow, progress=self.progress.emit,
+                                          cancelled=self.cancel_token)
+
+    def _reattach(self, client: ComfyUIClient):
+        """重新连接上次运行时提交的任务，返回 history 记录；任务已不在服务器上时返回 None（重新提交）"""
+        prompt_id = self.prompt_id = self.resume_prompt_id
+        self.progress.emit("正在重新连接上次提交的任务...")
+        entry = client.get_history(prompt_id)
+        if entry is None and not client.is_queued(prompt_id):
+            # 任务可能在两次查询之间刚刚完成
+            entry = client.get_history(prompt_id)
+            if entry is None:
+                self.progress.emit("上次提交的任务已不在服务器上（服务器可能已重启），重新提交")
+                return None
+        # 已结束的任务直接读取结果；仍在执行时用原 client_id 重新连接 websocket 接收该任务的事件
+        ws = None if entry is not None else client.connect_events()
+        self.progress.emit("正在处理视频，请稍候..." if entry is None else "任务已在服务器上完成")
+        return client.wait_for_completion(prompt_id, ws, progress=self.progress.emit, cancelled=self.cancel_token)
 
-    def _download_file(self, file_info: dict, save_path: str, file_type: str) -> bool:
-        """下载单个文件"""
+    def _persist(self, state: str, wait: bool = False, **fields):
+        """记录任务状态，重启后据此继续"""
+        if self.job_id is not None:
+            db_manager.update_upscale_job(self.job_id, state=state, server_url=self.comfyui_server, wait=wait,
+                                          **fields)
+
+    def _emit_transfer(self, action: str, done: int, total: int):
+        """上传/下载字节进度（按百分比变化节流）"""
+        if total:
+            percent = int(done * 100 / total)
+            if percent == self._transfer_percent:
+                return
+            self._transfer_percent = percent
+            self.progress.emit(f"正在{action}: {percent}% ({done / 1024 / 1024:.1f}/{total / 1024 / 1024:.1f}MB)")
+        else:
+            mb = int(done / 1024 / 1024)
+            if mb == self._transfer_percent:
+                return
+            self._transfer_percent = mb
+            self.progress.emit(f"正在{action}: {done / 1024 / 1024:.1f}MB")
+
+    def download_output(self, client: ComfyUIClient, output_info: dict, save_path: str,
+                        output_node: str = None) -> bool:
+        """下载输出文件（支持视频、GIF等多种格式），优先模板声明的输出节点，依次尝试直到成功"""
+        nodes = sorted(output_info.items(), key=lambda item: item[0] != output_node)
+        for node_id, node_output in nodes:
+            # 视频、GIF（实际的mp4文件）与图片输出
+            for key, file_type in (("videos", "视频"), ("gifs", "GIF/视频"), ("images", "图片")):
+                for file_info in node_output.get(key) or []:
+                    if self._download_file(client, file_info, save_path, file_type):
+                        return True
+
+        self.progress.emit("没有找到任何可下载的输出文件")
+        return False
+
+    def _download_file(self, client: ComfyUIClient, file_info: dict, save_path: str, file_type: str) -> bool:
+        """下载单个文件（流式写入临时文件，完成后替换为目标文件）"""
+        self.progress.emit(f"正在下载{file_type}: {file_info.get('filename', '')}")
+        self._transfer_percent = -1
         try:
-            # 获取文件信息
-            filename = file_info.get("filename", "")
-            subfolder = file_info.get("subfolder", "")
-            file_type_param = file_info.get("type", "output")
-            
-            self.progress.emit(f"尝试下载{file_type}: {filename}, 子文件夹: {subfolder}, 类型: {file_type_param}")
-            
-            if not filename:
-                self.progress.emit("文件名为空，跳过")
-                return False
-
-            # 构造下载参数
-            download_params = {
-                "filename": filename,
-                "type": file_type_param
-            }
-            
-            if subfolder:
-                download_params["subfolder"] = subfolder
-
-            # 发送下载请求
-            download_response = requests.get(
-                f"{self._base()}/view",
-                params=download_params,
-                timeout=60
+            size = client.download_file(
+                file_info, save_path, progress=lambda done, total: self._emit_transfer("下载", done, total),
+                cancelled=self.cancel_token
             )
-            
-            self.progress.emit(f"下载响应状态码: {download_response.status_code}")
-            self.progress.emit(f"下载响应大小: {len(download_response.content)} bytes")
-            
-            if download_response.status_code == 200 and len(download_response.content) > 0:
-                # 检查返回的内容是否是视频数据
-                content_type = download_response.headers.get('content-type', '')
-                self.progress.emit(f"下载响应Content-Type: {content_type}")
-                
-                # 保存到指定路径
-                with open(save_path, 'wb') as f:
-                    f.write(download_response.content)
-                
-                self.progress.emit(f"{file_type}下载成功并保存到: {save_path}")
-                return True
-            else:
-                self.progress.emit(f"{file_type}下载失败: 状态码 {download_response.status_code}, 内容长度: {len(download_response.content)}")
-                return False
-                
+            self.progress.emit(f"{file_type}下载成功（{size / 1024 / 1024:.1f}MB）并保存到: {save_path}")
+            return True
         except Exception as e:
-            self.progress.emit(f"下载{file_type}时发生异常: {str(e)}")
+            if self.cancel_token.cancelled:
+                raise
+            self.progress.emit(f"下载{file_type}失败: {e}")
             return False
@@ -1,23 +1,26 @@
 """
 批量克隆界面
 
-导入视频文件夹，过滤出≤20MB的视频，逐个分析并创建视频生成任务，
+导入视频文件夹，（可选）本地压缩为低码率代理视频后并发上传与分析并生成提示词，
 在列表中展示提示词与成功/失败状态，并支持导出表格。
 """
 
 import os
 from pathlib import Path
 from typing import List, Dict, Any
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QFileDialog, QTableWidgetItem
 from qfluentwidgets import (
-    PushButton, PrimaryPushButton, TitleLabel, BodyLabel, TableWidget, InfoBar, InfoBarPosition, RoundMenu, Action, FluentIcon
+    PushButton, PrimaryPushButton, TitleLabel, BodyLabel, TableWidget, InfoBar, InfoBarPosition, RoundMenu, Action, FluentIcon,
+    SpinBox
 )
 
 from utils.file_utils import format_file_size
+from utils.qt_future import watch_future
 from database_manager import db_manager
-from threads.video_analysis_thread import VideoAnalysisThread
+from threads.batch_video_analysis_thread import DEFAULT_WORKERS, BatchVideoAnalysisThread
 from components.prompt_preview_dialog import PromptPreviewDialog
+from utils.video_proxy import check_analysis_size
 
 
 class BatchCloneInterface(QWidget):
@@ -27,7 +30,8 @@ class BatchCloneInterface(QWidget):
         super().__init__(parent)
         self.setObjectName("batchCloneInterface")
         self.video_items: List[Dict[str, Any]] = []
-        self.current_index: int = 0
+        self.processed_count: int = 0
+        self.total_count: int = 0
         self.is_processing: bool = False
         self.analysis_thread = None
         self.generation_thread = None
@@ -46,7 +50,7 @@ class BatchCloneInterface(QWidget):
         header_layout.addStretch()
         layout.addLayout(header_layout)
 
-        description = BodyLabel('导入视频文件夹，仅展示≤20MB的视频，串行分析并生成提示词（不自动创建任务）。')
+        description = BodyLabel('导入视频文件夹，本地压缩后并发分析并生成提示词（不自动创建任务）。未开启“分析前压缩视频”时仅导入≤20MB的视频。')
         description.setStyleSheet("color: #666; font-size: 13px;")
         layout.addWidget(description)
 
@@ -66,6 +70,21 @@ class BatchCloneInterface(QWidget):
         self.stop_btn.clicked.connect(self.stop_processing)
         control_layout.addWidget(self.stop_btn)
 
+        control_layout.addWidget(BodyLabel('并发数'))
+        self.workers_spin = SpinBox()
+        self.workers_spin.setRange(1, 8)
+        try:
+            workers = int(db_manager.load_config('clone_analysis_workers', DEFAULT_WORKERS))
+        except (TypeError, ValueError):
+            workers = DEFAULT_WORKERS
+        self.workers_spin.setValue(workers)
+        self.workers_spin.valueChanged.connect(self.save_workers_setting)
+        control_layout.addWidget(self.workers_spin)
+
+        self.clear_cache_btn = PushButton('清除分析缓存')
+        self.clear_cache_btn.clicked.connect(self.clear_analysis_cache)
+        control_layout.addWidget(self.clear_cache_btn)
+
         self.export_btn = PushButton('导出表格')
         self.export_btn.clicked.connect(self.export_table)
         control_layout.addWidget(self.export_btn)
@@ -99,9 +118,9 @@ class BatchCloneInterface(QWidget):
             return
 
         video_exts = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv', '.webm', '.m4v'}
-        max_size = 20 * 1024 * 1024  # 20MB
 
         items: List[Dict[str, Any]] = []
+        skipped = 0
         for root, _, files in os.walk(folder):
             for name in files:
                 ext = Path(name).suffix.lower()
@@ -111,22 +130,25 @@ class BatchCloneInterface(QWidget):
                         size = os.path.getsize(path)
                     except Exception:
                         size = 0
-                    if size <= max_size:
-                        items.append({
-                            'file_name': name,
-                            'path': str(path),
-                            'size': size,
-                            'prompt': '',
-                            'status': '待处理',
-                            'video_url': ''
-                        })
+                    if check_analysis_size(size):
+                        skipped += 1
+                        continue
+                    items.append({
+                        'file_name': name,
+                        'path': str(path),
+                        'size': size,
+                        'prompt': '',
+                        'status': '待处理',
+                        'video_url': ''
+                    })
 
         self.video_items = items
         self.refresh_table()
+        skipped_text = f'，跳过 {skipped} 个超过20MB的视频' if skipped else ''
 
         if self.video_items:
             self.start_btn.setEnabled(True)
-            self.status_label.setText(f'已导入 {len(self.video_items)} 个视频（≤20MB）')
+            self.status_label.setText(f'已导入 {len(self.video_items)} 个视频{skipped_text}')
             InfoBar.success(
                 title='成功',
                 content=f'成功导入 {len(self.video_items)} 个视频',
@@ -138,7 +160,7 @@ class BatchCloneInterface(QWidget):
             )
         else:
             self.start_btn.setEnabled(False)
-            self.status_label.setText('未找到符合条件的视频（≤20MB）')
+            self.status_label.setText(f'未找到符合条件的视频{skipped_text}')
             InfoBar.warning(
                 title='提示',
                 content='未找到符合条件的视频文件',
@@ -205,11 +227,39 @@ class BatchCloneInterface(QWidget):
         view_action.triggered.connect(_do_view)
         menu.addAction(view_action)
 
+        # 清除该视频的缓存结果，下次执行时重新上传分析
+        reanalyze_action = Action(FluentIcon.SYNC, '清除缓存并重新分析')
+        def _do_reanalyze():
+            if self.is_processing:
+                return
+            item = self.video_items[row]
+            # 由分析线程计算文件哈希并删除缓存，避免在界面线程读取整个视频
+            item['refresh'] = True
+            item['prompt'] = ''
+            self.table.item(row, 2).setText('')
+            self.table.item(row, 2).setToolTip('')
+            self._set_status(row, '待处理')
+        reanalyze_action.triggered.connect(_do_reanalyze)
+        reanalyze_action.setEnabled(not self.is_processing)
+        menu.addAction(reanalyze_action)
+
         menu.addSeparator()
 
         # 删除
         delete_action = Action(FluentIcon.DELETE, '删除')
         def _do_delete():
+            # 分析进行中时行号与线程回传的索引对应，不允许删除
+            if self.is_processing:
+                InfoBar.warning(
+                    title='提示',
+                    content='批量分析进行中，请先停止再删除',
+                    orient=Qt.Horizontal,
+                    isClosable=True,
+                    position=InfoBarPosition.TOP,
+                    duration=2000,
+                    parent=self
+                )
+                return
             try:
                 del self.video_items[row]
                 self.table.removeRow(row)
@@ -236,115 +286,110 @@ class BatchCloneInterface(QWidget):
             )
             return
 
+        # 已分析的条目不重复处理
+        pending = [(i, item['path']) for i, item in enumerate(self.video_items) if item['status'] != '已分析']
+        if not pending:
+            self.status_label.setText('所有视频均已分析')
+            return
+
         self.is_processing = True
-        self.current_index = 0
+        self.processed_count = 0
+        self.total_count = len(pending)
         self.import_btn.setEnabled(False)
         self.start_btn.setEnabled(False)
+        self.workers_spin.setEnabled(False)
         self.stop_btn.setEnabled(True)
-        self.status_label.setText('开始批量分析...')
-        self.process_next()
+        for row, _ in pending:
+            self._set_status(row, '排队中')
+        self.status_label.setText(f'开始批量分析 {self.total_count} 个视频...')
+
+        refresh = {i for i, _ in pending if self.video_items[i].get('refresh')}
+        self.analysis_thread = BatchVideoAnalysisThread(pending, api_key, self.workers_spin.value(),
+                                                        refresh=refresh)
+        self.analysis_thread.item_status.connect(self._set_status)
+        self.analysis_thread.item_result.connect(self.on_analysis_result)
+        self.analysis_thread.item_error.connect(self.on_analysis_error)
+        self.analysis_thread.finished.connect(self.finish_processing)
+        self.analysis_thread.start()
 
     def stop_processing(self):
-        self.is_processing = False
-        self.import_btn.setEnabled(True)
-        self.start_btn.setEnabled(bool(self.video_items))
         self.stop_btn.setEnabled(False)
-        self.status_label.setText('已停止批量执行')
-        # 无状态轮询
-
-    def process_next(self):
-        if not self.is_processing or self.current_index >= len(self.video_items):
-            self.finish_processing()
-            return
-
-        row = self.current_index
-        item = self.video_items[row]
+        self.status_label.setText('正在停止：等待进行中的分析结束...')
+        # 不再调度新视频，并中止正在上传的视频
+        if self.analysis_thread and self.analysis_thread.isRunning():
+            self.analysis_thread.cancel()
+
+    def shutdown(self) -> list:
+        """关闭窗口时停止批量分析，返回需要等待退出的线程"""
+        if self.analysis_thread and self.analysis_thread.isRunning():
+            self.analysis_thread.cancel()
+            return [self.analysis_thread]
+        return []
+
+    def clear_analysis_cache(self):
+        """清空全部视频分析缓存"""
+        future = db_manager.delete_analysis_cache(wait=False)
+        watch_future(future, self.on_analysis_cache_cleared, self)
+
+    def on_analysis_cache_cleared(self, count: int):
+        InfoBar.success(
+            title='成功',
+            content=f'已清除 {count} 条分析缓存',
+            orient=Qt.Horizontal,
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=2000,
+            parent=self
+        )
 
-        # 更新状态
-        item['status'] = '分析中'
-        self.table.item(row, 3).setText('分析中')
-        self.status_label.setText(f"正在分析: {item['file_name']}")
+    def save_workers_setting(self, value: int):
+        db_manager.save_config('clone_analysis_workers', value, 'integer', '批量克隆并发分析数', wait=False)
 
-        # 启动分析线程
-        api_key = db_manager.load_config('api_key', '')
-        self.analysis_thread = VideoAnalysisThread(item['path'], api_key)
-        self.analysis_thread.progress.connect(lambda msg, r=row: self.on_analysis_progress(r, msg))
-        self.analysis_thread.result.connect(lambda result, r=row: self.on_analysis_result(r, result))
-        self.analysis_thread.error.connect(lambda err, r=row: self.on_analysis_error(r, err))
-        self.analysis_thread.start()
+    def _set_status(self, row: int, status: str):
+        if 0 <= row < len(self.video_items):
+            self.video_items[row]['status'] = status
+            self.table.item(row, 3).setText(status)
 
-    def on_analysis_progress(self, row: int, message: str):
-        self.status_label.setText(message)
-        # 行状态保持“分析中”即可
-
-    def on_analysis_result(self, row: int, result: Any):
-        # 构建提示词文本（仅包含解析内容，无额外说明）
-        prompt_text = ''
-        if isinstance(result, list):
-            for item in result:
-                prompt_text += f"时间: {item.get('time', '')}\n"
-                prompt_text += f"内容: {item.get('content', '')}\n"
-                if item.get('style'):
-                    prompt_text += f"风格: {item.get('style', '')}\n"
-                if item.get('narration'):
-                    prompt_text += f"旁白: {item.get('narration', '')}\n"
-                if item.get('dialogue'):
-                    prompt_text += f"人物对话: {item.get('dialogue', '')}\n"
-                if item.get('audio'):
-                    prompt_text += f"音频/音乐: {item.get('audio', '')}\n"
-                prompt_text += "\n"
-        else:
-            prompt_text = str(result)
+    def _update_progress_label(self, file_name: str, message: str):
+        self.processed_count += 1
+        self.status_label.setText(f"[{self.processed_count}/{self.total_count}] {file_name}: {message}")
 
+    def on_analysis_result(self, row: int, result: Any, prompt_text: str, from_cache: bool):
         # 更新提示词与状态
         self.video_items[row]['prompt'] = prompt_text
+        self.video_items[row].pop('refresh', None)
         self.table.item(row, 2).setText(self._truncate_prompt(prompt_text))
         self.table.item(row, 2).setToolTip(prompt_text)
-        self.video_items[row]['status'] = '已分析'
-        self.table.item(row, 3).setText('已分析')
-
-        # 下一项
-        self.current_index += 1
-        QTimer.singleShot(0, self.process_next)
+        self._set_status(row, '已分析')
+        self._update_progress_label(self.video_items[row]['file_name'], '已分析（缓存）' if from_cache else '已分析')
 
     def on_analysis_error(self, row: int, error_message: str):
-        self.video_items[row]['status'] = '分析失败'
-        self.table.item(row, 3).setText('分析失败')
-        InfoBar.error(
-            title='错误',
-            content=f"分析失败: {error_message}",
-            orient=Qt.Horizontal,
-            isClosable=True,
-            position=InfoBarPosition.TOP,
-            duration=4000,
-            parent=self
-        )
-        # 跳到下一项
-        self.current_index += 1
-        QTimer.singleShot(0, self.process_next)
-
-    # 取消任务创建逻辑
-
-    # 取消任务创建回调
-
-    # 取消任务失败回调
-
-    # 取消生成完成回调
+        if error_message == '已取消':
+            self._set_status(row, '已取消')
+            return
+        self._set_status(row, '分析失败')
+        self._update_progress_label(self.video_items[row]['file_name'], error_message)
 
-    def finish_processing(self):
+    def finish_processing(self, succeeded: int = 0, failed: int = 0):
         self.is_processing = False
+        self.analysis_thread = None
+        # 停止后尚未开始的条目恢复为待处理
+        for row, item in enumerate(self.video_items):
+            if item['status'] in ('排队中', '排队上传', '已取消'):
+                self._set_status(row, '待处理')
         self.import_btn.setEnabled(True)
         self.start_btn.setEnabled(bool(self.video_items))
+        self.workers_spin.setEnabled(True)
         self.stop_btn.setEnabled(False)
-        self.status_label.setText('批量执行完成')
-        # 无状态轮询
-        InfoBar.success(
+        summary = f'成功 {succeeded} 个，失败 {failed} 个'
+        self.status_label.setText(f'批量执行结束：{summary}')
+        (InfoBar.success if not failed else InfoBar.warning)(
             title='完成',
-            content='批量克隆执行完成',
+            content=f'批量克隆执行完成：{summary}',
             orient=Qt.Horizontal,
             isClosable=True,
             position=InfoBarPosition.TOP,
-            duration=2000,
+            duration=3000,
             parent=self
         )
 
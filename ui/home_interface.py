@@ -11,7 +11,7 @@ from qfluentwidgets import (
 
 from ui.flow_layout import FlowLayout
 from ui.drag_drop_text_edit import DragDropTextEdit
-from threads.image_upload_thread import ImageUploadThread
+from threads.batch_upload_thread import BatchUploadThread
 
 class HomeInterface(QWidget):
     """主页界面"""
@@ -158,63 +158,66 @@ class HomeInterface(QWidget):
         )
 
         if file_paths:
-            # 上传所有选中的图片
-            for file_path in file_paths:
-                self.upload_single_image(file_path)
+            # 所有选中的图片作为一批并行上传
+            self.upload_images(file_paths)
 
-    def upload_single_image(self, file_path):
-        """上传单个图片"""
-        # 使用预设的图床token
-        token = "1c17b11693cb5ec63859b091c5b9c1b2"  # 预设token
-
-        upload_thread = ImageUploadThread(file_path, token)
+    def upload_images(self, file_paths):
+        """批量并行上传图片"""
+        upload_thread = BatchUploadThread(file_paths)
         upload_thread.progress.connect(self.on_upload_progress)
-        upload_thread.finished.connect(self.on_upload_finished)
+        upload_thread.file_finished.connect(self.on_upload_finished)
+        upload_thread.finished.connect(
+            lambda succeeded, failed, urls: self.on_upload_batch_finished(upload_thread, succeeded, failed)
+        )
         upload_thread.start()
 
         self.upload_threads.append(upload_thread)
 
-    def on_upload_progress(self, message):
+    def on_upload_progress(self, done, total, percent):
         """上传进度回调"""
-        print(message)
+        self.uploaded_images_label.setText(
+            f'已添加图片: {len(self.image_urls)} 张（正在上传 {done}/{total}，{percent}%）'
+        )
 
-    def on_upload_finished(self, success, message, url):
-        """上传完成回调"""
+    def on_upload_finished(self, index, success, message, url):
+        """单张图片上传完成回调"""
         if success:
             self.image_urls.append(url)
-            self.update_uploaded_images_display()
             
             # 添加图片预览
             from ui.image_widget import ImageWidget
             image_widget = ImageWidget(url)
             self.image_display.addWidget(image_widget)
-            
+        else:
             from qfluentwidgets import InfoBar, InfoBarPosition
-            InfoBar.success(
-                title='成功',
-                content=f'图片上传成功',
+            InfoBar.error(
+                title='失败',
+                content=f'图片上传失败: {message}',
                 orient=Qt.Horizontal,  # type: ignore
                 isClosable=True,
                 position=InfoBarPosition.TOP,
-                duration=2000,
+                duration=3000,
                 parent=self
             )
-        else:
+
+    def on_upload_batch_finished(self, upload_thread, succeeded, failed):
+        """整批上传完成回调"""
+        self.update_uploaded_images_display()
+        if succeeded:
             from qfluentwidgets import InfoBar, InfoBarPosition
-            InfoBar.error(
-                title='失败',
-                content=f'图片上传失败: {message}',
+            InfoBar.success(
+                title='成功',
+                content=f'图片上传完成：成功 {succeeded} 张' + (f'，失败 {failed} 张' if failed else ''),
                 orient=Qt.Horizontal,  # type: ignore
                 isClosable=True,
                 position=InfoBarPosition.TOP,
-                duration=3000,
+                duration=2000,
                 parent=self
             )
 
         # 清理完成的线程
-        sender = self.sender()
-        if sender in self.upload_threads:
-            self.upload_threads.remove(sender)
+        if upload_thread in self.upload_threads:
+            self.upload_threads.remove(upload_thread)
 
     def update_uploaded_images_display(self):
         """更新已上传图片显示"""
@@ -10,7 +10,7 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QFileDialog
 from PyQt5.QtGui import QMouseEvent
 from qfluentwidgets import (
-    TitleLabel, BodyLabel, LineEdit, PushButton, PrimaryPushButton, CardWidget, CheckBox
+    TitleLabel, BodyLabel, LineEdit, PushButton, PrimaryPushButton, CardWidget, CheckBox, SpinBox
 )
 
 from database_manager import db_manager
@@ -146,6 +146,40 @@ class SettingsInterface(QWidget):
         self.ai_title_prompt_input.textChanged.connect(self.save_ai_title_prompt)
         api_layout.addWidget(self.ai_title_prompt_input)
 
+        # 图片上传设置
+        upload_label = BodyLabel('图片上传:')
+        upload_label.setStyleSheet("font-weight: bold; font-size: 13px;")
+        api_layout.addWidget(upload_label)
+
+        self.upload_compress_checkbox = CheckBox()
+        self.upload_compress_checkbox.setText('上传前缩放并压缩图片（不修改原图）')
+        self.upload_compress_checkbox.stateChanged.connect(self.save_upload_compress_settings)
+        api_layout.addWidget(self.upload_compress_checkbox)
+
+        upload_opts = QHBoxLayout()
+        upload_opts.addWidget(BodyLabel('最长边(像素):'))
+        self.upload_max_dimension_spin = SpinBox()
+        self.upload_max_dimension_spin.setRange(512, 8192)
+        self.upload_max_dimension_spin.setSingleStep(256)
+        self.upload_max_dimension_spin.valueChanged.connect(self.save_upload_compress_settings)
+        upload_opts.addWidget(self.upload_max_dimension_spin)
+        upload_opts.addWidget(BodyLabel('压缩质量:'))
+        self.upload_quality_spin = SpinBox()
+        self.upload_quality_spin.setRange(30, 100)
+        self.upload_quality_spin.valueChanged.connect(self.save_upload_compress_settings)
+        upload_opts.addWidget(self.upload_quality_spin)
+        upload_opts.addStretch()
+        api_layout.addLayout(upload_opts)
+
+        analysis_label = BodyLabel('视频分析:')
+        analysis_label.setStyleSheet("font-weight: bold; font-size: 13px;")
+        api_layout.addWidget(analysis_label)
+
+        self.analysis_proxy_checkbox = CheckBox()
+        self.analysis_proxy_checkbox.setText('分析前压缩视频（本地转码为低码率代理视频后上传，支持超过20MB的视频）')
+        self.analysis_proxy_checkbox.stateChanged.connect(self.save_upload_compress_settings)
+        api_layout.addWidget(self.analysis_proxy_checkbox)
+
         # 保存按钮
         self.save_settings_btn = PrimaryPushButton('保存设置')
         self.save_settings_btn.clicked.connect(self.save_settings)
@@ -213,10 +247,18 @@ class SettingsInterface(QWidget):
         ai_prompt = db_manager.load_config('ai_title_prompt', '只返回一个中文视频标题，不要返回任何解释或额外内容；不使用引号、编号、前后缀；不换行；不超过30字，风格有趣吸引人')
         self.ai_title_prompt_input.setText(ai_prompt)
 
+        # 加载图片上传设置（加载期间不触发保存）
+        self._loading_upload_settings = True
+        self.upload_compress_checkbox.setChecked(bool(db_manager.load_config('upload_compress_enabled', True)))
+        self.upload_max_dimension_spin.setValue(int(db_manager.load_config('upload_max_dimension', 2048)))
+        self.upload_quality_spin.setValue(int(db_manager.load_config('upload_image_quality', 85)))
+        self.analysis_proxy_checkbox.setChecked(bool(db_manager.load_config('analysis_proxy_enabled', True)))
+        self._loading_upload_settings = False
+
     def save_settings(self):
         """保存设置"""
         api_key = self.api_key_input.text().strip()
-        db_manager.save_config('api_key', api_key, 'string', 'Sora API Key')
+        db_manager.save_config('api_key', api_key, 'string', 'Sora API Key', wait=False)
         
         # 不再保存ComfyUI服务器地址
         
@@ -234,26 +276,41 @@ class SettingsInterface(QWidget):
     def save_api_key(self):
         """实时保存API Key"""
         api_key = self.api_key_input.text().strip()
-        db_manager.save_config('api_key', api_key, 'string', 'Sora API Key')
+        db_manager.save_config('api_key', api_key, 'string', 'Sora API Key', wait=False)
 
     # 已移除实时保存ComfyUI服务器方法
 
     def save_video_path(self):
         """实时保存视频保存路径"""
         video_path = self.video_path_input.text().strip()
-        db_manager.save_config('video_save_path', video_path, 'string', '视频保存路径')
+        db_manager.save_config('video_save_path', video_path, 'string', '视频保存路径', wait=False)
 
     def save_ai_title_enabled(self, state: int):
         """保存AI标题开关"""
         enabled = bool(state)
-        db_manager.save_config('ai_title_enabled', enabled, 'boolean', 'AI标题开关')
+        db_manager.save_config('ai_title_enabled', enabled, 'boolean', 'AI标题开关', wait=False)
 
     def save_ai_title_prompt(self):
         """保存AI标题提示词"""
         prompt = self.ai_title_prompt_input.text().strip()
         if not prompt:
             prompt = '请根据我的提示词帮我生成一个爆款的视频标题，要搞怪一点，不要太死板，搞得有趣一点'
-        db_manager.save_config('ai_title_prompt', prompt, 'string', 'AI标题提示词')
+        db_manager.save_config('ai_title_prompt', prompt, 'string', 'AI标题提示词', wait=False)
+
+    def save_upload_compress_settings(self, *_):
+        """保存图片上传压缩与视频分析压缩设置"""
+        if getattr(self, '_loading_upload_settings', False):
+            return
+        enabled = self.upload_compress_checkbox.isChecked()
+        self.upload_max_dimension_spin.setEnabled(enabled)
+        self.upload_quality_spin.setEnabled(enabled)
+        db_manager.save_config('upload_compress_enabled', enabled, 'boolean', '上传前压缩图片', wait=False)
+        db_manager.save_config('upload_max_dimension', self.upload_max_dimension_spin.value(), 'integer',
+                               '上传图片最长边(像素)', wait=False)
+        db_manager.save_config('upload_image_quality', self.upload_quality_spin.value(), 'integer',
+                               '上传图片压缩质量(1-100)', wait=False)
+        db_manager.save_config('analysis_proxy_enabled', self.analysis_proxy_checkbox.isChecked(), 'boolean',
+                               '分析前压缩视频', wait=False)
 
     def browse_video_path(self):
         """浏览选择视频保存路径"""
@@ -273,7 +330,7 @@ class SettingsInterface(QWidget):
 
             if selected_path:
                 self.video_path_input.setText(selected_path)
-                db_manager.save_config('video_save_path', selected_path, 'string', '视频保存路径')
+                db_manager.save_config('video_save_path', selected_path, 'string', '视频保存路径', wait=False)
 
                 from qfluentwidgets import InfoBar, InfoBarPosition
                 InfoBar.success(
@@ -530,18 +587,10 @@ class SettingsInterface(QWidget):
 
         if dialog.exec():
             try:
-                # 清空数据库
-                db_manager.clear_tasks()
-                # 清空config表
-                import sqlite3
-                conn = sqlite3.connect(db_manager.db_path)
-                cursor = conn.cursor()
-                cursor.execute('DELETE FROM config')
-                conn.commit()
-                conn.close()
-
-                # 重新初始化config表以恢复默认设置
-                db_manager.create_config_table()
+                # 清空数据库（交给写线程执行，不阻塞界面）
+                db_manager.clear_tasks(wait=False)
+                # 清空config表并恢复默认设置
+                db_manager.reset_config(wait=False)
 
                 from qfluentwidgets import InfoBar, InfoBarPosition
                 InfoBar.success(
@@ -5,14 +5,15 @@
 import os
 from pathlib import Path
 from datetime import datetime
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt, pyqtSignal, QTimer
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QAbstractItemView, 
     QTableWidgetItem, QDialog, QTableWidget, QApplication
 )
 from PyQt5.QtGui import QColor, QBrush, QFont
 from qfluentwidgets import (
-    TitleLabel, PushButton, PrimaryPushButton, BodyLabel, TableWidget, RoundMenu, Action, FluentIcon, InfoBar, InfoBarPosition, MessageBox
+    TitleLabel, PushButton, PrimaryPushButton, BodyLabel, TableWidget, RoundMenu, Action, FluentIcon, InfoBar, InfoBarPosition, MessageBox,
+    SearchLineEdit
 )
 from loguru import logger
 
@@ -20,11 +21,15 @@ from database_manager import db_manager
 from ui.image_widget import ImageWidget
 from threads.video_download_thread import VideoDownloadThread
 from utils.global_thread_pool import global_thread_pool
+from utils.qt_future import watch_future
 
 
 class TaskListWidget(QWidget):
     """任务列表界面"""
 
+    # 批量下载只需要的列
+    DOWNLOAD_COLUMNS = ('task_id', 'prompt', 'status', 'video_url')
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setObjectName("taskListWidget")
@@ -32,6 +37,16 @@ class TaskListWidget(QWidget):
         self.current_page = 1
         self.page_size = 10  # 每页显示10个任务
         self.total_pages = 1
+        # 当前页显示的任务（右键菜单、选择直接使用，无需重新查询）
+        self.current_tasks = []
+        # 搜索相关：搜索结果使用游标分页，search_cursors[i] 为第 i+1 页的起始游标
+        self.search_query = ''
+        self.search_cursors = [None]
+        self.search_has_next = False
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(self.apply_search)
         # 选择相关
         self.selected_tasks = set()  # 存储选中的任务ID
         self.is_all_selected = False
@@ -60,6 +75,15 @@ class TaskListWidget(QWidget):
         header_layout.addWidget(title)
         header_layout.addStretch()
 
+        # 提示词搜索框（输入停顿后自动搜索）
+        self.search_input = SearchLineEdit()
+        self.search_input.setPlaceholderText('搜索提示词')
+        self.search_input.setFixedWidth(220)
+        self.search_input.textChanged.connect(lambda _: self.search_timer.start())
+        self.search_input.searchSignal.connect(lambda _: self.apply_search())
+        self.search_input.clearSignal.connect(self.apply_search)
+        header_layout.addWidget(self.search_input)
+
         # 刷新按钮（位于“视频克隆”左侧）
         self.refresh_btn = PushButton('刷新')
         self.refresh_btn.setFixedWidth(80)
@@ -250,46 +274,103 @@ class TaskListWidget(QWidget):
         dialog.cancelButton.setText('取消')
 
         if dialog.exec():
-            try:
-                deleted = db_manager.delete_completed_tasks()
-                self.load_tasks()
-                # 重置选择
-                self.selected_tasks.clear()
-                self.is_all_selected = False
+            # 删除在写线程中执行，完成后回到GUI线程刷新
+            future = db_manager.delete_completed_tasks(wait=False)
+            watch_future(future, self._on_completed_tasks_deleted, self)
 
-                if deleted > 0:
-                    InfoBar.success(
-                        title='已删除',
-                        content=f'共删除 {deleted} 条已完成/失败任务',
-                        orient=Qt.Horizontal,  # type: ignore
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=2500,
-                        parent=self
-                    )
-                else:
-                    InfoBar.info(
-                        title='无变化',
-                        content='当前没有已完成或失败任务可删除',
-                        orient=Qt.Horizontal,  # type: ignore
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=2000,
-                        parent=self
-                    )
-            except Exception as e:
-                InfoBar.error(
-                    title='错误',
-                    content=f'删除失败: {str(e)}',
+    def _on_completed_tasks_deleted(self, deleted):
+        """批量删除已完成/失败任务后的回调（GUI线程）"""
+        try:
+            self.load_tasks()
+            # 重置选择
+            self.selected_tasks.clear()
+            self.is_all_selected = False
+
+            if deleted:
+                InfoBar.success(
+                    title='已删除',
+                    content=f'共删除 {deleted} 条已完成/失败任务',
                     orient=Qt.Horizontal,  # type: ignore
                     isClosable=True,
                     position=InfoBarPosition.TOP,
-                    duration=3000,
+                    duration=2500,
                     parent=self
                 )
+            else:
+                InfoBar.info(
+                    title='无变化',
+                    content='当前没有已完成或失败任务可删除',
+                    orient=Qt.Horizontal,  # type: ignore
+                    isClosable=True,
+                    position=InfoBarPosition.TOP,
+                    duration=2000,
+                    parent=self
+                )
+        except Exception as e:
+            InfoBar.error(
+                title='错误',
+                content=f'删除失败: {str(e)}',
+                orient=Qt.Horizontal,  # type: ignore
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+
+    def apply_search(self):
+        """应用搜索框中的关键词（为空时恢复普通分页）"""
+        self.search_timer.stop()
+        query = self.search_input.text().strip()
+        if query == self.search_query:
+            return
+        self.search_query = query
+        self.search_cursors = [None]
+        self.current_page = 1
+        self.selected_tasks.clear()
+        self.is_all_selected = False
+        self.load_tasks()
+
+    def load_search_results(self):
+        """加载当前页的搜索结果（游标分页）"""
+        cursor = self.search_cursors[self.current_page - 1]
+        tasks, next_cursor = db_manager.search_tasks(
+            self.search_query, limit=self.page_size, cursor=cursor
+        )
+        # 记录下一页起始游标
+        del self.search_cursors[self.current_page:]
+        if next_cursor:
+            self.search_cursors.append(next_cursor)
+        self.search_has_next = next_cursor is not None
+        self.show_tasks(tasks)
+
+        self.page_label.setText(f"搜索结果 第 {self.current_page} 页")
+        self.total_label.setText(f"本页 {len(tasks)} 条匹配")
+        self.prev_btn.setEnabled(self.current_page > 1)
+        self.next_btn.setEnabled(self.search_has_next)
+
+    def show_tasks(self, tasks):
+        """把任务列表填充到表格"""
+        self.current_tasks = tasks
+
+        # 设置表格行数
+        self.task_table.setRowCount(len(tasks))
+
+        # 填充表格数据
+        for row, task in enumerate(tasks):
+            self.populate_task_row(row, task)
+
+        # 设置行高（在数据加载后再次设置确保生效）
+        vertical_header = self.task_table.verticalHeader()
+        if vertical_header:
+            vertical_header.setDefaultSectionSize(120)
+            self.task_table.resizeRowsToContents()
 
     def load_tasks(self):
         """加载任务列表（分页）"""
+        if self.search_query:
+            self.load_search_results()
+            return
+
         # 获取总记录数
         total_records = db_manager.get_tasks_count()
 
@@ -305,19 +386,7 @@ class TaskListWidget(QWidget):
 
         # 获取当前页的任务
         tasks = db_manager.get_tasks_paginated(limit=self.page_size, offset=offset)
-
-        # 设置表格行数
-        self.task_table.setRowCount(len(tasks))
-
-        # 填充表格数据
-        for row, task in enumerate(tasks):
-            self.populate_task_row(row, task)
-
-        # 设置行高（在数据加载后再次设置确保生效）
-        vertical_header = self.task_table.verticalHeader()
-        if vertical_header:
-            vertical_header.setDefaultSectionSize(120)
-            self.task_table.resizeRowsToContents()
+        self.show_tasks(tasks)
 
         # 更新分页控件状态
         self.update_pagination_controls(total_records)
@@ -412,9 +481,8 @@ class TaskListWidget(QWidget):
             return
 
         row = item.row()
-        # 获取当前页的任务列表
-        offset = (self.current_page - 1) * self.page_size
-        tasks = db_manager.get_tasks_paginated(limit=self.page_size, offset=offset)
+        # 当前页显示的任务列表
+        tasks = self.current_tasks
 
         if row < len(tasks):
             task = tasks[row]
@@ -482,9 +550,8 @@ class TaskListWidget(QWidget):
         for item in self.task_table.selectedItems():
             selected_rows.add(item.row())
 
-        # 获取当前页的任务列表
-        offset = (self.current_page - 1) * self.page_size
-        tasks = db_manager.get_tasks_paginated(limit=self.page_size, offset=offset)
+        # 当前页显示的任务列表
+        tasks = self.current_tasks
 
         # 更新选中的任务ID
         if not self.is_all_selected:
@@ -506,6 +573,26 @@ class TaskListWidget(QWidget):
             self.select_all_btn.setText('全选')
             self.is_all_selected = False
 
+    def iter_listed_tasks(self, columns):
+        """逐批遍历列表中的所有任务（跨页）：搜索中按游标遍历搜索结果，否则遍历全部任务"""
+        batch = max(50, self.page_size)
+        if self.search_query:
+            cursor = None
+            while True:
+                tasks, cursor = db_manager.search_tasks(self.search_query, limit=batch, cursor=cursor,
+                                                        columns=columns)
+                yield from tasks
+                if not cursor:
+                    return
+        total = db_manager.get_tasks_count()
+        fetched = 0
+        while fetched < total:
+            tasks = db_manager.get_tasks_paginated(limit=batch, offset=fetched, columns=columns)
+            if not tasks:
+                return
+            yield from tasks
+            fetched += len(tasks)
+
     def toggle_select_all(self):
         """切换全选状态"""
         if self.is_all_selected:
@@ -515,26 +602,26 @@ class TaskListWidget(QWidget):
             self.is_all_selected = False
             self.select_all_btn.setText('全选')
         else:
-            # 全选所有页
+            # 全选所有页（搜索中只选择匹配的任务）
             self.selected_tasks.clear()
-            total = db_manager.get_tasks_count()
-            batch = max(50, self.page_size)
-            fetched = 0
-            while fetched < total:
-                page_tasks = db_manager.get_tasks_paginated(limit=batch, offset=fetched)
-                if not page_tasks:
-                    break
-                for task in page_tasks:
-                    tid = task.get('task_id')
-                    if tid:
-                        self.selected_tasks.add(tid)
-                fetched += len(page_tasks)
-            # 视觉上选中当前页
-            self.task_table.selectAll()
-
+            for task in self.iter_listed_tasks(('task_id',)):
+                tid = task.get('task_id')
+                if tid:
+                    self.selected_tasks.add(tid)
+            # 先标记全选，再视觉上选中当前页（选择变化回调不会把选择缩小到当前页）
             self.is_all_selected = True
+            self.task_table.selectAll()
             self.select_all_btn.setText('取消全选')
 
+    def shutdown(self) -> list:
+        """关闭窗口时取消进行中与排队的下载（删除未下载完的文件），返回需要等待退出的线程"""
+        threads = list(self.batch_download_threads)
+        if getattr(self, 'download_thread', None):
+            threads.append(self.download_thread)
+        for t in threads:
+            t.cancel()
+        return [t for t in threads if t.isRunning()]
+
     def batch_download_videos(self):
         """批量下载视频"""
         if not self.selected_tasks:
@@ -549,23 +636,15 @@ class TaskListWidget(QWidget):
             )
             return
 
-        # 获取选中任务的详细信息（跨所有页）
+        # 获取选中任务的详细信息（跨所有页；搜索中只下载仍匹配搜索条件的任务）
         selected_tasks_data = []
         downloadable_count = 0
-        total = db_manager.get_tasks_count()
-        batch = max(50, self.page_size)
-        fetched = 0
-        while fetched < total:
-            tasks = db_manager.get_tasks_paginated(limit=batch, offset=fetched)
-            if not tasks:
-                break
-            for task in tasks:
-                if (task.get('task_id') in self.selected_tasks and
-                    task.get('status') == 'completed' and
-                    task.get('video_url')):
-                    selected_tasks_data.append(task)
-                    downloadable_count += 1
-            fetched += len(tasks)
+        for task in self.iter_listed_tasks(self.DOWNLOAD_COLUMNS):
+            if (task.get('task_id') in self.selected_tasks and
+                task.get('status') == 'completed' and
+                task.get('video_url')):
+                selected_tasks_data.append(task)
+                downloadable_count += 1
 
         if downloadable_count == 0:
             InfoBar.warning(
@@ -675,7 +754,7 @@ class TaskListWidget(QWidget):
         batch = max(50, self.page_size)
         fetched = 0
         while fetched < total:
-            tasks = db_manager.get_tasks_paginated(limit=batch, offset=fetched)
+            tasks = db_manager.get_tasks_paginated(limit=batch, offset=fetched, columns=self.DOWNLOAD_COLUMNS)
             if not tasks:
                 break
             for task in tasks:
@@ -911,43 +990,36 @@ class TaskListWidget(QWidget):
         dialog.cancelButton.setText('取消')
 
         if dialog.exec():
-            try:
-                # 从数据库删除任务
-                task_id = task.get('task_id')
-                if db_manager.delete_task(task_id):
-                    # 刷新任务列表
-                    self.load_tasks()
+            # 从数据库删除任务（写线程执行，完成后回到GUI线程刷新）
+            task_id = task.get('task_id')
+            future = db_manager.delete_task(task_id, wait=False)
+            watch_future(future, self._on_task_deleted, self)
+
+    def _on_task_deleted(self, deleted):
+        """单个任务删除完成回调（GUI线程）"""
+        if deleted:
+            # 刷新任务列表
+            self.load_tasks()
 
-                    InfoBar.success(
-                        title='成功',
-                        content='任务已删除',
-                        orient=Qt.Horizontal,  # type: ignore
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=2000,
-                        parent=self
-                    )
-                else:
-                    InfoBar.error(
-                        title='错误',
-                        content='删除任务失败',
-                        orient=Qt.Horizontal,  # type: ignore
-                        isClosable=True,
-                        position=InfoBarPosition.TOP,
-                        duration=3000,
-                        parent=self
-                    )
-            except Exception as e:
-                print(f"删除任务失败: {e}")
-                InfoBar.error(
-                    title='错误',
-                    content=f'删除任务失败: {str(e)}',
-                    orient=Qt.Horizontal,  # type: ignore
-                    isClosable=True,
-                    position=InfoBarPosition.TOP,
-                    duration=3000,
-                    parent=self
-                )
+            InfoBar.success(
+                title='成功',
+                content='任务已删除',
+                orient=Qt.Horizontal,  # type: ignore
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=2000,
+                parent=self
+            )
+        else:
+            InfoBar.error(
+                title='错误',
+                content='删除任务失败',
+                orient=Qt.Horizontal,  # type: ignore
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
 
     def update_pagination_controls(self, total_records):
         """更新分页控件状态"""
@@ -969,6 +1041,11 @@ class TaskListWidget(QWidget):
 
     def next_page(self):
         """下一页"""
+        if self.search_query:
+            if self.search_has_next:
+                self.current_page += 1
+                self.load_tasks()
+            return
         if self.current_page < self.total_pages:
             self.current_page += 1
             self.load_tasks()
@@ -983,8 +1060,14 @@ class TaskListWidget(QWidget):
             print(f"显示视频克隆对话框失败: {e}")
 
     def show_remove_first_frame_dialog(self):
-        """选择文件夹并去除该文件夹内所有视频的首帧（覆盖原视频）"""
+        """选择文件夹并去除该文件夹内所有视频的首帧（覆盖原视频）；处理中再次点击则停止"""
         try:
+            thread = getattr(self, '_first_frame_thread', None)
+            if thread is not None and thread.isRunning():
+                thread.cancel()
+                self.remove_first_frame_btn.setText('正在停止...')
+                self.remove_first_frame_btn.setEnabled(False)
+                return
             # 选择目标文件夹
             from PyQt5.QtWidgets import QFileDialog
             folder = QFileDialog.getExistingDirectory(self, '选择包含视频的文件夹')
@@ -1028,7 +1111,14 @@ class TaskListWidget(QWidget):
                 duration=1500,
                 parent=self
             ))
+            # 按钮显示整批进度，点击可停止
+            self._first_frame_thread.overall_progress.connect(
+                lambda done, total, percent: self.remove_first_frame_btn.setText(f'停止去首帧 {done}/{total} ({percent}%)')
+            )
+            self.remove_first_frame_btn.setText('停止去首帧')
             def on_item_done(success, path, err):
+                if err == '已取消':
+                    return
                 if success:
                     logger.info(f"去首帧成功: {path}")
                     InfoBar.success(
@@ -1054,6 +1144,8 @@ class TaskListWidget(QWidget):
             self._first_frame_thread.item_finished.connect(on_item_done)
             def on_all_done(total, success_count):
                 logger.info(f"首帧移除完成，成功/总: {success_count}/{total}")
+                self.remove_first_frame_btn.setText('去首帧')
+                self.remove_first_frame_btn.setEnabled(True)
                 InfoBar.success(
                     title='全部完成',
                     content=f'该文件夹共检测到 {total} 个视频，成功处理 {success_count} 个',
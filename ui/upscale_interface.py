@@ -2,18 +2,39 @@
 高清放大界面
 """
 
+import os
+import shutil
+import time
+import uuid
 from pathlib import Path
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QFileDialog, QDialog
+from loguru import logger
 from qfluentwidgets import (
-    PushButton, PrimaryPushButton, TitleLabel, BodyLabel, TableWidget
+    PushButton, PrimaryPushButton, TitleLabel, BodyLabel, TableWidget, ComboBox
 )
 
 from components.upscale_settings_dialog import UpscaleSettingsDialog
 from components.upscale_servers_dialog import UpscaleServersDialog
 from threads.video_upscale_thread import VideoUpscaleThread
+from threads.upscale_probe_thread import UpscaleProbeThread
+from threads.upscale_merge_thread import UpscaleMergeThread
+from threads.upscale_import_thread import UpscaleImportThread
+from utils.upscale_scheduler import (
+    BREAKER_HALF_OPEN, JOB_DONE, JOB_DOWNLOADING, JOB_FAILED, JOB_QUEUED, JOB_RUNNING, UpscaleJob, UpscaleScheduler
+)
+from utils.upscale_import import (
+    SKIP_DONE, SKIP_DUPLICATE, SKIP_EXISTING, settings_fingerprint, upscale_output_path
+)
+from utils.workflow_templates import DEFAULT_WORKFLOW, WorkflowTemplateError, workflow_registry
+from utils.qt_future import watch_future
 from database_manager import db_manager
 
+# 处理期间健康检查（刷新服务器队列负载）的间隔（毫秒）
+LOAD_REFRESH_INTERVAL_MS = 15000
+# 所有服务器都不可用时，等待恢复的最长时间（秒），超过后剩余任务标记为失败
+ALL_DOWN_GRACE_SECONDS = 180
+
 class UpscaleInterface(QWidget):
     """高清放大界面"""
 
@@ -23,15 +44,36 @@ class UpscaleInterface(QWidget):
         self.video_files = []  # 存储导入的视频文件路径
         self.current_thread = None  # 当前处理线程
         self.is_processing = False  # 处理状态标志
+        self.stopping = False  # 已请求停止，等待线程结束
         self.current_index = 0  # 当前处理的视频索引
         self.mode = 'tiny'  # 默认模式改为tiny
         self.scale = 2  # 默认放大系数
+        self.template = None  # 本批次使用的工作流模板
         # 并发调度相关
-        self.pending_indices = []
-        self.running_workers = 0
+        self.scheduler = None  # 按服务器负载与速度分配任务
+        self.probe_thread = None
+        self.all_down_since = None  # 所有服务器开始不可用的时间
         self.active_threads = []
         self.enabled_servers = []
+        # 分段并行处理：行号 -> 分段计划（临时目录、帧率、已完成的分段输出等）
+        self.segment_enabled = False
+        self.segment_plans = {}
+        self.merge_threads = []
+        # 持久化任务队列：批次ID、行号 -> upscale_jobs 表中的任务ID、需要重新连接的任务
+        self.batch_id = None
+        self.job_ids = {}
+        self.batch_rows = []
+        self.resume_jobs = {}
+        # 导入时的检查结果：行号 -> ImportEntry（文件哈希等），以及跳过的行
+        self.import_thread = None
+        self.import_entries = {}
+        self.skipped_rows = {}
+        self.fingerprint = None
+        self.load_timer = QTimer(self)
+        self.load_timer.setInterval(LOAD_REFRESH_INTERVAL_MS)
+        self.load_timer.timeout.connect(self.refresh_server_loads)
         self.init_ui()
+        self.restore_unfinished_batch()
 
     def init_ui(self):
         layout = QVBoxLayout(self)
@@ -56,6 +98,12 @@ class UpscaleInterface(QWidget):
         self.server_btn.clicked.connect(self.show_server_config)
         control_layout.addWidget(self.server_btn)
         
+        # 工作流模板选择（按批次生效）
+        control_layout.addWidget(BodyLabel('工作流:'))
+        self.workflow_combo = ComboBox()
+        self.load_workflows()
+        control_layout.addWidget(self.workflow_combo)
+
         # 开始处理按钮
         self.process_btn = PrimaryPushButton('开始处理')
         self.process_btn.clicked.connect(self.start_processing)
@@ -108,30 +156,19 @@ class UpscaleInterface(QWidget):
         from PyQt5.QtWidgets import QAbstractItemView
         self.video_table.setEditTriggers(QAbstractItemView.NoEditTriggers)
 
-    def import_video_folder(self):
-        """导入视频文件夹"""
-        folder_path = QFileDialog.getExistingDirectory(
-            self, 
-            "选择视频文件夹", 
-            str(Path.home())
-        )
-        
-        if not folder_path:
-            return
-            
-        # 清空当前表格
-        self.video_table.setRowCount(0)
-        self.video_files = []
-        
-        # 查找视频文件
-        video_extensions = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv'}
-        folder = Path(folder_path)
-        
-        for file_path in folder.iterdir():
-            if file_path.is_file() and file_path.suffix.lower() in video_extensions:
-                self.video_files.append(str(file_path))
-                
-        # 填充表格
+    def load_workflows(self):
+        """读取工作流模板（启动时加载并校验一次）并填充下拉框"""
+        workflow_registry.load()
+        selected = db_manager.load_config('upscale_workflow', DEFAULT_WORKFLOW)
+        self.workflow_combo.clear()
+        for template in workflow_registry.templates():
+            self.workflow_combo.addItem(template.title, userData=template.name)
+            if template.name == selected:
+                self.workflow_combo.setCurrentIndex(self.workflow_combo.count() - 1)
+        self.workflow_combo.setEnabled(self.workflow_combo.count() > 1)
+
+    def fill_video_table(self):
+        """按 video_files 填充表格"""
         self.video_table.setRowCount(len(self.video_files))
         for row, file_path in enumerate(self.video_files):
             path_obj = Path(file_path)
@@ -162,20 +199,115 @@ class UpscaleInterface(QWidget):
             # 路径
             path_item = QTableWidgetItem(str(path_obj))
             self.video_table.setItem(row, 3, path_item)
-                
+
+    def import_video_folder(self):
+        """导入视频文件夹"""
+        folder_path = QFileDialog.getExistingDirectory(
+            self, 
+            "选择视频文件夹", 
+            str(Path.home())
+        )
+        
+        if not folder_path:
+            return
+            
+        # 清空当前表格
+        self.video_table.setRowCount(0)
+        self.video_files = []
+        self.batch_id = None
+        self.job_ids = {}
+        self.import_entries = {}
+        self.skipped_rows = {}
+        self.process_btn.setEnabled(False)
+
+        # 在后台扫描文件夹：排除之前的 -hd 输出、计算文件哈希，识别已完成与重复的视频
+        try:
+            template = workflow_registry.get(self.workflow_combo.currentData())
+            fingerprint = settings_fingerprint(
+                template, db_manager.load_config('upscale_mode', 'tiny'), db_manager.load_config('upscale_scale', 2)
+            )
+        except WorkflowTemplateError:
+            fingerprint = None
+        self.import_btn.setEnabled(False)
+        self.status_label.setText("正在检查视频文件...")
+        self.import_thread = UpscaleImportThread(folder_path, fingerprint)
+        self.import_thread.progress.connect(
+            lambda done, total: self.status_label.setText(f"正在检查视频文件（计算文件哈希）: {done}/{total}")
+        )
+        self.import_thread.finished.connect(self.on_import_finished)
+        self.import_thread.start()
+
+    def on_import_finished(self, plan, error: str):
+        """文件夹检查完成：填充表格，标记跳过的视频"""
+        self.import_btn.setEnabled(True)
+        if plan is None:
+            self.status_label.setText("导入失败")
+            from qfluentwidgets import InfoBar, InfoBarPosition
+            InfoBar.error(
+                title='错误',
+                content=f'读取视频文件夹失败: {error}',
+                orient=Qt.Horizontal,  # type: ignore
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+            return
+
+        existing = [e for e in plan.entries if e.output_exists]
+        if existing:
+            from qfluentwidgets import MessageBox
+            dialog = MessageBox(
+                title='已有高清输出',
+                content=f'{len(existing)} 个视频已有同名的高清输出文件（-hd），但没有找到相同设置下的处理记录。\n'
+                        f'是否跳过这些视频？',
+                parent=self
+            )
+            dialog.yesButton.setText('跳过')
+            dialog.cancelButton.setText('重新处理')
+            if dialog.exec():
+                for entry in existing:
+                    entry.skip = SKIP_EXISTING
+
+        self.video_files = [entry.path for entry in plan.entries]
+        self.import_entries = dict(enumerate(plan.entries))
+        self.fill_video_table()
+        skip_text = {SKIP_DONE: "已跳过（已完成）", SKIP_DUPLICATE: "已跳过（重复）", SKIP_EXISTING: "已跳过（已有输出）"}
+        for row, entry in self.import_entries.items():
+            if not entry.skip:
+                continue
+            self.skipped_rows[row] = entry.skip
+            status_item = self.video_table.item(row, 1)
+            status_item.setText(skip_text[entry.skip])
+            if entry.duplicate_of:
+                status_item.setToolTip(f"与 {Path(entry.duplicate_of).name} 内容相同")
+
+        to_process = len(self.video_files) - len(self.skipped_rows)
         if self.video_files:
-            self.status_label.setText(f"已导入 {len(self.video_files)} 个视频文件")
+            summary = f"已导入 {len(self.video_files)} 个视频文件，需要处理 {to_process} 个"
+            details = [
+                f"{text} {count} 个" for text, count in (
+                    ("已完成", plan.count(SKIP_DONE)),
+                    ("重复", plan.count(SKIP_DUPLICATE)),
+                    ("已有输出", plan.count(SKIP_EXISTING)),
+                ) if count
+            ]
+            if details:
+                summary += f"（跳过{'，'.join(details)}）"
+            if plan.excluded_outputs:
+                summary += f"，已排除 {plan.excluded_outputs} 个高清输出文件"
+            self.status_label.setText(summary)
             from qfluentwidgets import InfoBar, InfoBarPosition
             InfoBar.success(
                 title='成功',
-                content=f'成功导入 {len(self.video_files)} 个视频文件',
+                content=summary,
                 orient=Qt.Horizontal,  # type: ignore
                 isClosable=True,
                 position=InfoBarPosition.TOP,
                 duration=2000,
                 parent=self
             )
-            self.process_btn.setEnabled(True)
+            self.process_btn.setEnabled(to_process > 0)
         else:
             self.status_label.setText("未找到视频文件")
             from qfluentwidgets import InfoBar, InfoBarPosition
@@ -250,6 +382,38 @@ class UpscaleInterface(QWidget):
         # 获取设置
         self.mode = db_manager.load_config('upscale_mode', 'tiny')  # 默认tiny
         self.scale = db_manager.load_config('upscale_scale', 2)
+        self.segment_enabled = bool(db_manager.load_config('upscale_segment_enabled', False))
+        try:
+            self.template = workflow_registry.get(self.workflow_combo.currentData())
+        except WorkflowTemplateError as e:
+            from qfluentwidgets import InfoBar, InfoBarPosition
+            InfoBar.error(
+                title='错误',
+                content=str(e),
+                orient=Qt.Horizontal,  # type: ignore
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+            return
+        if not self.template.supports('frame_rate'):
+            # 无法指定输出帧率时各段拼接后时间轴可能不连续，整段处理
+            self.segment_enabled = False
+        self.fingerprint = settings_fingerprint(self.template, self.mode, self.scale)
+        to_process = len(self.video_files) - len(self.skipped_rows)
+        if to_process <= 0:
+            from qfluentwidgets import InfoBar, InfoBarPosition
+            InfoBar.info(
+                title='提示',
+                content='所有视频都已处理过，没有需要处理的视频',
+                orient=Qt.Horizontal,  # type: ignore
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=2000,
+                parent=self
+            )
+            return
         # 获取启用的服务器列表
         self.enabled_servers = db_manager.get_upscale_servers(enabled_only=True)
         if not self.enabled_servers:
@@ -269,13 +433,15 @@ class UpscaleInterface(QWidget):
         from qfluentwidgets import MessageBox
         dialog = MessageBox(
             title='确认处理',
-            content=f'确定要处理 {len(self.video_files)} 个视频文件吗？\n模式: {self.mode}\n放大系数: {self.scale}倍',
+            content=f'确定要处理 {to_process} 个视频文件吗？\n工作流: {self.template.title}\n模式: {self.mode}\n放大系数: {self.scale}倍',
             parent=self
         )
         dialog.yesButton.setText('开始处理')
         dialog.cancelButton.setText('取消')
         
         if dialog.exec():
+            db_manager.save_config('upscale_workflow', self.template.name, 'string', '高清放大使用的工作流模板',
+                                   wait=False)
             # 设置处理状态
             self.is_processing = True
             
@@ -283,27 +449,245 @@ class UpscaleInterface(QWidget):
             self.import_btn.setEnabled(False)
             self.settings_btn.setEnabled(False)
             self.server_btn.setEnabled(False)
+            self.workflow_combo.setEnabled(False)
             self.process_btn.setEnabled(False)
             self.process_btn.setText('处理中...')
             self.stop_btn.setEnabled(True)
             
-            # 更新表格状态
+            # 更新表格状态（跳过的视频保持原状态）
             for row in range(self.video_table.rowCount()):
                 status_item = self.video_table.item(row, 1)
-                if status_item:
+                if status_item and row not in self.skipped_rows:
                     status_item.setText("待处理")
-            
-            # 初始化任务队列并启动并发处理
-            self.pending_indices = list(range(len(self.video_files)))
+
+            # 先读取视频信息与服务器负载，再由调度器分配任务
             self.active_threads = []
-            self.running_workers = 0
+            self.scheduler = None
+            self.all_down_since = None
+            self.cleanup_segments()
+            self.status_label.setText("正在读取视频信息与服务器负载...")
+
+            # 继续当前批次中未完成的任务，或为新导入的视频建立批次
+            self.prepare_batch()
+
+    def restore_unfinished_batch(self):
+        """启动时恢复上次未完成的批次（程序关闭或停止处理时仍在排队/处理中的任务）"""
+        batch_id = db_manager.get_unfinished_upscale_batch()
+        if not batch_id:
+            return
+        jobs = [job for job in db_manager.get_upscale_jobs(batch_id) if os.path.exists(job['input_path'])]
+        if not jobs:
+            return
+        self.batch_id = batch_id
+        self.video_files = [job['input_path'] for job in jobs]
+        self.job_ids = {row: job['id'] for row, job in enumerate(jobs)}
+        self.import_entries = {}
+        self.skipped_rows = {}
+        self.fill_video_table()
+        unfinished = 0
+        for row, job in enumerate(jobs):
+            status_item = self.video_table.item(row, 1)
+            if job['state'] == JOB_DONE:
+                status_item.setText("已完成")
+            elif job['state'] == JOB_FAILED:
+                status_item.setText("失败")
+            else:
+                status_item.setText("待继续")
+                unfinished += 1
+        self.status_label.setText(f"发现上次未完成的高清放大任务 {unfinished} 个，点击“开始处理”继续")
+        self.process_btn.setEnabled(True)
+
+    def prepare_batch(self):
+        """
+        准备本次处理的任务，准备好后开始探测
+
+        当前表格对应已保存的批次时继续该批次：跳过已完成的任务，已提交到服务器的任务重新连接；
+        否则新建批次，并丢弃其他批次中未完成的任务。新批次在写线程中保存，保存完成后再开始探测。
+        """
+        self.resume_jobs = {}
+        saved = {job['id']: job for job in db_manager.get_upscale_jobs(self.batch_id)} if self.batch_id else {}
+        if saved and self.job_ids and all(i in saved for i in self.job_ids.values()):
+            rows = []
+            for row, job_id in self.job_ids.items():
+                job = saved[job_id]
+                if job['state'] == JOB_DONE and os.path.exists(job['output_path']):
+                    self.video_table.item(row, 1).setText("已完成")
+                    continue
+                if job['state'] in (JOB_RUNNING, JOB_DOWNLOADING) and job['prompt_id'] and job['server_url']:
+                    self.resume_jobs[row] = job
+                rows.append(row)
+            logger.info(f"继续高清放大批次 {self.batch_id}: {len(rows)} 个任务，其中 {len(self.resume_jobs)} 个重新连接")
+            self.on_batch_ready(rows)
+            return
+
+        batch_id = uuid.uuid4().hex
+        self.batch_id = batch_id
+        self.job_ids = {}
+        db_manager.discard_upscale_batches(batch_id, wait=False)
+        rows = [row for row in range(len(self.video_files)) if row not in self.skipped_rows]
+        jobs = []
+        for row in rows:
+            entry = self.import_entries.get(row)
+            jobs.append({
+                'row_index': row,
+                'input_path': self.video_files[row],
+                'output_path': str(self.output_path_for(row)),
+                'input_hash': entry.input_hash if entry else None,
+                'input_size': entry.size if entry else None,
+                'input_mtime': entry.mtime if entry else None,
+                'fingerprint': self.fingerprint,
+            })
+        future = db_manager.add_upscale_jobs(batch_id, jobs, wait=False)
+        watch_future(future, lambda ids: self.on_batch_created(batch_id, rows, ids), self)
+
+    def on_batch_created(self, batch_id: str, rows: list, ids):
+        """新批次保存完成（GUI 线程）"""
+        if not self.is_processing or batch_id != self.batch_id:
+            # 保存期间已停止处理或已开始新的批次
+            return
+        if not ids or len(ids) != len(rows):
+            # 写入失败时 add_upscale_jobs 返回空列表
+            self.finish_processing()
+            self.status_label.setText("保存任务批次失败，请查看日志")
+            return
+        self.job_ids = dict(zip(rows, ids))
+        self.on_batch_ready(rows)
+
+    def on_batch_ready(self, rows: list):
+        """任务批次准备好后开始探测视频信息与服务器负载"""
+        self.batch_rows = rows
+        self.start_probe([(row, self.video_files[row]) for row in rows])
+
+    def record_job(self, row: int, state: str, **fields):
+        """保存整行任务的状态（分段任务只记录整行的最终结果）"""
+        job_id = self.job_ids.get(row)
+        if job_id is not None:
+            db_manager.update_upscale_job(job_id, state=state, wait=False, **fields)
+
+    def start_probe(self, videos=()):
+        """在后台探测视频工作量（videos 非空时）与服务器负载"""
+        if self.probe_thread and self.probe_thread.isRunning():
+            return
+        self.probe_thread = UpscaleProbeThread(
+            [s['url'] for s in self.enabled_servers], videos, self.scale,
+            segment=self.segment_enabled and len(self.enabled_servers) > 1
+        )
+        self.probe_thread.probed.connect(self.on_probed)
+        self.probe_thread.finished.connect(self.check_stopped)
+        self.probe_thread.start()
+
+    def refresh_server_loads(self):
+        """定时刷新服务器队列负载"""
+        if self.is_processing and self.scheduler:
+            self.start_probe()
 
-            # 根据启用的服务器并发启动任务
-            for server in self.enabled_servers:
-                if not self.pending_indices:
-                    break
-                self.start_next_for_server(server['url'])
-                self.running_workers += 1
+    def on_probed(self, works: dict, loads: dict, segments: dict):
+        """探测完成：首次创建调度器（已切分的视频按分段建任务），之后只更新服务器负载"""
+        if not self.is_processing:
+            for _, parts in segments.values():
+                shutil.rmtree(os.path.dirname(parts[0].path), ignore_errors=True)
+            return
+        if self.scheduler is None:
+            jobs = []
+            for i in self.batch_rows:
+                path = self.video_files[i]
+                if i in segments and i in self.resume_jobs:
+                    # 已提交到服务器的任务直接重新连接，不再分段
+                    shutil.rmtree(os.path.dirname(segments[i][1][0].path), ignore_errors=True)
+                if i not in segments or i in self.resume_jobs:
+                    jobs.append(UpscaleJob(i, path, works.get(i)))
+                    continue
+                fps, parts = segments[i]
+                total_frames = sum(p.frames for p in parts) or 1
+                work = works.get(i)
+                for part in parts:
+                    part_work = work * part.frames / total_frames if work else None
+                    jobs.append(UpscaleJob(i, part.path, part_work, segment=part.index))
+                self.segment_plans[i] = {
+                    'work_dir': os.path.dirname(parts[0].path),
+                    'fps': fps,
+                    'total': len(parts),
+                    'outputs': {},
+                    'failed': False,
+                }
+                self.update_segment_status(i)
+            self.scheduler = UpscaleScheduler(self.enabled_servers, jobs)
+            self.load_timer.start()
+            # 上次运行时已提交的任务：回到原服务器按 prompt_id 重新连接，不重复占用GPU
+            for row, saved in self.resume_jobs.items():
+                server = self.scheduler.attach((row, None), saved['server_url'])
+                if server:
+                    self.start_job(self.scheduler.jobs[(row, None)], server, resume=saved)
+        self.scheduler.update_loads(loads)
+        self.dispatch_jobs()
+
+    def dispatch_jobs(self):
+        """按调度器的规划提交任务，全部结束时完成处理"""
+        if not self.is_processing or self.scheduler is None:
+            return
+        for job, server in self.scheduler.next_assignments():
+            self.start_job(job, server)
+
+        if not self.scheduler.has_work():
+            if self.merge_threads:
+                self.update_schedule_status()
+            else:
+                self.finish_processing()
+        elif self.scheduler.in_flight_count() == 0 and self.scheduler.all_servers_down():
+            # 所有服务器都已熔断：健康检查继续进行，等待服务器恢复
+            if self.all_down_since is None:
+                self.all_down_since = time.monotonic()
+            if time.monotonic() - self.all_down_since < ALL_DOWN_GRACE_SECONDS:
+                self.update_schedule_status()
+                return
+            for job in self.scheduler.cancel_pending():
+                self.record_job(job.index, JOB_FAILED, error='所有服务器都无法访问')
+                status_item = self.video_table.item(job.index, 1)
+                if status_item:
+                    status_item.setText("失败")
+                if job.segment is not None:
+                    self.release_segments(job.index)
+            from qfluentwidgets import InfoBar, InfoBarPosition
+            InfoBar.error(
+                title='错误',
+                content=f'所有已启用的服务器在{ALL_DOWN_GRACE_SECONDS}秒内都无法访问，请检查服务器配置',
+                orient=Qt.Horizontal,  # type: ignore
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+            self.finish_processing()
+        else:
+            self.all_down_since = None
+            self.update_schedule_status()
+
+    def update_schedule_status(self):
+        """状态栏显示排队/进行中的任务数与各服务器的负载和速度"""
+        if not self.scheduler:
+            return
+        parts = []
+        if self.all_down_since is not None:
+            parts.append("所有服务器暂不可用，等待恢复")
+        for server in self.scheduler.servers:
+            if not server.reachable:
+                parts.append(f"{server.name}: 熔断（{server.last_error or '无法访问'}）")
+                continue
+            text = f"{server.name}: {'试探中，' if server.state == BREAKER_HALF_OPEN else ''}{len(server.in_flight)}个任务"
+            if server.latency_ms is not None:
+                text += f"，延迟{server.latency_ms:.0f}ms"
+            if server.external_jobs:
+                text += f"，他人排队{server.external_jobs}"
+            if server.seconds_per_mpf:
+                text += f"，{server.seconds_per_mpf:.3f}秒/百万像素帧"
+            if server.vram_total:
+                text += f"，显存空闲{server.vram_free / 1024 ** 3:.1f}/{server.vram_total / 1024 ** 3:.1f}GB"
+            parts.append(text)
+        merging = f"，拼接中 {len(self.merge_threads)} 个" if self.merge_threads else ""
+        self.status_label.setText(
+            f"排队 {len(self.scheduler.pending)} 个，进行中 {self.scheduler.in_flight_count()} 个{merging} | "
+            + "；".join(parts)
+        )
 
     def stop_processing(self):
         """停止处理"""
@@ -320,70 +704,220 @@ class UpscaleInterface(QWidget):
             
             if dialog.exec():
                 self.is_processing = False
+                self.load_timer.stop()
                 
-                # 停止所有正在运行的线程
-                try:
-                    for t in list(self.active_threads):
-                        if t.isRunning():
-                            t.terminate()
-                            t.wait()
-                except Exception:
-                    pass
-                
-                # 更新按钮状态
-                self.import_btn.setEnabled(True)
-                self.settings_btn.setEnabled(True)
-                self.server_btn.setEnabled(True)
-                self.process_btn.setEnabled(True)
-                self.process_btn.setText('开始处理')
+                # 通知所有线程停止：线程自行删除临时文件并取消服务器上的任务，结束后再恢复界面
+                self.stopping = True
+                for t in list(self.active_threads) + list(self.merge_threads):
+                    t.cancel()
+                if self.probe_thread:
+                    self.probe_thread.cancel()
                 self.stop_btn.setEnabled(False)
-                
-                # 更新状态标签
-                self.status_label.setText("处理已停止")
-                
-                from qfluentwidgets import InfoBar, InfoBarPosition
-                InfoBar.warning(
-                    title='已停止',
-                    content='视频处理已停止',
-                    orient=Qt.Horizontal,  # type: ignore
-                    isClosable=True,
-                    position=InfoBarPosition.TOP,
-                    duration=2000,
-                    parent=self
-                )
+                self.status_label.setText("正在停止…")
+                self.check_stopped()
 
-    def start_next_for_server(self, server_url: str):
-        """为指定服务器启动下一个任务"""
-        if not self.is_processing or not self.pending_indices:
+    def shutdown(self) -> list:
+        """关闭窗口时停止所有线程，返回需要等待退出的线程
+
+        已提交到服务器的任务保留在服务器上（状态仍为执行中），下次启动时重新连接。
+        """
+        self.is_processing = False
+        self.load_timer.stop()
+        threads = []
+        for t in self.active_threads:
+            t.detach()
+            threads.append(t)
+        for t in [*self.merge_threads, self.probe_thread, self.import_thread]:
+            if t and t.isRunning():
+                t.cancel()
+                threads.append(t)
+        return threads
+
+    def check_stopped(self):
+        """停止处理时，所有线程结束后恢复界面"""
+        if not self.stopping or self.active_threads or self.merge_threads:
+            return
+        if self.probe_thread and self.probe_thread.isRunning():
             return
+        self.stopping = False
+        self.cleanup_segments()
 
-        index = self.pending_indices.pop(0)
-        input_path = Path(self.video_files[index])
-        # 默认命名（高清放大不使用AI标题）
-        output_path = input_path.parent / f"{input_path.stem}-hd{input_path.suffix}"
+        # 更新按钮状态
+        self.import_btn.setEnabled(True)
+        self.settings_btn.setEnabled(True)
+        self.server_btn.setEnabled(True)
+        self.process_btn.setEnabled(True)
+        self.process_btn.setText('开始处理')
+        self.workflow_combo.setEnabled(self.workflow_combo.count() > 1)
+        self.stop_btn.setEnabled(False)
 
-        # 更新状态标签与表格
-        self.status_label.setText(f"正在处理: {input_path.name}")
-        status_item = self.video_table.item(index, 1)
-        if status_item:
-            status_item.setText("处理中")
+        # 更新状态标签（未完成的任务已保存，可以继续）
+        self.status_label.setText("处理已停止，再次点击“开始处理”可继续未完成的任务")
+
+        from qfluentwidgets import InfoBar, InfoBarPosition
+        InfoBar.warning(
+            title='已停止',
+            content='视频处理已停止',
+            orient=Qt.Horizontal,  # type: ignore
+            isClosable=True,
+            position=InfoBarPosition.TOP,
+            duration=2000,
+            parent=self
+        )
+
+    def output_path_for(self, index: int) -> Path:
+        """放大结果的保存路径（默认命名，高清放大不使用AI标题）"""
+        return Path(upscale_output_path(self.video_files[index]))
+
+    def start_job(self, job: UpscaleJob, server, resume: dict = None):
+        """把视频（或视频的一个分段）提交给调度器选定的服务器；resume 为需要重新连接的已保存任务"""
+        frame_rate = None
+        job_id = None
+        if job.segment is None:
+            output_path = self.output_path_for(job.index)
+            job_id = self.job_ids.get(job.index)
+            # 更新表格
+            status_item = self.video_table.item(job.index, 1)
+            if status_item:
+                status_item.setText(f"{'重新连接' if resume else '处理中'} ({server.name})")
+        else:
+            # 分段结果先保存在临时目录，全部完成后再拼接
+            plan = self.segment_plans[job.index]
+            output_path = Path(plan['work_dir']) / f"seg_{job.segment:03d}-hd.mp4"
+            frame_rate = plan['fps']
 
         # 创建并启动线程
         t = VideoUpscaleThread(
-            str(input_path),
+            job.path,
             str(output_path),
             self.mode,
             self.scale,
-            server_url
+            server.url,
+            frame_rate=frame_rate,
+            template=self.template,
+            job_id=job_id,
+            resume_prompt_id=resume['prompt_id'] if resume else None,
+            resume_client_id=resume['client_id'] if resume else None
         )
-        t.progress.connect(lambda message, idx=index: self.on_worker_progress(idx, message))
-        t.finished.connect(lambda success, message, out, idx=index, srv=server_url, thread=t: self.on_worker_finished(idx, srv, success, message, out, thread))
+        t.progress.connect(lambda message, idx=job.index: self.on_worker_progress(idx, message))
+        t.finished.connect(lambda success, message, out, j=job, thread=t: self.on_worker_finished(j, success, message, out, thread))
         self.active_threads.append(t)
         t.start()
 
+    def update_segment_status(self, index: int):
+        """分段处理的视频在表格中显示已完成的分段数"""
+        plan = self.segment_plans.get(index)
+        status_item = self.video_table.item(index, 1)
+        if plan and status_item:
+            status_item.setText(f"分段处理中 ({len(plan['outputs'])}/{plan['total']})")
+
+    def release_segments(self, index: int):
+        """视频失败时取消其余分段；没有仍在处理的分段后删除临时目录"""
+        plan = self.segment_plans.get(index)
+        if not plan:
+            return
+        plan['failed'] = True
+        if self.scheduler:
+            self.scheduler.cancel_pending(index)
+            if self.scheduler.in_flight_for(index):
+                return
+        shutil.rmtree(plan['work_dir'], ignore_errors=True)
+        self.segment_plans.pop(index, None)
+
+    def cleanup_segments(self):
+        """删除所有分段临时目录"""
+        for plan in self.segment_plans.values():
+            shutil.rmtree(plan['work_dir'], ignore_errors=True)
+        self.segment_plans = {}
+
+    def on_segment_finished(self, job: UpscaleJob, success: bool, requeued: bool, message: str, output_path: str):
+        """分段完成回调：全部分段完成后启动拼接"""
+        plan = self.segment_plans.get(job.index)
+        if not plan:
+            return
+        if plan['failed']:
+            self.release_segments(job.index)
+            return
+        if success:
+            plan['outputs'][job.segment] = output_path
+            if len(plan['outputs']) == plan['total']:
+                self.start_merge(job.index)
+            else:
+                self.update_segment_status(job.index)
+        elif requeued:
+            self.update_segment_status(job.index)
+        else:
+            self.release_segments(job.index)
+            self.record_job(job.index, JOB_FAILED, error=message)
+            status_item = self.video_table.item(job.index, 1)
+            if status_item:
+                status_item.setText("失败")
+            from qfluentwidgets import InfoBar, InfoBarPosition
+            InfoBar.error(
+                title='处理失败',
+                content=f'{Path(self.video_files[job.index]).name} 第{job.segment + 1}段: {message}',
+                orient=Qt.Horizontal,  # type: ignore
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+
+    def start_merge(self, index: int):
+        """按顺序拼接放大后的分段，生成最终输出文件"""
+        plan = self.segment_plans[index]
+        status_item = self.video_table.item(index, 1)
+        if status_item:
+            status_item.setText("拼接中")
+        segment_paths = [plan['outputs'][i] for i in sorted(plan['outputs'])]
+        t = UpscaleMergeThread(segment_paths, self.video_files[index], str(self.output_path_for(index)))
+        t.finished.connect(lambda success, message, idx=index, thread=t: self.on_merge_finished(idx, success, message, thread))
+        self.merge_threads.append(t)
+        t.start()
+
+    def on_merge_finished(self, index: int, success: bool, message: str, thread: UpscaleMergeThread):
+        """拼接完成回调"""
+        if thread in self.merge_threads:
+            self.merge_threads.remove(thread)
+        plan = self.segment_plans.pop(index, None)
+        if plan:
+            shutil.rmtree(plan['work_dir'], ignore_errors=True)
+        if thread.cancel_token.cancelled:
+            # 已停止：分段结果已删除，下次继续时整行重新处理
+            self.record_job(index, JOB_QUEUED)
+            status_item = self.video_table.item(index, 1)
+            if status_item:
+                status_item.setText("已停止")
+            self.check_stopped()
+            return
+
+        if success:
+            self.record_job(index, JOB_DONE, error=None, fingerprint=self.fingerprint)
+        else:
+            self.record_job(index, JOB_FAILED, error=message)
+        status_item = self.video_table.item(index, 1)
+        if status_item:
+            status_item.setText("已完成" if success else "失败")
+        if not success:
+            from qfluentwidgets import InfoBar, InfoBarPosition
+            InfoBar.error(
+                title='处理失败',
+                content=f'{Path(self.video_files[index]).name}: {message}',
+                orient=Qt.Horizontal,  # type: ignore
+                isClosable=True,
+                position=InfoBarPosition.TOP,
+                duration=3000,
+                parent=self
+            )
+        if self.is_processing and self.scheduler:
+            self.dispatch_jobs()
+        self.check_stopped()
+
     def finish_processing(self):
         """完成处理"""
         self.is_processing = False
+        self.load_timer.stop()
+        self.cleanup_segments()
         
         # 更新按钮状态
         self.import_btn.setEnabled(True)
@@ -391,11 +925,14 @@ class UpscaleInterface(QWidget):
         self.server_btn.setEnabled(True)
         self.process_btn.setEnabled(True)
         self.process_btn.setText('开始处理')
+        self.workflow_combo.setEnabled(self.workflow_combo.count() > 1)
         self.stop_btn.setEnabled(False)
         
         # 检查是否所有文件都已处理完成
         all_completed = True
         for row in range(self.video_table.rowCount()):
+            if row in self.skipped_rows:
+                continue
             status_item = self.video_table.item(row, 1)
             if status_item and status_item.text() not in ["已完成", "失败"]:
                 all_completed = False
@@ -418,15 +955,55 @@ class UpscaleInterface(QWidget):
 
     def on_worker_progress(self, row_index: int, message: str):
         """处理进度更新"""
+        if self.stopping:
+            return
         self.status_label.setText(message)
 
-    def on_worker_finished(self, row_index: int, server_url: str, success: bool, message: str, output_path: str, thread: VideoUpscaleThread):
+    def on_worker_finished(self, job: UpscaleJob, success: bool, message: str, output_path: str, thread: VideoUpscaleThread):
         """并发线程完成回调"""
+        # 清理线程引用
+        try:
+            if thread in self.active_threads:
+                self.active_threads.remove(thread)
+        except Exception:
+            pass
+
+        if thread.cancel_token.cancelled:
+            # 已停止：线程已取消服务器上的任务并把任务恢复为排队，下次继续时重新提交
+            status_item = self.video_table.item(job.index, 1)
+            if status_item and job.segment is None:
+                status_item.setText("已停止")
+            self.check_stopped()
+            return
+
+        # 记录用时与失败原因：学习服务器速度、更新熔断状态，失败的任务可能换服务器重试
+        requeued = False
+        if self.is_processing and self.scheduler:
+            requeued = self.scheduler.job_finished(
+                job.key, success, thread.queued_at, thread.execution_seconds,
+                server_fault=thread.server_fault, retryable=thread.retryable, error=message
+            )
+
         # 更新表格状态
+        row_index = job.index
+        if job.segment is None:
+            if success:
+                # 重新连接的任务沿用提交时的设置，其余任务记录本次设置的指纹
+                fields = {} if thread.reattached else {'fingerprint': self.fingerprint}
+                self.record_job(row_index, JOB_DONE, error=None, **fields)
+            elif requeued:
+                self.record_job(row_index, JOB_QUEUED, prompt_id=None, error=message)
+            elif self.is_processing:
+                self.record_job(row_index, JOB_FAILED, error=message)
         status_item = self.video_table.item(row_index, 1)
-        if status_item:
+        if job.segment is not None:
+            if self.is_processing:
+                self.on_segment_finished(job, success, requeued, message, output_path)
+        elif status_item:
             if success:
                 status_item.setText("已完成")
+            elif requeued:
+                status_item.setText("等待重试")
             else:
                 status_item.setText("失败")
                 from qfluentwidgets import InfoBar, InfoBarPosition
@@ -440,18 +1017,9 @@ class UpscaleInterface(QWidget):
                     parent=self
                 )
 
-        # 清理线程引用
-        try:
-            if thread in self.active_threads:
-                self.active_threads.remove(thread)
-        except Exception:
-            pass
-
-        # 为该服务器继续启动下一项任务或结束处理
-        if self.is_processing and self.pending_indices:
-            self.start_next_for_server(server_url)
-        else:
-            # 该服务器不再有任务，减少活跃工作者计数
-            self.running_workers = max(0, self.running_workers - 1)
-            if self.running_workers == 0:
-                self.finish_processing()
+        if self.is_processing and self.scheduler:
+            if not success and thread.server_fault:
+                # 服务器原因失败：立即做一次健康检查
+                self.start_probe()
+            self.dispatch_jobs()
+        self.check_stopped()
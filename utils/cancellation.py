@@ -0,0 +1,101 @@
+"""
+协作式取消
+
+工作线程持有一个 CancelToken，界面调用 cancel() 请求停止，线程在下一次检查时自行退出并清理
+（删除临时文件、关闭连接、取消服务器上的任务），不再使用 QThread.terminate()。
+
+CancelToken 可以直接作为各处的 cancelled 参数（返回 True 表示已取消）传入：
+ffmpeg 子进程、流式上传/下载的分块循环与轮询等待都会在一秒内响应。
+轮询间隔用 wait() 代替 sleep()，取消时立即返回。
+无法分块检查的阻塞调用（如等待大模型接口的 HTTP 响应）用 call_cancellable() 包装。
+"""
+
+import threading
+from concurrent.futures import Future, TimeoutError
+from typing import Any, Callable, List, Optional
+
+from loguru import logger
+
+
+class Cancelled(RuntimeError):
+    """操作已被取消"""
+
+    def __init__(self, message: str = "已取消"):
+        super().__init__(message)
+
+
+class CancelToken:
+    """取消令牌：线程安全，可被多个操作共享"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    def __call__(self) -> bool:
+        return self._event.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        """请求取消，并依次执行已注册的回调（回调应立即返回，不做阻塞操作）"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.debug(f"取消回调执行失败: {e}")
+
+    def on_cancel(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """注册取消时执行的回调（已取消时立即执行），返回注销函数"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+
+                def remove():
+                    with self._lock:
+                        if callback in self._callbacks:
+                            self._callbacks.remove(callback)
+                return remove
+        callback()
+        return lambda: None
+
+    def wait(self, seconds: float) -> bool:
+        """可被取消打断的等待，返回是否已取消"""
+        return self._event.wait(seconds)
+
+    def check(self):
+        """已取消时抛出 Cancelled"""
+        if self._event.is_set():
+            raise Cancelled()
+
+
+def call_cancellable(func: Callable[[], Any], token: Optional[CancelToken], poll: float = 0.2) -> Any:
+    """
+    在后台线程执行阻塞调用并等待结果，取消时在 poll 秒内抛出 Cancelled
+
+    取消后调用仍在后台执行到结束，结果被丢弃；token 为空时直接调用。
+    """
+    if token is None:
+        return func()
+    token.check()
+    future: Future = Future()
+
+    def run():
+        try:
+            future.set_result(func())
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name="cancellable-call", daemon=True).start()
+    while True:
+        try:
+            return future.result(timeout=poll)
+        except TimeoutError:
+            token.check()
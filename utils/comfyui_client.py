@@ -0,0 +1,503 @@
+"""
+ComfyUI 接口客户端
+
+- 提交工作流到 /prompt（带 client_id，执行事件只推送给本客户端）
+- 通过 /ws 实时接收执行进度（executing / progress / executed / execution_success 等事件），
+  完成后只查询本任务的 /history/{prompt_id}，不再反复下载整个历史记录
+- websocket 不可用（未安装 websocket-client、连接失败或中途断开）时改为轮询 /history/{prompt_id}
+- 上传与下载都按固定大小的块流式传输并回调字节进度，内存占用与视频大小无关；
+  下载先写入同目录的 .part 临时文件，校验完整后再原子替换为目标文件
+- 取消时从服务器队列删除排队中的任务，或通过 /interrupt 中断正在执行的任务
+"""
+
+import json
+import os
+import time
+import uuid
+from typing import Callable, Dict, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import requests
+from loguru import logger
+
+from utils.file_upload import CHUNK_SIZE, MultipartFileBody
+
+try:
+    import websocket  # websocket-client
+except ImportError:  # 未安装时只使用轮询
+    websocket = None
+
+# 任务开始执行后的最长等待时间（在服务器队列中排队的时间不计入）
+PROMPT_TIMEOUT = 600
+HISTORY_POLL_INTERVAL = 2
+WS_RECV_TIMEOUT = 1
+# 长时间没有本任务的消息时检查一次任务状态（history 与 /queue），防止漏掉完成事件或任务丢失
+WS_IDLE_CHECK = 15
+# 服务器连续无法访问超过该时长（秒）即判定任务失败，不再等到超时
+SERVER_LOST_AFTER = 30
+
+ProgressCallback = Callable[[str], None]
+# 传输进度：(已传输字节, 总字节；未知时为 0)
+TransferCallback = Callable[[int, int], None]
+CancelCheck = Callable[[], bool]
+
+
+class ComfyUIError(RuntimeError):
+    """ComfyUI 请求或执行失败；server_fault=False 表示工作流本身执行出错（与服务器健康无关）"""
+
+    def __init__(self, message: str, server_fault: bool = True):
+        super().__init__(message)
+        self.server_fault = server_fault
+
+
+def execution_seconds(history_entry: dict) -> Optional[float]:
+    """从 history 记录的 execution_start / execution_success 时间戳（毫秒）计算执行时长"""
+    try:
+        stamps = {}
+        for name, data in (history_entry.get("status") or {}).get("messages") or []:
+            if isinstance(data, dict) and "timestamp" in data:
+                stamps[name] = data["timestamp"]
+        if "execution_start" in stamps and "execution_success" in stamps:
+            return max(0.0, (stamps["execution_success"] - stamps["execution_start"]) / 1000)
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+def _history_error(history_entry: dict) -> Optional[str]:
+    """history 记录中的执行错误信息，成功时返回 None"""
+    status = history_entry.get("status") or {}
+    if status.get("status_str") != "error":
+        return None
+    for name, data in status.get("messages") or []:
+        if name == "execution_error" and isinstance(data, dict):
+            return f"节点 {data.get('node_type') or data.get('node_id')} 执行失败: {data.get('exception_message', '').strip()}"
+    return "执行失败"
+
+
+class ComfyUIClient:
+    """单个 ComfyUI 服务器的客户端"""
+
+    def __init__(self, base_url: str, session: Optional[requests.Session] = None,
+                 client_id: Optional[str] = None):
+        self.base_url = (base_url or "").rstrip('/')
+        self.session = session or requests.Session()
+        self.client_id = client_id or uuid.uuid4().hex
+
+    def ws_url(self) -> str:
+        parts = urlsplit(self.base_url)
+        scheme = 'wss' if parts.scheme == 'https' else 'ws'
+        return urlunsplit((scheme, parts.netloc, parts.path.rstrip('/') + '/ws', f"clientId={self.client_id}", ''))
+
+    # ---- HTTP ----
+
+    def upload_video(self, file_path: str, progress: Optional[TransferCallback] = None,
+                     cancelled: Optional[CancelCheck] = None) -> str:
+        """
+        流式上传视频到 /upload/image，返回服务器保存的文件名
+
+        同名文件已存在时 ComfyUI 会自动改名，工作流应使用返回的文件名。
+        """
+        body = MultipartFileBody(file_path, field='image', progress=progress, cancelled=cancelled)
+        resp = self.session.post(
+            f"{self.base_url}/upload/image",
+            data=body,
+            headers={'Content-Type': body.content_type},
+            timeout=(10, 300)
+        )
+        if resp.status_code != 200:
+            raise ComfyUIError(f"上传视频文件失败: {resp.status_code}: {resp.text[:200]}")
+        try:
+            data = resp.json()
+        except ValueError:
+            data = {}
+        name = data.get("name") or os.path.basename(file_path)
+        subfolder = data.get("subfolder")
+        return f"{subfolder}/{name}" if subfolder else name
+
+    def download_file(self, file_info: dict, save_path: str, progress: Optional[TransferCallback] = None,
+                      cancelled: Optional[CancelCheck] = None) -> int:
+        """
+        从 /view 流式下载输出文件到 save_path，返回文件字节数
+
+        Raises:
+            ComfyUIError: 下载失败、内容不完整或被取消（临时文件会被删除，save_path 保持不变）
+        """
+        filename = file_info.get("filename", "")
+        if not filename:
+            raise ComfyUIError("输出文件名为空")
+        params = {"filename": filename, "type": file_info.get("type", "output")}
+        if file_info.get("subfolder"):
+            params["subfolder"] = file_info["subfolder"]
+
+        tmp_path = f"{save_path}.part"
+        received = 0
+        try:
+            with self.session.get(f"{self.base_url}/view", params=params, stream=True, timeout=(10, 60)) as resp:
+                if resp.status_code != 200:
+                    raise ComfyUIError(f"下载输出文件失败: {resp.status_code}")
+                total = int(resp.headers.get("Content-Length") or 0)
+                with open(tmp_path, 'wb') as f:
+                    for chunk in resp.iter_content(CHUNK_SIZE):
+                        if cancelled and cancelled():
+                            raise ComfyUIError("已取消")
+                        f.write(chunk)
+                        received += len(chunk)
+                        if progress:
+                            progress(received, total)
+            if received == 0:
+                raise ComfyUIError("下载的输出文件为空")
+            if total and received != total:
+                raise ComfyUIError(f"输出文件下载不完整: {received}/{total} 字节")
+            os.replace(tmp_path, save_path)
+            return received
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+    def queue_prompt(self, workflow: dict) -> str:
+        """提交工作流，返回 prompt_id"""
+        resp = self.session.post(
+            f"{self.base_url}/prompt",
+            json={"prompt": workflow, "client_id": self.client_id},
+            timeout=30
+        )
+        if resp.status_code != 200:
+            raise ComfyUIError(f"发送处理请求失败: {resp.status_code}: {resp.text}")
+        data = resp.json()
+        prompt_id = data.get("prompt_id") or data.get("data", {}).get("prompt_id")
+        if not prompt_id:
+            raise ComfyUIError("未能获取处理任务ID")
+        return prompt_id
+
+    def _queue_ids(self, timeout: float = 10):
+        """返回服务器队列中 (正在执行的 prompt_id 集合, 排队中的 prompt_id 集合)"""
+        resp = self.session.get(f"{self.base_url}/queue", timeout=timeout)
+        if resp.status_code != 200:
+            raise ComfyUIError(f"查询服务器队列失败: {resp.status_code}")
+        data = resp.json() or {}
+
+        def ids(items):
+            # 队列项格式: [number, prompt_id, prompt, extra_data, outputs_to_execute]
+            return {item[1] for item in items or [] if isinstance(item, (list, tuple)) and len(item) > 1}
+        return ids(data.get("queue_running")), ids(data.get("queue_pending"))
+
+    def is_queued(self, prompt_id: str) -> bool:
+        """任务是否仍在服务器队列中（正在执行或排队）"""
+        running, pending = self._queue_ids()
+        return prompt_id in running or prompt_id in pending
+
+    def cancel_prompt(self, prompt_id: str, timeout: float = 3) -> bool:
+        """
+        取消已提交的任务：排队中的从队列删除，正在执行的发送 /interrupt
+
+        /interrupt 只在本任务正在执行时发送（带 prompt_id），不会中断其他客户端的任务。
+        返回是否成功通知服务器。
+        """
+        try:
+            running, pending = self._queue_ids(timeout)
+            if prompt_id in running:
+                self.session.post(f"{self.base_url}/interrupt", json={"prompt_id": prompt_id}, timeout=timeout)
+                logger.info(f"已中断ComfyUI任务: {self.base_url} {prompt_id}")
+            elif prompt_id in pending:
+                self.session.post(f"{self.base_url}/queue", json={"delete": [prompt_id]}, timeout=timeout)
+                logger.info(f"已从ComfyUI队列删除任务: {self.base_url} {prompt_id}")
+            return True
+        except Exception as e:
+            logger.warning(f"取消ComfyUI任务失败: {self.base_url} {prompt_id} - {e}")
+            return False
+
+    def get_history(self, prompt_id: str) -> Optional[dict]:
+        """查询单个任务的 history 记录，任务未结束时返回 None"""
+        resp = self.session.get(f"{self.base_url}/history/{prompt_id}", timeout=10)
+        if resp.status_code != 200:
+            raise ComfyUIError(f"查询任务状态失败: {resp.status_code}")
+        return (resp.json() or {}).get(prompt_id)
+
+    # ---- 事件 ----
+
+    def connect_events(self):
+        """连接 /ws；应在提交工作流之前调用，避免错过事件。不可用时返回 None"""
+        if websocket is None:
+            return None
+        try:
+            # 与 HTTP 会话一致，不使用系统代理
+            ws = websocket.create_connection(self.ws_url(), timeout=5, http_no_proxy=['*'])
+            ws.settimeout(WS_RECV_TIMEOUT)
+            return ws
+        except Exception as e:
+            logger.warning(f"连接ComfyUI websocket失败，改为轮询任务状态: {self.base_url} - {e}")
+            return None
+
+    @staticmethod
+    def close_events(ws):
+        """关闭 websocket（只短暂等待服务器的关闭帧）"""
+        if ws is None:
+            return
+        try:
+            ws.close(timeout=0.5)
+        except Exception:
+            pass
+
+    def wait_for_completion(self, prompt_id: str, ws=None, workflow: Optional[dict] = None,
+                            progress: Optional[ProgressCallback] = None,
+                            cancelled: Optional[CancelCheck] = None,
+                            timeout: float = PROMPT_TIMEOUT) -> dict:
+        """
+        等待任务执行结束，返回 history 记录（含 outputs 与 status）
+
+        Args:
+            ws: connect_events() 返回的连接，为 None 时轮询 /history/{prompt_id}
+            workflow: 提交的工作流，用于显示节点名称与整体进度
+
+        Raises:
+            ComfyUIError: 执行失败、被中断或超时
+        """
+        tracker = _ProgressTracker(prompt_id, workflow or {}, progress)
+        # 任务开始执行后才开始计时；websocket 断开后轮询沿用已开始的计时
+        deadline = _Deadline(timeout)
+        try:
+            if ws is not None:
+                entry = self._wait_ws(prompt_id, ws, tracker, cancelled, deadline)
+                if entry is not None:
+                    return entry
+            return self._wait_poll(prompt_id, tracker, cancelled, deadline)
+        finally:
+            self.close_events(ws)
+
+    def _finish(self, prompt_id: str, tracker: '_ProgressTracker', entry: Optional[dict] = None) -> dict:
+        """执行结束后读取 history；读取失败时使用 executed 事件中收集的输出"""
+        if entry is None:
+            try:
+                entry = self.get_history(prompt_id)
+            except Exception as e:
+                logger.warning(f"读取任务结果失败，使用事件中的输出: {prompt_id} - {e}")
+        if entry is None:
+            entry = {"outputs": tracker.outputs, "status": {}}
+        error = _history_error(entry)
+        if error:
+            raise ComfyUIError(error, server_fault=False)
+        return entry
+
+    def _check_prompt(self, prompt_id: str, liveness: '_Liveness', check_queue: bool,
+                      deadline: Optional['_Deadline'] = None) -> Optional[dict]:
+        """
+        查询任务状态：已结束时返回 history 记录，仍在执行/排队时返回 None
+
+        check_queue 时同时查询 /queue：任务开始执行时启动 deadline 的计时。
+
+        Raises:
+            ComfyUIError: 任务已从服务器消失（服务器重启），或服务器持续无法访问
+        """
+        try:
+            entry = self.get_history(prompt_id)
+            if entry is None and check_queue:
+                running, pending = self._queue_ids()
+                if prompt_id in running:
+                    if deadline is not None and not deadline.started:
+                        deadline.start()
+                elif prompt_id not in pending:
+                    # 任务可能在两次查询之间刚刚完成
+                    entry = self.get_history(prompt_id)
+                    if entry is None:
+                        raise ComfyUIError("任务已不在服务器队列中（服务器可能已重启）")
+            liveness.ok()
+            return entry
+        except ComfyUIError:
+            raise
+        except Exception as e:
+            liveness.failed(e)
+            return None
+
+    def _wait_ws(self, prompt_id: str, ws, tracker: '_ProgressTracker',
+                 cancelled: Optional[CancelCheck], deadline: '_Deadline') -> Optional[dict]:
+        """通过 websocket 等待；连接断开时返回 None，由调用方改为轮询"""
+        # 收到 execution_start 之前按开始等待的时间计算超时，防止错过该事件时无限等待
+        wait_deadline = time.monotonic() + deadline.timeout
+        last_seen = time.monotonic()
+        liveness = _Liveness()
+        while True:
+            if cancelled and cancelled():
+                raise ComfyUIError("已取消")
+            now = time.monotonic()
+            if deadline.expired() if deadline.started else now > wait_deadline:
+                raise ComfyUIError("处理超时")
+            if now - last_seen > WS_IDLE_CHECK:
+                # 较长时间没有本任务的事件：可能错过了完成消息，或任务已随服务器重启丢失
+                last_seen = now
+                entry = self._check_prompt(prompt_id, liveness, check_queue=True, deadline=deadline)
+                if entry is not None:
+                    return self._finish(prompt_id, tracker, entry)
+
+            try:
+                raw = ws.recv()
+            except websocket.WebSocketTimeoutException:
+                continue
+            except Exception as e:
+                logger.warning(f"ComfyUI websocket 连接断开，改为轮询任务状态: {e}")
+                return None
+            if not isinstance(raw, str):
+                continue  # 二进制消息是预览图，忽略
+            try:
+                message = json.loads(raw)
+            except ValueError:
+                continue
+
+            data = message.get("data") or {}
+            if data.get("prompt_id") not in (None, prompt_id):
+                continue
+            msg_type = message.get("type")
+            if msg_type == "execution_start" and data.get("prompt_id") == prompt_id:
+                # 排队时间不计入超时
+                deadline.start()
+            if data.get("prompt_id") == prompt_id:
+                last_seen = time.monotonic()
+
+            done = tracker.handle(msg_type, data)
+            if done:
+                return self._finish(prompt_id, tracker)
+
+    def _wait_poll(self, prompt_id: str, tracker: '_ProgressTracker',
+                   cancelled: Optional[CancelCheck], deadline: '_Deadline') -> dict:
+        """轮询 /history；开始执行前每次同时查询 /queue，任务开始执行后才计算超时"""
+        started = time.monotonic()
+        last_queue_check = started
+        liveness = _Liveness()
+        while True:
+            if cancelled and cancelled():
+                raise ComfyUIError("已取消")
+            check_queue = not deadline.started or time.monotonic() - last_queue_check > WS_IDLE_CHECK
+            if check_queue:
+                last_queue_check = time.monotonic()
+            # 超时前至少查询一次结果，websocket 断开时任务可能已经完成
+            entry = self._check_prompt(prompt_id, liveness, check_queue, deadline)
+            if entry is not None:
+                return self._finish(prompt_id, tracker, entry)
+            if deadline.expired():
+                raise ComfyUIError("处理超时")
+            if deadline.started:
+                tracker.report(f"处理中... ({int(time.monotonic() - started)}秒)")
+            else:
+                tracker.report(f"排队中... ({int(time.monotonic() - started)}秒)")
+            _sleep(HISTORY_POLL_INTERVAL, cancelled)
+
+
+def _sleep(seconds: float, cancelled: Optional[CancelCheck]):
+    """可被取消打断的等待：取消令牌直接等待其事件，普通回调每 0.2 秒检查一次"""
+    wait = getattr(cancelled, 'wait', None)
+    if wait is not None:
+        wait(seconds)
+        return
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if cancelled and cancelled():
+            return
+        time.sleep(min(0.2, max(0.0, deadline - time.monotonic())))
+
+
+class _Deadline:
+    """执行超时：start() 后开始计时，重复调用重新计时"""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at: Optional[float] = None
+
+    @property
+    def started(self) -> bool:
+        return self.expires_at is not None
+
+    def start(self):
+        self.expires_at = time.monotonic() + self.timeout
+
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() > self.expires_at
+
+
+class _Liveness:
+    """记录服务器从何时开始持续无法访问"""
+
+    def __init__(self):
+        self.failing_since = None
+
+    def ok(self):
+        self.failing_since = None
+
+    def failed(self, error: Exception):
+        now = time.monotonic()
+        if self.failing_since is None:
+            self.failing_since = now
+        logger.debug(f"查询任务状态失败: {error}")
+        if now - self.failing_since > SERVER_LOST_AFTER:
+            raise ComfyUIError(f"服务器无响应超过{SERVER_LOST_AFTER}秒: {error}")
+
+
+class _ProgressTracker:
+    """把 websocket 事件整理为进度文字：当前节点、节点内进度与整体完成的节点数"""
+
+    def __init__(self, prompt_id: str, workflow: dict, progress: Optional[ProgressCallback]):
+        self.prompt_id = prompt_id
+        self.workflow = workflow
+        self.progress = progress
+        self.done_nodes = set()
+        self.current = None
+        self.outputs: Dict[str, dict] = {}
+        self._last_text = None
+
+    def report(self, text: str):
+        if self.progress and text != self._last_text:
+            self._last_text = text
+            self.progress(text)
+
+    def _label(self, node_id) -> str:
+        node = self.workflow.get(str(node_id)) or {}
+        title = (node.get("_meta") or {}).get("title") or node.get("class_type")
+        return f"{title}({node_id})" if title else str(node_id)
+
+    def _prefix(self) -> str:
+        total = len(self.workflow)
+        return f"[{min(len(self.done_nodes), total)}/{total}] " if total else ""
+
+    def handle(self, msg_type: str, data: dict) -> bool:
+        """处理一条事件，任务结束时返回 True"""
+        if msg_type == "status":
+            remaining = ((data.get("status") or {}).get("exec_info") or {}).get("queue_remaining")
+            if self.current is None and not self.done_nodes and remaining:
+                self.report(f"排队中，服务器队列剩余 {remaining} 个任务")
+        elif msg_type == "execution_start":
+            self.report("开始执行工作流")
+        elif msg_type == "execution_cached":
+            self.done_nodes.update(str(n) for n in data.get("nodes") or [])
+        elif msg_type == "executing":
+            node = data.get("node")
+            if self.current is not None:
+                self.done_nodes.add(self.current)
+            if node is None:
+                # node 为空表示整个工作流执行结束
+                return data.get("prompt_id") == self.prompt_id
+            self.current = str(node)
+            self.report(f"{self._prefix()}正在执行节点 {self._label(node)}")
+        elif msg_type == "progress":
+            maximum = data.get("max") or 0
+            if maximum:
+                percent = int(data.get("value", 0) * 100 / maximum)
+                node = data.get("node") or self.current
+                self.report(f"{self._prefix()}节点 {self._label(node)} 进度 {percent}%")
+        elif msg_type == "executed":
+            node = str(data.get("node"))
+            self.done_nodes.add(node)
+            if data.get("output"):
+                self.outputs[node] = data["output"]
+        elif msg_type == "execution_success":
+            return True
+        elif msg_type == "execution_error":
+            raise ComfyUIError(
+                f"节点 {data.get('node_type') or data.get('node_id')} 执行失败: "
+                f"{(data.get('exception_message') or '').strip()}",
+                server_fault=False
+            )
+        elif msg_type == "execution_interrupted":
+            raise ComfyUIError("任务在服务器上被中断")
+        return False
@@ -0,0 +1,92 @@
+"""
+流式 CSV 读取工具
+
+- 只读取文件开头一段字节判断编码，不再按候选编码反复整文件重读
+- 按块迭代数据行，任意时刻内存中只保留一块，适合几万行的大表格
+"""
+
+import codecs
+import csv
+import os
+from typing import Iterator, List, Optional, Sequence
+
+# 候选编码（按优先级）；latin-1 可解码任意字节，作为兜底
+CSV_ENCODINGS = ('utf-8-sig', 'utf-8', 'gbk', 'gb2312', 'big5', 'latin-1')
+
+# 编码嗅探读取的前缀长度
+SNIFF_BYTES = 64 * 1024
+
+
+def sniff_encoding(file_path: str, sample_size: int = SNIFF_BYTES,
+                   encodings: Sequence[str] = CSV_ENCODINGS) -> str:
+    """读取文件前缀判断编码，返回第一个能无错解码前缀的候选编码"""
+    with open(file_path, 'rb') as f:
+        sample = f.read(sample_size)
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    # 前缀可能在多字节字符中间截断：未读完整个文件时不做最终校验
+    final = len(sample) < sample_size
+    for enc in encodings:
+        try:
+            codecs.getincrementaldecoder(enc)().decode(sample, final=final)
+            return enc
+        except (UnicodeDecodeError, LookupError):
+            continue
+    return encodings[-1]
+
+
+class CsvChunkReader:
+    """按块读取 CSV 数据行
+
+    用法：
+        reader = CsvChunkReader(path)
+        header = reader.header
+        for rows in reader.chunks(500):
+            ...
+        reader.close()
+    """
+
+    def __init__(self, file_path: str, encoding: Optional[str] = None):
+        self.file_path = file_path
+        self.encoding = encoding or sniff_encoding(file_path)
+        self.total_bytes = os.path.getsize(file_path)
+        self._file = open(file_path, 'r', newline='', encoding=self.encoding, errors='replace')
+        self._reader = csv.reader(self._file)
+        self.header: List[str] = [h.strip() for h in next(self._reader, [])]
+        # 表头行号为 1，数据行从 2 开始
+        self.line_num = 1
+
+    @property
+    def bytes_read(self) -> int:
+        """已读取的字节数（含读缓冲，近似值，用于进度显示）"""
+        try:
+            return min(self._file.buffer.tell(), self.total_bytes)
+        except (OSError, ValueError):
+            return self.total_bytes
+
+    def chunks(self, chunk_size: int = 500) -> Iterator[List[List[str]]]:
+        """逐块产出数据行（跳过空行）"""
+        chunk_size = max(1, int(chunk_size))
+        chunk: List[List[str]] = []
+        for row in self._reader:
+            self.line_num = self._reader.line_num
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def close(self):
+        try:
+            self._file.close()
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
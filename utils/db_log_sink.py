@@ -0,0 +1,128 @@
+"""
+logs 表的缓冲写入器
+
+日志先进入内存缓冲区，由后台线程每 flush_interval 秒或攒够 batch_size 条时
+通过数据库写线程一次性写入（单事务 executemany），调用方从不等待数据库。
+- 缓冲区有上限：满了丢弃最旧的记录，并在下次落库时写入一条丢弃统计
+- 连续重复的日志合并为一条，附带重复次数
+- 每次落库后按 retention_rows 裁剪 logs 表，避免无限增长
+"""
+
+import threading
+from collections import deque
+from typing import Callable, Optional
+
+from loguru import logger
+
+
+class BufferedDbLogSink:
+    """批量写入 logs 表的日志缓冲区，可直接作为 loguru sink 使用"""
+
+    def __init__(self, submit: Callable, flush_interval: float = 0.5, batch_size: int = 200,
+                 max_buffer: int = 5000, retention_rows: int = 20000):
+        """
+        Args:
+            submit: 数据库写线程的提交函数，接收 op(conn) 并返回 Future
+            flush_interval: 定时落库间隔（秒）
+            batch_size: 缓冲达到该条数时立即落库
+            max_buffer: 缓冲区上限，超出后丢弃最旧记录
+            retention_rows: logs 表最多保留的行数（<=0 表示不裁剪）
+        """
+        self._submit = submit
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, int(batch_size))
+        self.retention_rows = retention_rows
+        # 元素: [level, message, repeat_count]
+        self._buffer = deque(maxlen=max(1, int(max_buffer)))
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="DbLogSink", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止后台线程并把剩余日志落库"""
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(5)
+        self.flush(wait=True)
+
+    def add(self, level: str, message: str):
+        """追加一条日志（不阻塞）"""
+        with self._lock:
+            last = self._buffer[-1] if self._buffer else None
+            if last is not None and last[0] == level and last[1] == message:
+                last[2] += 1
+                return
+            if len(self._buffer) == self._buffer.maxlen:
+                self._dropped += 1
+            self._buffer.append([level, message, 1])
+            should_flush = len(self._buffer) >= self.batch_size
+        if should_flush:
+            self._wakeup.set()
+
+    def write(self, message):
+        """loguru sink 入口"""
+        record = message.record
+        self.add(record["level"].name, record["message"])
+
+    def flush(self, wait: bool = False):
+        """把当前缓冲区写入数据库；wait=True 时等待事务提交"""
+        with self._lock:
+            if not self._buffer and not self._dropped:
+                return None
+            items = list(self._buffer)
+            self._buffer.clear()
+            dropped, self._dropped = self._dropped, 0
+
+        rows = []
+        if dropped:
+            rows.append(('WARNING', f"日志缓冲区已满，丢弃 {dropped} 条日志"))
+        for level, message, count in items:
+            if count > 1:
+                message = f"{message} (重复 {count} 次)"
+            rows.append((level, message))
+
+        retention = self.retention_rows
+
+        def op(conn):
+            conn.executemany('INSERT INTO logs (level, message) VALUES (?, ?)', rows)
+            if retention and retention > 0:
+                conn.execute('''
+                    DELETE FROM logs
+                    WHERE id <= (SELECT id FROM logs ORDER BY id DESC LIMIT 1 OFFSET ?)
+                ''', (retention,))
+            return len(rows)
+
+        future = self._submit(op)
+        future.add_done_callback(self._on_flushed)
+        if wait:
+            try:
+                return future.result()
+            except Exception:
+                return None
+        return future
+
+    @staticmethod
+    def _on_flushed(future):
+        error = future.exception()
+        if error is not None:
+            logger.error(f"写入日志表失败: {error}")
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # 不能再写回本 sink，避免递归
+                print(f"日志落库失败: {e}")
@@ -0,0 +1,160 @@
+"""
+数据库单写线程
+
+所有写操作通过队列交给唯一的写线程执行：
+- 写线程独占写连接，按批（一次最多 batch_size 个操作）在同一个事务中提交
+- 每个操作使用 SAVEPOINT 隔离，单个操作失败只回滚自身，不影响同批其他操作
+- 调用方拿到 concurrent.futures.Future，事务提交后才会得到结果
+- 读操作仍使用各自的连接，在 WAL 模式下与写线程互不阻塞
+- 停止时先执行完所有已入队的写操作；开始停止后提交的写操作直接以异常结束
+"""
+
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from loguru import logger
+
+
+# 写操作：接收写连接，返回结果
+WriteOp = Callable[[sqlite3.Connection], Any]
+
+_STOP = object()
+
+
+class DatabaseWriter:
+    """单写线程，独占写连接并批量提交写操作"""
+
+    def __init__(self, db_path: str, batch_size: int = 64, busy_timeout: float = 30.0):
+        self.db_path = db_path
+        self.batch_size = max(1, int(batch_size))
+        self.busy_timeout = busy_timeout
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        # submit 在持锁时可能启动写线程，需要可重入
+        self._lock = threading.RLock()
+        self._stopping = False
+
+    def start(self):
+        """启动写线程（重复调用无副作用）"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="DatabaseWriter", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0):
+        """停止写线程，已入队的写操作会先全部执行完；之后提交的写操作被拒绝"""
+        with self._lock:
+            self._stopping = True
+            thread = self._thread
+            if not thread or not thread.is_alive():
+                return
+            self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def in_writer_thread(self) -> bool:
+        return self._thread is not None and threading.current_thread() is self._thread
+
+    def submit(self, op: WriteOp) -> Future:
+        """提交写操作，返回在事务提交后完成的 Future"""
+        future: Future = Future()
+        if self.in_writer_thread():
+            # 写线程内的嵌套写入直接执行，避免自己等待自己
+            try:
+                future.set_result(op(self._conn))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        with self._lock:
+            if self._stopping:
+                future.set_exception(RuntimeError("数据库写线程已停止，写操作未执行"))
+                return future
+            if not self._thread or not self._thread.is_alive():
+                self.start()
+            self._queue.put((op, future))
+        return future
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None：由写线程自己控制 BEGIN/COMMIT
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _run(self):
+        self._conn = self._connect()
+        logger.info("数据库写线程已启动")
+        try:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                # 把已排队的写操作合并到同一事务
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._execute_batch(batch)
+        finally:
+            self._drain()
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            logger.info("数据库写线程已停止")
+
+    def _drain(self):
+        """执行停止标记之后仍留在队列中的写操作，保证每个 Future 都有结果"""
+        batch = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                batch.append(item)
+        for i in range(0, len(batch), self.batch_size):
+            self._execute_batch(batch[i:i + self.batch_size])
+
+    def _execute_batch(self, batch):
+        conn = self._conn
+        outcomes = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for op, future in batch:
+                conn.execute('SAVEPOINT write_op')
+                try:
+                    outcomes.append((future, True, op(conn)))
+                    conn.execute('RELEASE write_op')
+                except Exception as e:
+                    conn.execute('ROLLBACK TO write_op')
+                    conn.execute('RELEASE write_op')
+                    outcomes.append((future, False, e))
+            conn.execute('COMMIT')
+        except Exception as e:
+            logger.error(f"数据库批量写入失败: {e}")
+            try:
+                conn.execute('ROLLBACK')
+            except Exception:
+                pass
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, ok, value in outcomes:
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
@@ -0,0 +1,178 @@
+"""
+ffmpeg 子进程辅助
+
+- 使用随包提供的 imageio_ffmpeg 可执行文件
+- 通过 `-progress pipe:1` 读取结构化进度（out_time_us），换算为完成比例
+- 运行期间定期检查取消，取消时结束子进程并等待其退出，不留下孤儿进程
+- 按 CPU 核数与每个任务的编码线程数计算并行任务数
+"""
+
+import os
+import re
+import subprocess
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+import imageio_ffmpeg
+from loguru import logger
+
+from database_manager import db_manager
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_VIDEO_SIZE_RE = re.compile(r"Stream #0:\d+.*?: Video: .*?, (\d{2,5})x(\d{2,5})")
+_VIDEO_FPS_RE = re.compile(r"Stream #0:\d+.*?: Video: .*?, ([\d.]+)(k?) (?:fps|tbr)")
+
+# 进度回调：完成比例 0.0-1.0
+FractionCallback = Callable[[float], None]
+
+
+class FfmpegError(RuntimeError):
+    """ffmpeg 执行失败"""
+
+
+class FfmpegCancelled(FfmpegError):
+    """ffmpeg 任务被取消"""
+
+    def __init__(self):
+        super().__init__("已取消")
+
+
+def ffmpeg_exe() -> str:
+    return imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def probe_duration(file_path: str) -> Optional[float]:
+    """读取视频时长（秒），无法识别时返回 None"""
+    try:
+        proc = subprocess.run(
+            [ffmpeg_exe(), "-hide_banner", "-i", file_path],
+            capture_output=True, text=True, errors='replace', timeout=30
+        )
+        match = _DURATION_RE.search(proc.stderr or '')
+        if not match:
+            return None
+        hours, minutes, seconds = match.groups()
+        return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    except Exception as e:
+        logger.warning(f"读取视频时长失败: {file_path} - {e}")
+        return None
+
+
+@dataclass
+class VideoInfo:
+    width: int
+    height: int
+    fps: float
+    duration: float
+
+    @property
+    def frames(self) -> int:
+        return max(1, int(round(self.fps * self.duration)))
+
+
+def probe_video_info(file_path: str) -> Optional[VideoInfo]:
+    """读取首个视频流的分辨率、帧率与时长（只解析文件头），无法识别时返回 None"""
+    try:
+        proc = subprocess.run(
+            [ffmpeg_exe(), "-hide_banner", "-i", file_path],
+            capture_output=True, text=True, errors='replace', timeout=30
+        )
+        header = proc.stderr or ''
+        duration = _DURATION_RE.search(header)
+        size = _VIDEO_SIZE_RE.search(header)
+        fps = _VIDEO_FPS_RE.search(header)
+        if not (duration and size and fps):
+            return None
+        hours, minutes, seconds = duration.groups()
+        rate = float(fps.group(1)) * (1000 if fps.group(2) else 1)
+        return VideoInfo(int(size.group(1)), int(size.group(2)), rate,
+                         int(hours) * 3600 + int(minutes) * 60 + float(seconds))
+    except Exception as e:
+        logger.warning(f"读取视频信息失败: {file_path} - {e}")
+        return None
+
+
+def ffmpeg_parallelism(threads_per_job: int, jobs: Optional[int] = None) -> int:
+    """并行任务数：配置 ffmpeg_parallelism > 0 时使用配置值，否则按 CPU 核数 / 每任务线程数计算"""
+    try:
+        configured = int(db_manager.load_config('ffmpeg_parallelism', 0))
+    except (TypeError, ValueError):
+        configured = 0
+    if configured > 0:
+        workers = configured
+    else:
+        workers = (os.cpu_count() or 2) // max(1, threads_per_job)
+    if jobs is not None:
+        workers = min(workers, jobs)
+    return max(1, workers)
+
+
+def run_ffmpeg(args: List[str], duration: Optional[float] = None,
+               progress: Optional[FractionCallback] = None,
+               cancelled: Optional[Callable[[], bool]] = None) -> None:
+    """
+    运行 ffmpeg（args 不含可执行文件本身）
+
+    Args:
+        args: ffmpeg 参数
+        duration: 输入时长（秒），用于把 out_time 换算为完成比例
+        progress: 进度回调
+        cancelled: 取消检查，返回 True 时结束子进程
+
+    Raises:
+        FfmpegCancelled: 任务被取消
+        FfmpegError: ffmpeg 返回非零退出码
+    """
+    cmd = [ffmpeg_exe(), "-hide_banner", "-nostats", "-progress", "pipe:1"] + list(args)
+    logger.debug(f"执行ffmpeg命令: {' '.join(cmd)}")
+
+    proc = subprocess.Popen(
+        cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        text=True, errors='replace', bufsize=1
+    )
+    # stderr 在单独线程中读取，避免管道写满导致子进程阻塞
+    stderr_tail = deque(maxlen=20)
+    stderr_reader = threading.Thread(
+        target=lambda: stderr_tail.extend(line.rstrip() for line in proc.stderr), daemon=True
+    )
+    stderr_reader.start()
+
+    # 取消检查不依赖进度输出：卡住的输入也能被及时结束
+    done = threading.Event()
+    was_cancelled = threading.Event()
+
+    def _watch():
+        while not done.wait(0.2):
+            if cancelled and cancelled():
+                was_cancelled.set()
+                proc.kill()
+                return
+
+    watcher = threading.Thread(target=_watch, daemon=True)
+    watcher.start()
+
+    try:
+        for line in proc.stdout:
+            key, _, value = line.strip().partition('=')
+            if key == 'out_time_us' and progress and duration:
+                try:
+                    progress(min(1.0, max(0.0, int(value) / 1_000_000 / duration)))
+                except ValueError:
+                    pass
+            elif key == 'progress' and value == 'end' and progress:
+                progress(1.0)
+        proc.wait()
+    finally:
+        done.set()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        stderr_reader.join(timeout=1)
+
+    if was_cancelled.is_set():
+        raise FfmpegCancelled()
+    if proc.returncode != 0:
+        err = '\n'.join(stderr_tail).strip()
+        raise FfmpegError(err[-300:] or f"ffmpeg执行失败 code={proc.returncode}")
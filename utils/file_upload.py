@@ -0,0 +1,238 @@
+"""
+文件服务上传客户端
+
+上传到 {API_BASE_URL}/v1/files（multipart/form-data，字段 `file`）：
+- 请求体按固定大小的块流式读取文件，边读边发，并回调已发送字节数；每块之间检查取消
+- 多个文件可复用同一个会话（连接池），避免每个文件重新建立连接
+- 重试策略区分错误类型：网络异常、超时、429/5xx 视为临时错误，按指数退避重试；
+  其它 4xx（鉴权失败、文件过大等）重试也不会成功，直接失败
+"""
+
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from loguru import logger
+
+from constants import API_BASE_URL
+from database_manager import db_manager
+from utils.image_utils import prepare_upload_image, upload_image_settings, upload_settings_fingerprint
+from utils.upload_cache import lookup_upload, remember_upload
+
+# 每次读取/发送的块大小
+CHUNK_SIZE = 256 * 1024
+
+# 可重试的 HTTP 状态码
+TRANSIENT_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+# 进度回调：(已发送字节, 文件总字节)
+ProgressCallback = Callable[[int, int], None]
+# 取消检查：返回 True 表示应停止上传
+CancelCheck = Callable[[], bool]
+
+_CONTENT_TYPES = {
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.bmp': 'image/bmp',
+    '.tif': 'image/tiff',
+    '.tiff': 'image/tiff',
+    '.mp4': 'video/mp4',
+    '.m4v': 'video/mp4',
+    '.avi': 'video/x-msvideo',
+    '.mov': 'video/quicktime',
+    '.mkv': 'video/x-matroska',
+    '.wmv': 'video/x-ms-wmv',
+    '.flv': 'video/x-flv',
+    '.webm': 'video/webm',
+}
+
+
+class UploadError(RuntimeError):
+    """上传失败；transient=True 表示临时错误，可以重试"""
+
+    def __init__(self, message: str, transient: bool = False, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.transient = transient
+        self.status_code = status_code
+
+
+class UploadCancelled(UploadError):
+    """上传被调用方取消"""
+
+    def __init__(self):
+        super().__init__("上传已取消")
+
+
+def guess_content_type(file_path: str) -> str:
+    return _CONTENT_TYPES.get(Path(file_path).suffix.lower(), 'application/octet-stream')
+
+
+def create_session(pool_size: int = 8) -> requests.Session:
+    """创建上传会话：禁用系统代理（避免 127.0.0.1:7890 等代理导致连接失败），连接池按并发数设置"""
+    session = requests.Session()
+    session.trust_env = False
+    session.proxies = {}
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+class MultipartFileBody:
+    """流式 multipart/form-data 请求体
+
+    requests 遍历该对象发送请求体；每次遍历都会重新打开文件，
+    因此重试时总是从头读取，内存占用与文件大小无关。
+    """
+
+    def __init__(self, file_path: str, field: str = 'file', filename: Optional[str] = None,
+                 content_type: Optional[str] = None, progress: Optional[ProgressCallback] = None,
+                 cancelled: Optional[CancelCheck] = None, chunk_size: int = CHUNK_SIZE):
+        self.file_path = file_path
+        self.progress = progress
+        self.cancelled = cancelled
+        self.chunk_size = chunk_size
+        self.file_size = os.path.getsize(file_path)
+
+        boundary = uuid.uuid4().hex
+        filename = (filename or Path(file_path).name).replace('"', '%22')
+        self._head = (
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type or guess_content_type(file_path)}\r\n\r\n'
+        ).encode('utf-8')
+        self._tail = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        self.content_type = f'multipart/form-data; boundary={boundary}'
+
+    def __len__(self) -> int:
+        return len(self._head) + self.file_size + len(self._tail)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._head
+        sent = 0
+        with open(self.file_path, 'rb') as f:
+            while True:
+                if self.cancelled and self.cancelled():
+                    raise UploadCancelled()
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+                sent += len(chunk)
+                if self.progress:
+                    self.progress(sent, self.file_size)
+        yield self._tail
+
+
+def _parse_upload_response(resp: requests.Response, base_url: str) -> str:
+    """从文件服务响应中取可访问URL"""
+    try:
+        data = resp.json()
+    except Exception:
+        raise UploadError(f"解析响应失败（非JSON）: {resp.text[:200]}")
+
+    url = data.get('url') or ''
+    # 兼容某些服务不返回 url，仅返回 id
+    if not url:
+        file_id = data.get('id')
+        url = f"{base_url.rstrip('/')}/v1/files/{file_id}/content" if file_id else ''
+    if not url:
+        raise UploadError("上传成功但响应未提供可访问URL")
+    return url
+
+
+def _sleep(seconds: float, cancelled: Optional[CancelCheck]):
+    """可被取消打断的等待"""
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        if cancelled and cancelled():
+            raise UploadCancelled()
+        time.sleep(min(0.2, max(0.0, deadline - time.monotonic())))
+
+
+def upload_file(file_path: str, session: Optional[requests.Session] = None,
+                progress: Optional[ProgressCallback] = None, filename: Optional[str] = None,
+                cancelled: Optional[CancelCheck] = None, timeout: float = 180,
+                max_retries: int = 2, backoff: float = 1.0) -> str:
+    """
+    上传文件并返回可访问URL
+
+    Args:
+        file_path: 本地文件路径
+        session: 复用的会话；为空时临时创建
+        progress: 字节进度回调
+        filename: 上传时使用的文件名（默认取文件名）
+        cancelled: 取消检查，发送每个块前调用
+        timeout: 单次请求超时（秒）
+        max_retries: 临时错误的最大重试次数
+        backoff: 首次重试等待秒数，之后每次翻倍
+
+    Raises:
+        UploadCancelled: 上传被取消
+        UploadError: 上传失败
+    """
+    base_url = API_BASE_URL
+    endpoint = f"{base_url.rstrip('/')}/v1/files"
+    api_key = db_manager.load_config('api_key', '') or ''
+    headers = {'Accept': 'application/json'}
+    if api_key:
+        headers['Authorization'] = f"Bearer {api_key}"
+
+    own_session = session is None
+    if own_session:
+        session = create_session(1)
+    try:
+        attempt = 0
+        while True:
+            # 每次尝试都新建请求体，从头重新打开文件
+            body = MultipartFileBody(file_path, filename=filename, progress=progress, cancelled=cancelled)
+            try:
+                resp = session.post(
+                    endpoint,
+                    data=body,
+                    headers={**headers, 'Content-Type': body.content_type},
+                    timeout=timeout
+                )
+                if resp.status_code == 200:
+                    return _parse_upload_response(resp, base_url)
+                message = f"上传失败: {resp.status_code} - {resp.text[:200]}"
+                error = UploadError(message, resp.status_code in TRANSIENT_STATUS, resp.status_code)
+            except UploadError:
+                raise
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = UploadError(f"网络异常: {e}", transient=True)
+
+            if not error.transient or attempt >= max_retries:
+                raise error
+            delay = backoff * (2 ** attempt)
+            attempt += 1
+            logger.warning(f"{error}，{delay:.0f} 秒后第 {attempt} 次重试: {file_path}")
+            _sleep(delay, cancelled)
+    finally:
+        if own_session:
+            session.close()
+
+
+def upload_image(file_path: str, session: Optional[requests.Session] = None,
+                 progress: Optional[ProgressCallback] = None, **kwargs) -> str:
+    """上传图片：先查上传缓存（区分压缩设置），未命中时按配置压缩后上传并记录缓存"""
+    settings = upload_image_settings()
+    cache_key, cached_url = lookup_upload(file_path, upload_settings_fingerprint(settings))
+    if cached_url:
+        if progress:
+            size = os.path.getsize(file_path)
+            progress(size, size)
+        return cached_url
+
+    p = Path(file_path)
+    upload_path = prepare_upload_image(file_path, settings) if settings else file_path
+    url = upload_file(upload_path, session, progress, filename=p.stem + Path(upload_path).suffix, **kwargs)
+    remember_upload(cache_key, file_path, url)
+    return url
@@ -2,9 +2,11 @@
 文件工具类
 """
 
+import hashlib
 import os
 import platform
 import subprocess
+import time
 from pathlib import Path
 from typing import Optional
 
@@ -71,4 +73,67 @@ def format_file_size(size_bytes: int) -> str:
     i = int(math.floor(math.log(size_bytes, 1024)))
     p = math.pow(1024, i)
     s = round(size_bytes / p, 2)
-    return f"{s} {size_names[i]}"
\ No newline at end of file
+    return f"{s} {size_names[i]}"
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    流式计算文件内容的 SHA-256（按块读取，不把整个文件载入内存）
+    
+    Args:
+        file_path: 文件路径
+        chunk_size: 每次读取的字节数
+        
+    Returns:
+        str: 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    with open(file_path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buffer)
+            if not n:
+                break
+            digest.update(view[:n])
+    return digest.hexdigest()
+
+def prune_directory(dir_path, max_age_seconds: float, max_total_bytes: int) -> int:
+    """
+    清理缓存目录：删除超过 max_age_seconds 未使用的文件；
+    剩余文件总大小仍超过 max_total_bytes 时，从最久未使用的文件开始删除
+    
+    Args:
+        dir_path: 目录路径（只处理其中的文件，不递归）
+        max_age_seconds: 文件最长保留时间（按修改时间）
+        max_total_bytes: 目录总大小上限
+        
+    Returns:
+        int: 删除的文件数
+    """
+    files = []
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        files.append((stat.st_mtime, stat.st_size, entry.path))
+                except OSError:
+                    continue
+    except OSError:
+        return 0
+
+    now = time.time()
+    files.sort()
+    total = sum(size for _, size, _ in files)
+    removed = 0
+    for mtime, size, path in files:
+        if now - mtime <= max_age_seconds and total <= max_total_bytes:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+            total -= size
+        except OSError:
+            pass
+    return removed
@@ -0,0 +1,171 @@
+"""
+上传前的图片预处理
+
+相机拍摄的原图常有 5–20 MB，而生成视频只需要参考分辨率的图片。
+上传前把图片按最长边缩放并重新压缩到临时目录，原文件保持不变。
+使用 Qt 的 QImageReader/QImageWriter（可在工作线程中使用），不引入额外依赖；
+JPEG 在解码阶段即按目标尺寸缩放，避免先解码整张大图。
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
+
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QImageReader, QImageWriter
+from loguru import logger
+
+from database_manager import db_manager
+from utils.file_utils import prune_directory
+
+DEFAULT_MAX_DIMENSION = 2048
+DEFAULT_QUALITY = 85
+
+# 尺寸未超限且小于该大小的图片直接上传原图
+SKIP_BELOW_BYTES = 512 * 1024
+
+# 动图等不做处理的格式
+_SKIP_SUFFIXES = {'.gif'}
+
+_EXTENSIONS = {'jpeg': '.jpg', 'webp': '.webp', 'png': '.png'}
+
+# 压缩结果目录的清理策略：超过保留天数或总大小超限时删除最久未使用的文件
+CACHE_MAX_AGE_SECONDS = 7 * 24 * 3600
+CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+_prune_lock = threading.Lock()
+_pruned = False
+
+
+def _output_dir() -> Path:
+    global _pruned
+    path = Path(tempfile.gettempdir()) / 'sora2_upload_images'
+    path.mkdir(parents=True, exist_ok=True)
+    # 每次运行第一次使用时清理一次（在上传线程中执行）
+    with _prune_lock:
+        if not _pruned:
+            _pruned = True
+            removed = prune_directory(path, CACHE_MAX_AGE_SECONDS, CACHE_MAX_BYTES)
+            if removed:
+                logger.info(f"已清理 {removed} 个过期的压缩图片")
+    return path
+
+
+def _writable(fmt: str) -> bool:
+    return fmt.encode() in [bytes(f) for f in QImageWriter.supportedImageFormats()]
+
+
+def compress_image(file_path: str, max_dimension: int = DEFAULT_MAX_DIMENSION,
+                   quality: int = DEFAULT_QUALITY, image_format: str = 'jpeg') -> str:
+    """
+    缩放并重新压缩图片
+
+    Args:
+        file_path: 原图路径（不会被修改）
+        max_dimension: 最长边上限（像素）
+        quality: 压缩质量 1-100
+        image_format: 输出格式 jpeg/webp；带透明通道的图片不会输出为 jpeg
+
+    Returns:
+        str: 压缩后的临时文件路径；无需压缩、压缩失败或压缩后更大时返回原路径
+    """
+    try:
+        src = Path(file_path)
+        if src.suffix.lower() in _SKIP_SUFFIXES:
+            return file_path
+        stat = src.stat()
+
+        reader = QImageReader(file_path)
+        reader.setAutoTransform(True)
+        size = reader.size()
+        if not size.isValid():
+            return file_path
+        longest = max(size.width(), size.height())
+        if longest <= max_dimension and stat.st_size < SKIP_BELOW_BYTES:
+            return file_path
+
+        fmt = (image_format or 'jpeg').lower()
+        if fmt == 'jpg':
+            fmt = 'jpeg'
+        if fmt not in _EXTENSIONS or not _writable(fmt):
+            fmt = 'jpeg'
+
+        # 同一原图、同一设置复用已有的压缩结果
+        key = hashlib.sha1(
+            f"{src.resolve()}|{stat.st_mtime_ns}|{stat.st_size}|{max_dimension}|{quality}|{fmt}".encode('utf-8')
+        ).hexdigest()
+        for ext in set(_EXTENSIONS.values()):
+            existing = _output_dir() / f"{key}{ext}"
+            if existing.exists():
+                # 更新修改时间，清理时按最近使用保留
+                os.utime(existing)
+                return str(existing)
+
+        if longest > max_dimension:
+            reader.setScaledSize(size.scaled(max_dimension, max_dimension, Qt.KeepAspectRatio))
+        image = reader.read()
+        if image.isNull():
+            logger.warning(f"读取图片失败，上传原图: {file_path} ({reader.errorString()})")
+            return file_path
+
+        # JPEG 不支持透明通道：透明图优先输出 webp，否则 png
+        if image.hasAlphaChannel() and fmt == 'jpeg':
+            fmt = 'webp' if _writable('webp') else 'png'
+
+        out_path = _output_dir() / f"{key}{_EXTENSIONS[fmt]}"
+        tmp_path = out_path.with_name(out_path.name + '.part')
+        writer = QImageWriter(str(tmp_path), fmt.encode())
+        writer.setQuality(max(1, min(100, int(quality))))
+        if not writer.write(image):
+            logger.warning(f"压缩图片失败，上传原图: {file_path} ({writer.errorString()})")
+            tmp_path.unlink(missing_ok=True)
+            return file_path
+
+        out_size = tmp_path.stat().st_size
+        if out_size >= stat.st_size:
+            tmp_path.unlink(missing_ok=True)
+            return file_path
+        os.replace(tmp_path, out_path)
+
+        logger.info(
+            f"图片已压缩: {src.name} {size.width()}x{size.height()} {stat.st_size // 1024}KB -> "
+            f"{image.width()}x{image.height()} {out_size // 1024}KB"
+        )
+        return str(out_path)
+    except Exception as e:
+        logger.warning(f"图片压缩出错，上传原图: {e}")
+        return file_path
+
+
+def upload_image_settings() -> Optional[Tuple[int, int, str]]:
+    """读取上传压缩配置，返回 (最长边, 质量, 格式)；未启用压缩时返回 None"""
+    if not db_manager.load_config('upload_compress_enabled', True):
+        return None
+    max_dimension = db_manager.load_config('upload_max_dimension', DEFAULT_MAX_DIMENSION)
+    quality = db_manager.load_config('upload_image_quality', DEFAULT_QUALITY)
+    image_format = db_manager.load_config('upload_image_format', 'jpeg')
+    try:
+        max_dimension = int(max_dimension)
+        quality = int(quality)
+    except (TypeError, ValueError):
+        max_dimension, quality = DEFAULT_MAX_DIMENSION, DEFAULT_QUALITY
+    return max_dimension, quality, image_format
+
+
+def upload_settings_fingerprint(settings: Optional[Tuple[int, int, str]]) -> str:
+    """压缩设置的标识，用于区分同一原图在不同设置下上传的结果"""
+    if settings is None:
+        return 'original'
+    return '{}|{}|{}'.format(*settings)
+
+
+def prepare_upload_image(file_path: str, settings: Optional[Tuple[int, int, str]] = None) -> str:
+    """按配置（或传入的 upload_image_settings() 结果）决定是否压缩，返回实际要上传的文件路径"""
+    if settings is None:
+        settings = upload_image_settings()
+        if settings is None:
+            return file_path
+    return compress_image(file_path, *settings)
@@ -22,6 +22,7 @@ from typing import Optional, Dict, Any
 
 from database_manager import db_manager
 from constants import API_BASE_URL, API_HOST, API_CHAT_COMPLETIONS_URL
+from utils.file_upload import upload_image
 
 
 def upload_image_to_bed(file_path: str, token: Optional[str] = None, timeout: int = 180) -> str:
@@ -31,78 +32,8 @@ def upload_image_to_bed(file_path: str, token: Optional[str] = None, timeout: in
     if not p.exists() or not p.is_file():
         raise FileNotFoundError(f"图片文件不存在: {file_path}")
 
-    base_url = API_BASE_URL
-    api_key = db_manager.load_config('api_key', '') or ''
-    endpoint = f"{base_url.rstrip('/')}/v1/files"
-
-    def _ct(suf: str) -> str:
-        s = suf.lower()
-        if s in ['.jpg', '.jpeg']:
-            return 'image/jpeg'
-        if s == '.png':
-            return 'image/png'
-        if s == '.gif':
-            return 'image/gif'
-        if s == '.webp':
-            return 'image/webp'
-        if s in ['.bmp']:
-            return 'image/bmp'
-        if s in ['.tif', '.tiff']:
-            return 'image/tiff'
-        return 'application/octet-stream'
-
-    suffix = p.suffix or '.jpg'
-    content_type = _ct(suffix)
-
-    headers = {
-        'Accept': 'application/json',
-    }
-    if api_key:
-        headers['Authorization'] = f"Bearer {api_key}"
-
-    f = open(file_path, 'rb')
-    files = {
-        'file': (p.name, f, content_type)
-    }
-
-    session = requests.Session()
-    session.trust_env = False
-    try:
-        resp = session.post(
-            endpoint,
-            files=files,
-            headers=headers,
-            timeout=timeout,
-            proxies={"http": None, "https": None}
-        )
-    finally:
-        try:
-            session.close()
-        except Exception:
-            pass
-        try:
-            f.close()
-        except Exception:
-            pass
-
-    if resp.status_code == 200:
-        try:
-            data = resp.json()
-        except Exception:
-            raise RuntimeError(f"解析响应失败（非JSON）: {resp.text[:200]}")
-
-        image_url = data.get('url') or ''
-        if not image_url:
-            file_id = data.get('id')
-            filename = data.get('filename') or p.name
-            possible = f"{base_url.rstrip('/')}/v1/files/{file_id}/content" if file_id else ''
-            image_url = possible
-
-        if image_url:
-            return image_url
-        raise RuntimeError("上传成功但响应未提供可访问URL")
-
-    raise RuntimeError(f"上传失败: {resp.status_code} - {resp.text[:200]}")
+    # 命中上传缓存时直接返回；否则按配置压缩后流式上传
+    return upload_image(file_path, timeout=timeout)
 
 
 def call_image_chat_completion(
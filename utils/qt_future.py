@@ -0,0 +1,49 @@
+"""
+把 concurrent.futures.Future 的结果投递回 GUI 线程
+
+数据库写操作在写线程中完成，GUI 线程用 watch_future 注册回调，
+回调总是在创建 watcher 的线程（GUI 线程）中执行，不会阻塞界面。
+"""
+
+from concurrent.futures import Future
+from typing import Any, Callable, Optional
+
+from PyQt5.QtCore import QObject, pyqtSignal
+from loguru import logger
+
+
+class FutureWatcher(QObject):
+    """Future 完成后通过信号在所属线程中调用回调"""
+    done = pyqtSignal(object)
+
+    # 无父对象的 watcher 在回调前需要保持引用
+    _pending = set()
+
+    def __init__(self, future: Future, callback: Callable[[Any], None], parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._callback = callback
+        if parent is None:
+            FutureWatcher._pending.add(self)
+        self.done.connect(self._deliver)
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future: Future):
+        # 可能在写线程中调用：只发信号，由 Qt 排队到 watcher 所在线程
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"后台操作失败: {e}")
+            result = None
+        self.done.emit(result)
+
+    def _deliver(self, result: Any):
+        try:
+            self._callback(result)
+        finally:
+            FutureWatcher._pending.discard(self)
+            self.deleteLater()
+
+
+def watch_future(future: Future, callback: Callable[[Any], None], parent: Optional[QObject] = None) -> FutureWatcher:
+    """在 GUI 线程中等待 future 完成后调用 callback(result)"""
+    return FutureWatcher(future, callback, parent)
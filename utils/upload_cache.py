@@ -0,0 +1,53 @@
+"""
+图片上传缓存
+
+按文件内容的 SHA-256（及上传前的处理设置，如图片压缩参数）缓存上传得到的远程URL：同一张商品图被多行批量任务或
+多个带货流程复用时，只有第一次真正上传，之后直接返回缓存的URL，不访问网络。
+缓存保存在数据库 upload_cache 表中，超过有效期（配置 upload_cache_ttl_hours）后失效。
+"""
+
+import os
+from typing import Optional, Tuple
+
+from loguru import logger
+
+from database_manager import db_manager
+from utils.file_utils import file_sha256
+
+DEFAULT_TTL_HOURS = 24
+
+
+def lookup_upload(file_path: str, variant: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """计算文件哈希并查询缓存，返回 (缓存键, 缓存URL或None)
+
+    variant 标识上传前对文件做的处理（如压缩设置），设置不同时不会命中其他设置下的上传结果。
+    哈希失败时返回 (None, None)，调用方照常上传即可。
+    """
+    try:
+        file_hash = file_sha256(file_path)
+    except Exception as e:
+        logger.warning(f"计算文件哈希失败，跳过上传缓存: {e}")
+        return None, None
+    key = f"{file_hash}:{variant}" if variant else file_hash
+    url = db_manager.get_upload_cache(key)
+    if url:
+        logger.info(f"上传缓存命中: {os.path.basename(file_path)} -> {url}")
+    return key, url
+
+
+def remember_upload(key: Optional[str], file_path: str, url: str):
+    """按 lookup_upload 返回的缓存键记录上传结果（异步写入，不阻塞上传线程）"""
+    if not key or not url:
+        return
+    ttl_hours = db_manager.load_config('upload_cache_ttl_hours', DEFAULT_TTL_HOURS)
+    try:
+        ttl_hours = float(ttl_hours)
+    except (TypeError, ValueError):
+        ttl_hours = DEFAULT_TTL_HOURS
+    if ttl_hours <= 0:
+        return
+    try:
+        size = os.path.getsize(file_path)
+    except OSError:
+        size = None
+    db_manager.save_upload_cache(key, url, size, ttl_hours * 3600, wait=False)
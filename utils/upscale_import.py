@@ -0,0 +1,142 @@
+"""
+高清放大导入：跳过已完成的输出、合并相同的输入
+
+- 排除文件夹中之前生成的 -hd 输出文件（同名原视频存在，或是已完成任务记录的输出）
+- 计算输入文件内容的 SHA-256；路径、大小与修改时间都与已记录的相同时直接复用，不重新读取文件
+- 内容相同的输入只处理一次
+- 同名 -hd 输出已存在，且有相同输入内容、相同设置（工作流、模式、放大系数）的完成记录时直接跳过；
+  输出已存在但没有匹配的记录时（例如手动放入或设置已改变），由界面询问是否跳过
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+from loguru import logger
+
+from database_manager import db_manager
+from utils.file_utils import file_sha256
+from utils.workflow_templates import WorkflowTemplate
+
+VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv', '.wmv', '.flv'}
+OUTPUT_SUFFIX = '-hd'
+
+# 跳过原因
+SKIP_DONE = 'done'  # 相同输入与设置的输出已存在
+SKIP_DUPLICATE = 'duplicate'  # 与前面的某个输入内容相同
+SKIP_EXISTING = 'existing'  # 同名输出已存在（用户选择跳过）
+
+
+@dataclass
+class ImportEntry:
+    path: str
+    input_hash: Optional[str] = None
+    size: Optional[int] = None
+    mtime: Optional[float] = None
+    skip: Optional[str] = None
+    duplicate_of: Optional[str] = None
+    output_exists: bool = False  # 同名输出已存在但没有匹配的完成记录
+
+
+@dataclass
+class ImportPlan:
+    entries: List[ImportEntry] = field(default_factory=list)
+    excluded_outputs: int = 0  # 排除的 -hd 输出文件数
+
+    def count(self, skip: Optional[str]) -> int:
+        return sum(1 for e in self.entries if e.skip == skip)
+
+
+def upscale_output_path(input_path: str) -> str:
+    """放大结果的保存路径（默认命名，高清放大不使用AI标题）"""
+    path = Path(input_path)
+    return str(path.parent / f"{path.stem}{OUTPUT_SUFFIX}{path.suffix}")
+
+
+def settings_fingerprint(template: WorkflowTemplate, mode: str, scale: int) -> str:
+    """工作流内容与模式、放大系数的指纹；模板未使用的设置不参与计算"""
+    payload = json.dumps({
+        'workflow': template.workflow,
+        'inputs': template.inputs,
+        'mode': mode if template.supports('mode') else None,
+        'scale': scale if template.supports('scale') else None,
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def list_videos(folder: str) -> Tuple[List[Path], int]:
+    """列出文件夹中的视频，排除之前生成的 -hd 输出；返回 (输入列表, 排除的输出数)"""
+    files = sorted(
+        p for p in Path(folder).iterdir()
+        if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS
+    )
+    stems = {p.stem for p in files}
+    inputs, excluded = [], 0
+    for path in files:
+        if path.stem.endswith(OUTPUT_SUFFIX) and (
+            path.stem[:-len(OUTPUT_SUFFIX)] in stems or db_manager.is_upscale_output(str(path))
+        ):
+            excluded += 1
+            continue
+        inputs.append(path)
+    return inputs, excluded
+
+
+def plan_import(folder: str, fingerprint: Optional[str],
+                progress: Optional[Callable[[int, int], None]] = None,
+                cancelled: Optional[Callable[[], bool]] = None) -> Optional[ImportPlan]:
+    """扫描文件夹并标记需要跳过的视频；被取消时返回 None"""
+    inputs, excluded = list_videos(folder)
+    known = db_manager.get_upscale_input_hashes([str(p) for p in inputs])
+
+    plan = ImportPlan(excluded_outputs=excluded)
+    for i, path in enumerate(inputs):
+        if cancelled and cancelled():
+            return None
+        entry = ImportEntry(str(path))
+        try:
+            stat = path.stat()
+            entry.size, entry.mtime = stat.st_size, stat.st_mtime
+            record = known.get(entry.path)
+            if record and record['size'] == entry.size and record['mtime'] == entry.mtime:
+                entry.input_hash = record['hash']
+            else:
+                entry.input_hash = file_sha256(entry.path)
+        except OSError as e:
+            logger.warning(f"计算视频哈希失败，不参与去重: {path} - {e}")
+        plan.entries.append(entry)
+        if progress:
+            progress(i + 1, len(inputs))
+
+    # 内容相同的输入只保留第一个
+    first = {}
+    for entry in plan.entries:
+        if not entry.input_hash:
+            continue
+        if entry.input_hash in first:
+            entry.skip = SKIP_DUPLICATE
+            entry.duplicate_of = first[entry.input_hash]
+        else:
+            first[entry.input_hash] = entry.path
+
+    done = db_manager.get_upscale_done_outputs(list(first), fingerprint) if fingerprint and first else {}
+    for entry in plan.entries:
+        if entry.skip:
+            continue
+        output_path = upscale_output_path(entry.path)
+        if not os.path.exists(output_path):
+            continue
+        recorded = {os.path.normcase(os.path.abspath(p)) for p in done.get(entry.input_hash, [])}
+        if os.path.normcase(os.path.abspath(output_path)) in recorded:
+            entry.skip = SKIP_DONE
+        else:
+            entry.output_exists = True
+
+    logger.info(
+        f"导入 {folder}: {len(plan.entries)} 个视频，已完成 {plan.count(SKIP_DONE)} 个，"
+        f"重复 {plan.count(SKIP_DUPLICATE)} 个，排除输出文件 {excluded} 个"
+    )
+    return plan
@@ -0,0 +1,398 @@
+"""
+高清放大任务调度
+
+按服务器负载与处理速度分配视频：
+- 任务工作量 = 输出分辨率的百万像素数 × 帧数（宽 × 高 × 放大系数² × 帧数 / 10⁶）
+- 每台服务器的处理速度（秒/百万像素帧）从已完成任务学习（指数滑动平均），持久化在 upscale_servers 表中
+- 服务器 `/queue` 中其他客户端的任务计入预计排队时间（无法访问的服务器不分配任务），
+  `/system_stats` 的显存信息显示在界面上
+- 最长任务优先：每次重新规划时把剩余任务按工作量从大到小依次分给“预计完成时间最早”的服务器，
+  只提交分给有空闲名额的服务器的任务，其余任务等待下一次规划
+- 每台服务器可同时提交多个任务（ComfyUI 按顺序执行，提前排队可省去上传与下载之间的空闲）；
+  服务器上有其他客户端的任务排队时只提交一个
+- 熔断：健康检查（/queue）失败，或连续 JOB_FAILURE_THRESHOLD 个任务因服务器原因失败时熔断（open），
+  不再分配任务；冷却时间过后健康检查成功则进入试探状态（half_open），只提交一个任务，
+  成功后恢复（closed），失败则再次熔断且冷却时间翻倍。状态与最近错误、延迟保存在 upscale_servers 表中
+- 失败的任务重新排队，优先分给其他服务器，最多尝试 MAX_JOB_ATTEMPTS 次
+- 分段模式：工作量超过“平均每台服务器工作量”的长视频按关键帧切成多段，分给不同服务器并行处理
+"""
+
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+import requests
+from loguru import logger
+
+from database_manager import db_manager
+from utils.ffmpeg_jobs import probe_video_info
+
+# 没有任何速度数据时假定的处理速度（秒/百万像素帧）
+DEFAULT_SECONDS_PER_MPF = 0.05
+# 新测得的速度在滑动平均中的权重
+SPEED_EMA_ALPHA = 0.3
+DEFAULT_JOBS_PER_SERVER = 2
+MAX_JOBS_PER_SERVER = 8
+# 无法读取视频信息时按文件大小估算工作量（百万像素帧 / MB）
+WORK_PER_MB_FALLBACK = 20.0
+
+# 熔断状态
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+# 连续多少个任务因服务器原因失败后熔断
+JOB_FAILURE_THRESHOLD = 2
+# 熔断后的冷却时间（秒），每次重新熔断翻倍
+BREAKER_COOLDOWN = 30
+BREAKER_MAX_COOLDOWN = 300
+# 每个任务最多尝试次数（含首次）
+MAX_JOB_ATTEMPTS = 3
+
+# 持久化任务状态（upscale_jobs 表）
+JOB_QUEUED = 'queued'
+JOB_UPLOADING = 'uploading'
+JOB_RUNNING = 'running'
+JOB_DOWNLOADING = 'downloading'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+@dataclass
+class UpscaleJob:
+    index: int  # 表格行
+    path: str
+    work: float  # 百万像素帧
+    segment: Optional[int] = None  # 分段序号，整段处理时为 None
+    attempts: int = 0
+    excluded: Set[str] = field(default_factory=set)  # 已失败过的服务器，重试时优先避开
+
+    @property
+    def key(self) -> Tuple[int, Optional[int]]:
+        return self.index, self.segment
+
+
+@dataclass
+class ServerLoad:
+    reachable: bool
+    queue_running: int = 0
+    queue_pending: int = 0
+    vram_free: Optional[int] = None
+    vram_total: Optional[int] = None
+    latency_ms: Optional[float] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class ServerState:
+    id: Optional[int]
+    name: str
+    url: str
+    seconds_per_mpf: Optional[float] = None
+    state: str = BREAKER_CLOSED
+    failures: int = 0  # 连续失败次数
+    latency_ms: Optional[float] = None
+    last_error: Optional[str] = None
+    opened_at: float = 0.0
+    open_count: int = 0  # 本次处理中熔断的次数，决定冷却时间
+    external_jobs: int = 0  # 其他客户端在该服务器上运行/排队的任务数
+    vram_free: Optional[int] = None
+    vram_total: Optional[int] = None
+    in_flight: Dict[Tuple, float] = field(default_factory=dict)  # 任务 key -> 预计处理秒数
+    busy_since: float = 0.0  # 当前正在执行的任务的（估计）开始时间
+    last_finished_at: float = 0.0
+
+    @property
+    def reachable(self) -> bool:
+        return self.state != BREAKER_OPEN
+
+
+def estimate_work(file_path: str, scale: int) -> Optional[float]:
+    """估算放大任务的工作量（输出百万像素帧），无法读取视频信息时按文件大小粗略估算"""
+    info = probe_video_info(file_path)
+    if not info:
+        try:
+            return os.path.getsize(file_path) / 1024 / 1024 * WORK_PER_MB_FALLBACK * scale * scale
+        except OSError:
+            return None
+    return info.width * info.height * scale * scale * info.frames / 1_000_000
+
+
+def query_server_load(session: requests.Session, url: str, timeout: float = 3) -> ServerLoad:
+    """查询 ComfyUI 服务器的队列与显存情况，连接失败时 reachable=False"""
+    base = url.rstrip('/')
+    started = time.monotonic()
+    try:
+        resp = session.get(f"{base}/queue", timeout=timeout)
+        resp.raise_for_status()
+        queue = resp.json()
+        load = ServerLoad(
+            reachable=True,
+            queue_running=len(queue.get('queue_running') or []),
+            queue_pending=len(queue.get('queue_pending') or []),
+            latency_ms=(time.monotonic() - started) * 1000,
+        )
+    except Exception as e:
+        logger.warning(f"查询服务器队列失败: {base} - {e}")
+        return ServerLoad(reachable=False, error=str(e)[:200])
+
+    try:
+        resp = session.get(f"{base}/system_stats", timeout=timeout)
+        if resp.status_code == 200:
+            devices = resp.json().get('devices') or []
+            if devices:
+                load.vram_free = sum(int(d.get('vram_free') or 0) for d in devices)
+                load.vram_total = sum(int(d.get('vram_total') or 0) for d in devices)
+    except Exception as e:
+        logger.debug(f"查询服务器状态失败: {base} - {e}")
+    return load
+
+
+def segment_counts(works: Dict[int, Optional[float]], servers: int) -> Dict[int, int]:
+    """
+    分段模式下每个视频应切分的段数
+
+    工作量超过平均每台服务器工作量的视频会拖长整批处理时间，
+    按 ceil(工作量 / 平均量) 切分（不超过服务器数），其余视频不切分。
+    """
+    known = {i: w for i, w in works.items() if w}
+    if servers < 2 or not known:
+        return {}
+    share = sum(known.values()) / servers
+    counts = {}
+    for index, work in known.items():
+        count = min(servers, math.ceil(work / share - 1e-9))
+        if count >= 2:
+            counts[index] = count
+    return counts
+
+
+def jobs_per_server() -> int:
+    try:
+        value = int(db_manager.load_config('upscale_jobs_per_server', DEFAULT_JOBS_PER_SERVER))
+    except (TypeError, ValueError):
+        value = DEFAULT_JOBS_PER_SERVER
+    return max(1, min(MAX_JOBS_PER_SERVER, value))
+
+
+class UpscaleScheduler:
+    """高清放大任务调度器（只在 GUI 线程中使用，不做网络请求）"""
+
+    def __init__(self, servers: List[Dict], jobs: List[UpscaleJob], max_in_flight: Optional[int] = None):
+        # 上次保存的熔断状态：熔断中的服务器在首次健康检查成功后直接进入试探状态
+        self.servers = [
+            ServerState(s.get('id'), s.get('name') or s['url'], s['url'], s.get('seconds_per_mpf'),
+                        state=s.get('health_state') or BREAKER_CLOSED,
+                        failures=s.get('consecutive_failures') or 0,
+                        latency_ms=s.get('latency_ms'), last_error=s.get('last_error'))
+            for s in servers
+        ]
+        self.max_in_flight = max_in_flight or jobs_per_server()
+        self.pending: List[UpscaleJob] = []
+        self.jobs: Dict[Tuple, UpscaleJob] = {}
+        self.add_jobs(jobs)
+
+    # ---- 任务 ----
+
+    def add_jobs(self, jobs: List[UpscaleJob]):
+        known = [j.work for j in jobs if j.work]
+        default_work = sum(known) / len(known) if known else 1.0
+        for job in jobs:
+            if not job.work:
+                job.work = default_work
+            self.jobs[job.key] = job
+            self.pending.append(job)
+
+    def has_work(self) -> bool:
+        return bool(self.pending) or any(s.in_flight for s in self.servers)
+
+    def in_flight_count(self) -> int:
+        return sum(len(s.in_flight) for s in self.servers)
+
+    def cancel_pending(self, index: Optional[int] = None) -> List[UpscaleJob]:
+        """取消排队中的任务（index 不为空时只取消该行的分段）"""
+        cancelled = [j for j in self.pending if index is None or j.index == index]
+        self.pending = [j for j in self.pending if j not in cancelled]
+        return cancelled
+
+    def in_flight_for(self, index: int) -> int:
+        return sum(1 for s in self.servers for key in s.in_flight if key[0] == index)
+
+    # ---- 预测 ----
+
+    def _fallback_speed(self) -> float:
+        known = [s.seconds_per_mpf for s in self.servers if s.seconds_per_mpf]
+        return sum(known) / len(known) if known else DEFAULT_SECONDS_PER_MPF
+
+    def predict_seconds(self, server: ServerState, job: UpscaleJob) -> float:
+        return job.work * (server.seconds_per_mpf or self._fallback_speed())
+
+    def _backlog(self, server: ServerState, now: float) -> float:
+        """服务器预计还需多少秒才能处理完已提交的任务（含其他客户端的任务）"""
+        ours = sum(server.in_flight.values())
+        if ours:
+            ours = max(0.0, ours - (now - server.busy_since))
+        if server.external_jobs:
+            typical = [self.predict_seconds(server, j) for j in self.jobs.values()]
+            ours += server.external_jobs * (sum(typical) / len(typical) if typical else 60.0)
+        return ours
+
+    def _slots(self, server: ServerState) -> int:
+        limit = 1 if server.external_jobs or server.state == BREAKER_HALF_OPEN else self.max_in_flight
+        return max(0, limit - len(server.in_flight))
+
+    # ---- 熔断 ----
+
+    def _persist(self, server: ServerState):
+        if server.id is not None:
+            db_manager.update_upscale_server_health(
+                server.id, server.state, server.failures, server.latency_ms, server.last_error, wait=False
+            )
+
+    def _trip(self, server: ServerState, error: Optional[str], now: float):
+        if server.state != BREAKER_OPEN:
+            server.open_count += 1
+            logger.warning(f"服务器 {server.name} 熔断，暂停分配任务: {error}")
+        server.state = BREAKER_OPEN
+        server.opened_at = now
+        server.last_error = error
+
+    def _cooldown(self, server: ServerState) -> float:
+        return min(BREAKER_MAX_COOLDOWN, BREAKER_COOLDOWN * 2 ** max(0, server.open_count - 1))
+
+    def all_servers_down(self) -> bool:
+        return not any(s.reachable for s in self.servers)
+
+    # ---- 调度 ----
+
+    def next_assignments(self, now: Optional[float] = None) -> List[Tuple[UpscaleJob, ServerState]]:
+        """
+        重新规划剩余任务，返回现在就应提交的 (任务, 服务器) 列表（已记为进行中）
+
+        规划按最长任务优先、分给预计完成时间最早的服务器；
+        分给已满服务器的任务留在队列中，等该服务器空出名额后再提交，
+        避免把大任务交给明显更慢的空闲服务器。
+        """
+        now = time.monotonic() if now is None else now
+        servers = [s for s in self.servers if s.reachable]
+        if not servers or not self.pending:
+            return []
+
+        finish_at = {s.url: self._backlog(s, now) for s in servers}
+        slots = {s.url: self._slots(s) for s in servers}
+        assignments = []
+        for job in sorted(self.pending, key=lambda j: j.work, reverse=True):
+            candidates = [s for s in servers if s.url not in job.excluded] or servers
+            best = min(candidates, key=lambda s: finish_at[s.url] + self.predict_seconds(s, job))
+            finish_at[best.url] += self.predict_seconds(best, job)
+            if slots[best.url] > 0:
+                slots[best.url] -= 1
+                assignments.append((job, best))
+
+        for job, server in assignments:
+            self.pending.remove(job)
+            job.attempts += 1
+            if not server.in_flight:
+                server.busy_since = now
+            server.in_flight[job.key] = self.predict_seconds(server, job)
+        return assignments
+
+    def attach(self, key: Tuple, url: str, now: Optional[float] = None) -> Optional[ServerState]:
+        """把上次运行时已提交到指定服务器的任务直接记为在该服务器上进行中（用于重新连接）"""
+        now = time.monotonic() if now is None else now
+        server = next((s for s in self.servers if s.url == url), None)
+        job = self.jobs.get(key)
+        if server is None or job is None or job not in self.pending:
+            return None
+        self.pending.remove(job)
+        job.attempts += 1
+        if not server.in_flight:
+            server.busy_since = now
+        server.in_flight[job.key] = self.predict_seconds(server, job)
+        return server
+
+    def update_loads(self, loads: Dict[str, ServerLoad], now: Optional[float] = None):
+        """应用健康检查（/queue 查询）结果：无法访问的服务器熔断，冷却后恢复访问的服务器进入试探状态"""
+        now = time.monotonic() if now is None else now
+        for server in self.servers:
+            load = loads.get(server.url)
+            if load is None:
+                continue
+            server.latency_ms = load.latency_ms
+            if not load.reachable:
+                server.failures += 1
+                self._trip(server, load.error or "无法访问", now)
+            else:
+                if server.state == BREAKER_OPEN and now - server.opened_at >= self._cooldown(server):
+                    server.state = BREAKER_HALF_OPEN
+                    logger.info(f"服务器 {server.name} 已可访问，试探提交一个任务")
+                server.vram_free, server.vram_total = load.vram_free, load.vram_total
+                # 我们自己提交的任务也在服务器队列中
+                queued = load.queue_running + load.queue_pending
+                server.external_jobs = max(0, queued - len(server.in_flight))
+            self._persist(server)
+
+    def job_finished(self, key: Tuple, success: bool, queued_at: Optional[float] = None,
+                     execution_seconds: Optional[float] = None, now: Optional[float] = None,
+                     server_fault: bool = False, retryable: bool = False,
+                     error: Optional[str] = None) -> bool:
+        """
+        记录任务结束，学习服务器速度并更新熔断状态
+
+        Args:
+            queued_at: 任务提交到服务器队列的时间（time.monotonic）
+            execution_seconds: 服务器报告的实际执行时长；没有时用
+                “完成时间 - max(提交时间, 该服务器上一个任务完成时间)” 估算
+            server_fault: 失败是否由服务器引起（连接失败、超时、服务器重启等），计入熔断
+            retryable: 失败的任务能否换一台服务器重试
+
+        Returns:
+            bool: 失败的任务是否已重新排队
+        """
+        now = time.monotonic() if now is None else now
+        server = next((s for s in self.servers if key in s.in_flight), None)
+        if server is None:
+            return False
+        server.in_flight.pop(key, None)
+        job = self.jobs.get(key)
+
+        requeued = False
+        if success:
+            if server.state == BREAKER_HALF_OPEN:
+                logger.info(f"服务器 {server.name} 已恢复")
+            server.state = BREAKER_CLOSED
+            server.failures = 0
+            server.open_count = 0
+            self._persist(server)
+        else:
+            if server_fault:
+                server.failures += 1
+                server.last_error = error
+                if server.state == BREAKER_HALF_OPEN or server.failures >= JOB_FAILURE_THRESHOLD:
+                    self._trip(server, error, now)
+                self._persist(server)
+            if job and retryable and job.attempts < MAX_JOB_ATTEMPTS:
+                job.excluded.add(server.url)
+                self.pending.append(job)
+                requeued = True
+                logger.info(f"任务重新排队（第{job.attempts + 1}次尝试）: {job.path} - {error}")
+
+        if success and job and job.work > 0:
+            seconds = execution_seconds
+            if not seconds and queued_at is not None:
+                seconds = now - max(queued_at, server.last_finished_at)
+            if seconds and seconds > 0:
+                sample = seconds / job.work
+                old = server.seconds_per_mpf
+                server.seconds_per_mpf = sample if not old else old + SPEED_EMA_ALPHA * (sample - old)
+                logger.info(
+                    f"服务器 {server.name} 速度: {sample:.4f} 秒/百万像素帧"
+                    f"（平均 {server.seconds_per_mpf:.4f}，任务 {job.work:.0f} 百万像素帧用时 {seconds:.1f}s）"
+                )
+                if server.id is not None:
+                    db_manager.update_upscale_server_speed(server.id, server.seconds_per_mpf, wait=False)
+
+        server.last_finished_at = now
+        server.busy_since = now
+        return requeued
@@ -0,0 +1,183 @@
+"""
+视频分析前的本地预处理
+
+分析接口只需要“看懂”视频内容（画面 + 旁白/对白/音乐），不需要原始画质。
+上传前用随包提供的 imageio_ffmpeg 把视频转码为低分辨率、低帧率、低码率的代理文件
+（保留单声道音轨，分析仍可识别旁白和音乐），原文件保持不变：
+- 超过上传上限（20MB）的长视频也可以分析，码率按时长自动下调以保证代理文件不超限
+- 普通视频的上传体积通常降到原来的几分之一，上传耗时随之下降
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+from loguru import logger
+
+from database_manager import db_manager
+from utils.ffmpeg_jobs import FfmpegCancelled, FfmpegError, probe_duration, run_ffmpeg
+from utils.file_upload import UploadCancelled
+from utils.file_utils import prune_directory
+
+# 分析接口接受的最大上传文件大小
+MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+DEFAULT_PROXY_HEIGHT = 480
+PROXY_FPS = 12
+PROXY_VIDEO_BITRATE = 600  # kbps
+PROXY_AUDIO_BITRATE = 48  # kbps
+# 码率低于该值时画面已难以辨认，视为视频过长
+MIN_VIDEO_BITRATE = 80  # kbps
+
+# 小于该大小的视频直接上传原文件，转码收益不大
+SKIP_BELOW_BYTES = 2 * 1024 * 1024
+
+# 代理视频目录的清理策略：超过保留天数或总大小超限时删除最久未使用的文件
+CACHE_MAX_AGE_SECONDS = 7 * 24 * 3600
+CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
+
+_prune_lock = threading.Lock()
+_pruned = False
+
+
+class VideoProxyError(RuntimeError):
+    """代理视频生成失败"""
+
+
+def _output_dir() -> Path:
+    global _pruned
+    path = Path(tempfile.gettempdir()) / 'sora2_analysis_proxies'
+    path.mkdir(parents=True, exist_ok=True)
+    # 每次运行第一次使用时清理一次（在分析线程中执行）
+    with _prune_lock:
+        if not _pruned:
+            _pruned = True
+            removed = prune_directory(path, CACHE_MAX_AGE_SECONDS, CACHE_MAX_BYTES)
+            if removed:
+                logger.info(f"已清理 {removed} 个过期的分析代理视频")
+    return path
+
+
+def make_analysis_proxy(file_path: str, max_height: int = DEFAULT_PROXY_HEIGHT,
+                        max_bytes: int = MAX_UPLOAD_BYTES,
+                        cancelled: Optional[Callable[[], bool]] = None) -> str:
+    """
+    转码生成用于分析的代理视频
+
+    Args:
+        file_path: 原视频路径（不会被修改）
+        max_height: 代理视频的最大高度（像素）
+        max_bytes: 代理视频的大小上限
+        cancelled: 取消检查，转码期间定期调用，返回 True 时终止 ffmpeg 并抛出 UploadCancelled
+
+    Returns:
+        str: 代理视频路径（同一视频、同一设置复用已生成的文件）
+
+    Raises:
+        VideoProxyError: 视频过长或转码失败
+    """
+    src = Path(file_path)
+    stat = src.stat()
+    duration = probe_duration(file_path)
+    if not duration:
+        raise VideoProxyError("无法读取视频时长")
+
+    # 按时长计算码率，预留 10% 给容器开销
+    budget_kbps = max_bytes * 8 * 0.9 / 1000 / duration
+    video_kbps = int(min(PROXY_VIDEO_BITRATE, budget_kbps - PROXY_AUDIO_BITRATE))
+    if video_kbps < MIN_VIDEO_BITRATE:
+        raise VideoProxyError(f"视频时长 {duration:.0f} 秒过长，无法压缩到上传上限以内")
+
+    key = hashlib.sha1(
+        f"{src.resolve()}|{stat.st_mtime_ns}|{stat.st_size}|{max_height}|{video_kbps}".encode('utf-8')
+    ).hexdigest()
+    out_path = _output_dir() / f"{key}.mp4"
+    if out_path.exists():
+        # 更新修改时间，清理时按最近使用保留
+        os.utime(out_path)
+        return str(out_path)
+
+    tmp_path = out_path.with_name(out_path.stem + '.part.mp4')
+    args = [
+        "-loglevel", "error",
+        "-y",
+        "-i", file_path,
+        "-vf", f"scale=-2:'min({int(max_height)},ih)',fps={PROXY_FPS}",
+        "-c:v", "libx264",
+        "-preset", "veryfast",
+        "-b:v", f"{video_kbps}k",
+        "-maxrate", f"{video_kbps}k",
+        "-bufsize", f"{video_kbps * 2}k",
+        "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        "-ac", "1",
+        "-b:a", f"{PROXY_AUDIO_BITRATE}k",
+        "-movflags", "+faststart",
+        str(tmp_path)
+    ]
+
+    started = time.monotonic()
+    try:
+        run_ffmpeg(args, cancelled=cancelled)
+    except FfmpegCancelled:
+        tmp_path.unlink(missing_ok=True)
+        raise UploadCancelled()
+    except FfmpegError as e:
+        tmp_path.unlink(missing_ok=True)
+        raise VideoProxyError(f"转码失败: {e}")
+
+    out_size = tmp_path.stat().st_size
+    if out_size > max_bytes:
+        tmp_path.unlink(missing_ok=True)
+        raise VideoProxyError(f"代理视频仍超过上传上限（{out_size // 1024 // 1024}MB）")
+    os.replace(tmp_path, out_path)
+
+    logger.info(
+        f"已生成分析代理视频: {src.name} {stat.st_size // 1024}KB -> {out_size // 1024}KB "
+        f"({duration:.0f}s, {video_kbps}kbps, 耗时 {time.monotonic() - started:.1f}s)"
+    )
+    return str(out_path)
+
+
+def proxy_enabled() -> bool:
+    return bool(db_manager.load_config('analysis_proxy_enabled', True))
+
+
+def check_analysis_size(file_size: int) -> Optional[str]:
+    """检查视频能否用于分析，返回错误信息，None 表示可以"""
+    if file_size > MAX_UPLOAD_BYTES and not proxy_enabled():
+        return "超过20MB限制（可在设置中开启“分析前压缩视频”）"
+    return None
+
+
+def prepare_analysis_video(file_path: str, cancelled: Optional[Callable[[], bool]] = None) -> str:
+    """
+    按配置决定是否生成代理视频，返回实际要上传的文件路径
+
+    未开启代理时，超过上传上限的视频直接报错；代理失败但原文件未超限时退回上传原文件。
+    """
+    size = os.path.getsize(file_path)
+    if not proxy_enabled():
+        if size > MAX_UPLOAD_BYTES:
+            raise VideoProxyError("视频超过20MB限制")
+        return file_path
+    if size < SKIP_BELOW_BYTES:
+        return file_path
+
+    try:
+        max_height = int(db_manager.load_config('analysis_proxy_height', DEFAULT_PROXY_HEIGHT))
+    except (TypeError, ValueError):
+        max_height = DEFAULT_PROXY_HEIGHT
+    try:
+        proxy_path = make_analysis_proxy(file_path, max_height, cancelled=cancelled)
+    except VideoProxyError as e:
+        if size > MAX_UPLOAD_BYTES:
+            raise
+        logger.warning(f"生成代理视频失败，上传原视频: {file_path} - {e}")
+        return file_path
+    # 原视频本身已足够小时不使用更大的代理文件
+    return proxy_path if os.path.getsize(proxy_path) < size else file_path
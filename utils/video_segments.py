@@ -0,0 +1,144 @@
+"""
+长视频分段并行放大
+
+- 按关键帧把视频切成若干段（直接复制码流，不重新编码），每段可交给不同的服务器放大
+- 只在封闭 GOP 的关键帧处切分，保证每段都能独立解码、各段帧数之和等于原视频帧数
+- 放大后的各段按顺序无损拼接（concat 复制码流），再复制原视频的音轨，保证音画同步
+"""
+
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from loguru import logger
+
+from utils.ffmpeg_jobs import FfmpegError, probe_duration, run_ffmpeg
+from utils.video_trim import VideoStreamInfo, probe_video_stream
+
+# 每段最短时长（秒）：分段过短时模型预热与上传下载的开销超过并行收益
+SEGMENT_MIN_SECONDS = 5.0
+
+
+@dataclass
+class VideoSegment:
+    index: int
+    path: str
+    start_seconds: float
+    frames: int
+
+
+def _closed_gop_keyframes(info: VideoStreamInfo) -> List[int]:
+    """可以切分的关键帧（数据包下标）：之后解码的帧不引用前一个 GOP"""
+    points = []
+    for i, packet in enumerate(info.packets[1:], start=1):
+        if not packet.key:
+            continue
+        if any(p.pts < packet.pts for p in info.packets[i + 1:i + 32]):
+            continue
+        if any(p.pts >= packet.pts for p in info.packets[max(0, i - 32):i]):
+            continue
+        points.append(i)
+    return points
+
+
+def plan_cuts(info: VideoStreamInfo, segments: int, fps: float) -> List[int]:
+    """选择切分点（数据包下标）：各段帧数尽量相等，且每段不短于 SEGMENT_MIN_SECONDS"""
+    total = len(info.packets)
+    min_frames = max(1, int(SEGMENT_MIN_SECONDS * fps))
+    candidates = _closed_gop_keyframes(info)
+    cuts = []
+    for k in range(1, segments):
+        target = total * k / segments
+        previous = cuts[-1] if cuts else 0
+        usable = [c for c in candidates if c - previous >= min_frames and total - c >= min_frames]
+        if not usable:
+            break
+        best = min(usable, key=lambda c: abs(c - target))
+        if best not in cuts:
+            cuts.append(best)
+    return sorted(cuts)
+
+
+def split_video(file_path: str, segments: int, fps: float, work_dir: Optional[str] = None,
+                cancelled: Optional[Callable[[], bool]] = None) -> List[VideoSegment]:
+    """
+    按关键帧把视频切成最多 segments 段，返回各段信息；无法切分时返回空列表
+
+    各段写入 work_dir（默认新建临时目录），由调用方在处理完成后删除。
+    """
+    info = probe_video_stream(file_path)
+    if not info or segments < 2:
+        return []
+    cuts = plan_cuts(info, segments, fps)
+    if not cuts:
+        return []
+
+    start_pts = info.packets[0].pts
+    # 切分时间取关键帧时间减半帧，避免浮点误差导致切到下一个关键帧
+    half_frame = 0.5 / fps if fps else 0.0
+    times = [float((info.packets[c].pts - start_pts) * info.time_base) for c in cuts]
+
+    work_dir = work_dir or tempfile.mkdtemp(prefix='upscale_segments_')
+    os.makedirs(work_dir, exist_ok=True)
+    pattern = os.path.join(work_dir, 'seg_%03d.mp4')
+    run_ffmpeg([
+        "-loglevel", "error", "-y",
+        "-i", file_path,
+        "-map", "0:v:0", "-map", "0:a?",
+        "-c", "copy",
+        "-f", "segment",
+        "-segment_times", ",".join(f"{max(0.0, t - half_frame):.6f}" for t in times),
+        "-reset_timestamps", "1",
+        pattern
+    ], cancelled=cancelled)
+
+    bounds = [0] + cuts + [len(info.packets)]
+    result = []
+    for i in range(len(bounds) - 1):
+        path = pattern % i
+        if not os.path.exists(path):
+            raise FfmpegError(f"分段文件缺失: {path}")
+        frames = bounds[i + 1] - bounds[i]
+        actual = probe_video_stream(path)
+        if not actual or len(actual.packets) != frames:
+            raise FfmpegError(f"分段帧数不符: 第{i + 1}段期望 {frames} 帧")
+        start = float((info.packets[bounds[i]].pts - start_pts) * info.time_base)
+        result.append(VideoSegment(i, path, start, frames))
+    logger.info(f"视频已切分为 {len(result)} 段: {file_path} (切分点 {', '.join(f'{t:.2f}s' for t in times)})")
+    return result
+
+
+def concat_segments(segment_paths: List[str], source_path: str, out_path: str,
+                    cancelled: Optional[Callable[[], bool]] = None):
+    """
+    按顺序无损拼接放大后的各段，并复制原视频的音轨
+
+    先写入 out_path 同目录的临时文件，完成后再替换目标文件。
+    """
+    work_dir = tempfile.mkdtemp(prefix='upscale_concat_', dir=os.path.dirname(out_path) or None)
+    list_file = os.path.join(work_dir, 'list.txt')
+    tmp_out = os.path.join(work_dir, 'merged' + os.path.splitext(out_path)[1])
+    try:
+        with open(list_file, 'w', encoding='utf-8') as f:
+            f.write("ffconcat version 1.0\n")
+            for path in segment_paths:
+                f.write("file '" + os.path.abspath(path).replace("'", "'\\''") + "'\n")
+        run_ffmpeg([
+            "-loglevel", "error", "-y",
+            "-f", "concat", "-safe", "0", "-i", list_file,
+            "-i", source_path,
+            "-map", "0:v:0", "-map", "1:a?",
+            "-c", "copy",
+            "-movflags", "+faststart",
+            tmp_out
+        ], cancelled=cancelled)
+
+        expected = probe_duration(source_path)
+        actual = probe_duration(tmp_out)
+        if expected and actual and abs(expected - actual) > 1.0:
+            logger.warning(f"拼接后时长与原视频不一致: {actual:.2f}s / {expected:.2f}s - {out_path}")
+        os.replace(tmp_out, out_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
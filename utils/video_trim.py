@@ -0,0 +1,246 @@
+"""
+去除视频首帧
+
+优先使用“智能剪切”：只重新编码第一个 GOP（首个关键帧到第二个关键帧之间的画面），
+其余部分直接复制码流后拼接，音频原样复制；处理时间与视频长度基本无关，画质也不损失。
+无法智能剪切时（非 H.264、只有一个关键帧、首个 GOP 过长、开放式 GOP 等）
+退回整段重新编码（veryfast 预设）。
+"""
+
+import os
+import re
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Callable, List, Optional
+
+from loguru import logger
+
+from utils.ffmpeg_jobs import FfmpegCancelled, FfmpegError, ffmpeg_exe, probe_duration, run_ffmpeg
+
+FractionCallback = Callable[[float], None]
+CancelCheck = Callable[[], bool]
+
+# 首个 GOP 超过总时长的该比例时，智能剪切的收益不大，直接整段编码
+SMART_CUT_MAX_GOP_RATIO = 0.5
+
+DEFAULT_PRESET = 'veryfast'
+
+_STREAM_RE = re.compile(r"Stream #0:\d+.*?: Video: (\w+).*?, (yuv\w+|nv12|gray\w*)")
+_TB_RE = re.compile(r"^#tb 0: (\d+)/(\d+)", re.MULTILINE)
+
+
+@dataclass
+class Packet:
+    dts: int
+    pts: int
+    duration: int
+    key: bool
+
+
+@dataclass
+class VideoStreamInfo:
+    codec: str
+    pix_fmt: str
+    time_base: Fraction
+    packets: List[Packet]
+
+
+def probe_video_stream(file_path: str) -> Optional[VideoStreamInfo]:
+    """读取首个视频流的编码、像素格式与全部数据包（复制码流，不解码，速度很快）"""
+    header = subprocess.run(
+        [ffmpeg_exe(), "-hide_banner", "-i", file_path],
+        capture_output=True, text=True, errors='replace', timeout=30
+    ).stderr or ''
+    stream = _STREAM_RE.search(header)
+    if not stream:
+        return None
+
+    proc = subprocess.run(
+        [ffmpeg_exe(), "-hide_banner", "-v", "error", "-i", file_path,
+         "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"],
+        capture_output=True, text=True, errors='replace', timeout=120
+    )
+    if proc.returncode != 0:
+        return None
+    tb = _TB_RE.search(proc.stdout)
+    if not tb:
+        return None
+
+    packets = []
+    for line in proc.stdout.splitlines():
+        if not line or line.startswith('#'):
+            continue
+        fields = [f.strip() for f in line.split(',')]
+        try:
+            # stream, dts, pts, duration, size, checksum[, F=flags]；未标注 F= 的是关键帧
+            packets.append(Packet(int(fields[1]), int(fields[2]), int(fields[3]),
+                                  not any(f.startswith('F=') for f in fields[6:])))
+        except (IndexError, ValueError):
+            return None
+    return VideoStreamInfo(stream.group(1), stream.group(2), Fraction(int(tb.group(1)), int(tb.group(2))), packets)
+
+
+def _smart_cut_point(info: VideoStreamInfo) -> Optional[int]:
+    """返回第二个关键帧在数据包列表中的下标；不满足智能剪切条件时返回 None"""
+    if info.codec != 'h264' or len(info.packets) < 3 or not info.packets[0].key:
+        return None
+    cut = next((i for i in range(1, len(info.packets)) if info.packets[i].key), None)
+    if cut is None:
+        return None
+    cut_pts = info.packets[cut].pts
+    # 开放式 GOP：关键帧之后解码的帧若显示时间更早，会引用前一个 GOP，不能从这里直接复制
+    if any(p.pts < cut_pts for p in info.packets[cut + 1:cut + 32]):
+        return None
+    # 关键帧之前的帧若显示时间更晚，说明时间轴交错，同样无法干净切开
+    if any(p.pts >= cut_pts for p in info.packets[:cut]):
+        return None
+    last = info.packets[-1]
+    total = last.pts + last.duration - info.packets[0].pts
+    if total <= 0 or (cut_pts - info.packets[0].pts) > total * SMART_CUT_MAX_GOP_RATIO:
+        return None
+    return cut
+
+
+def _concat_path(path: str) -> str:
+    """ffconcat 列表中的路径：单引号需转义"""
+    return path.replace("'", "'\\''")
+
+
+def _count_video_packets(file_path: str) -> int:
+    info = probe_video_stream(file_path)
+    return len(info.packets) if info else -1
+
+
+def _smart_cut(file_path: str, out_path: str, info: VideoStreamInfo, cut: int, threads: int, preset: str,
+               progress: Optional[FractionCallback], cancelled: Optional[CancelCheck]):
+    start_pts = info.packets[0].pts
+    cut_seconds = float((info.packets[cut].pts - start_pts) * info.time_base)
+    # 第一段保留第 1..cut-1 帧，时长按数据包时长累加
+    head_seconds = float(sum(p.duration for p in info.packets[1:cut]) * info.time_base)
+
+    work_dir = tempfile.mkdtemp(prefix='first_frame_', dir=os.path.dirname(out_path) or None)
+    head_mkv = os.path.join(work_dir, 'head.mkv')
+    tail_mkv = os.path.join(work_dir, 'tail.mkv')
+    list_file = os.path.join(work_dir, 'list.txt')
+    try:
+        # 1. 重新编码第一个 GOP（去掉第 0 帧，按帧数截止）
+        run_ffmpeg([
+            "-loglevel", "error", "-y",
+            "-i", file_path,
+            "-map", "0:v:0",
+            "-vf", "select='not(eq(n,0))',setpts=PTS-STARTPTS",
+            "-fps_mode", "passthrough",
+            "-frames:v", str(cut - 1),
+            "-an",
+            "-c:v", "libx264", "-preset", preset, "-crf", "18",
+            "-pix_fmt", info.pix_fmt,
+            "-threads", str(threads),
+            head_mkv
+        ], duration=cut_seconds,
+            progress=(lambda f: progress(f * 0.5)) if progress else None,
+            cancelled=cancelled)
+
+        # 2. 从第二个关键帧开始直接复制视频码流
+        run_ffmpeg([
+            "-loglevel", "error", "-y",
+            "-ss", f"{cut_seconds:.6f}",
+            "-i", file_path,
+            "-map", "0:v:0", "-c", "copy",
+            tail_mkv
+        ], cancelled=cancelled)
+        if progress:
+            progress(0.7)
+
+        # 3. 拼接两段视频（两段的编码参数集不同，由 concat 按段切换），并原样复制原文件的音频
+        with open(list_file, 'w', encoding='utf-8') as f:
+            f.write("ffconcat version 1.0\n")
+            f.write(f"file '{_concat_path(head_mkv)}'\nduration {head_seconds:.6f}\n")
+            f.write(f"file '{_concat_path(tail_mkv)}'\n")
+        run_ffmpeg([
+            "-loglevel", "error", "-y",
+            "-f", "concat", "-safe", "0", "-i", list_file,
+            "-i", file_path,
+            "-map", "0:v:0", "-map", "1:a?",
+            "-c", "copy",
+            "-movflags", "+faststart",
+            out_path
+        ], cancelled=cancelled)
+
+        # 校验：视频帧数应正好少一帧，且拼接处可正常解码
+        expected = len(info.packets) - 1
+        actual = _count_video_packets(out_path)
+        if actual != expected:
+            raise FfmpegError(f"智能剪切帧数不符: 期望 {expected}，实际 {actual}")
+        check_from = max(0.0, head_seconds - 1.0)
+        run_ffmpeg([
+            "-v", "error", "-xerror",
+            "-ss", f"{check_from:.3f}", "-i", out_path,
+            "-t", "2", "-map", "0:v:0", "-f", "null", "-"
+        ], cancelled=cancelled)
+    finally:
+        for path in (head_mkv, tail_mkv, list_file):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        try:
+            os.rmdir(work_dir)
+        except OSError:
+            pass
+
+
+def _full_encode(file_path: str, out_path: str, threads: int, preset: str,
+                 progress: Optional[FractionCallback], cancelled: Optional[CancelCheck]):
+    run_ffmpeg([
+        "-loglevel", "error", "-y",
+        "-i", file_path,
+        "-vf", "select='not(eq(n,0))',setpts=PTS-STARTPTS",
+        "-af", "asetpts=PTS-STARTPTS",
+        "-fps_mode", "passthrough",
+        "-c:v", "libx264", "-preset", preset,
+        "-threads", str(threads),
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+        out_path
+    ], duration=probe_duration(file_path), progress=progress, cancelled=cancelled)
+
+
+def remove_first_frame(file_path: str, out_path: str, threads: int = 2,
+                       progress: Optional[FractionCallback] = None,
+                       cancelled: Optional[CancelCheck] = None,
+                       preset: str = DEFAULT_PRESET, smart_cut: bool = True) -> str:
+    """
+    去除视频首帧并写入 out_path（原文件不变）
+
+    Args:
+        preset: libx264 编码预设
+        smart_cut: False 时总是整段重新编码
+
+    Returns:
+        str: 实际使用的方式，'smart'（智能剪切）或 'encode'（整段重新编码）
+
+    Raises:
+        FfmpegCancelled: 任务被取消
+        FfmpegError: 处理失败
+    """
+    info = None
+    if smart_cut:
+        try:
+            info = probe_video_stream(file_path)
+        except Exception as e:
+            logger.warning(f"读取视频码流信息失败，改为整段编码: {file_path} - {e}")
+
+    cut = _smart_cut_point(info) if info else None
+    if cut is not None:
+        try:
+            _smart_cut(file_path, out_path, info, cut, threads, preset, progress, cancelled)
+            return 'smart'
+        except FfmpegCancelled:
+            raise
+        except Exception as e:
+            logger.warning(f"智能剪切失败，改为整段编码: {file_path} - {e}")
+
+    _full_encode(file_path, out_path, threads, preset, progress, cancelled)
+    return 'encode'
@@ -0,0 +1,180 @@
+"""
+ComfyUI 工作流模板注册表
+
+- 模板在首次使用时读取并解析一次，之后每个任务只深拷贝已解析的工作流
+- 每个模板（ComfyUI 导出的 API 格式 JSON）旁边放一个同名的 .mapping.json，
+  声明视频、输出文件名前缀等参数分别对应哪个节点的哪个输入，加载时逐项校验
+- 内置模板为程序目录下的 sora2_up.json；用户可以把其他工作流（不同的放大模型、补帧等）
+  放到数据目录的 workflows 文件夹中，处理前按批次选择
+
+映射文件格式:
+    {
+      "title": "显示名称",
+      "inputs": {"video": ["14", "video"], "filename_prefix": ["12", "filename_prefix"], ...},
+      "output_node": "12"
+    }
+"""
+
+import copy
+import json
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from database_manager import db_manager
+
+# 内置模板名称（文件名去掉扩展名）
+DEFAULT_WORKFLOW = 'sora2_up'
+MAPPING_SUFFIX = '.mapping.json'
+# 模板必须声明的参数
+REQUIRED_INPUTS = ('video', 'filename_prefix')
+# 可选参数：模板未声明时忽略对应设置
+OPTIONAL_INPUTS = ('mode', 'scale', 'frame_rate')
+
+
+class WorkflowTemplateError(RuntimeError):
+    """模板缺失或映射与工作流不匹配"""
+
+
+@dataclass
+class WorkflowTemplate:
+    name: str
+    title: str
+    path: str
+    workflow: Dict[str, Any]
+    inputs: Dict[str, Tuple[str, str]]  # 参数 -> (节点ID, 输入名)
+    output_node: Optional[str] = None
+
+    def supports(self, role: str) -> bool:
+        return role in self.inputs
+
+    def build(self, **values) -> Dict[str, Any]:
+        """深拷贝工作流并填入参数；值为 None 或模板未声明的可选参数会被忽略"""
+        workflow = copy.deepcopy(self.workflow)
+        for role, value in values.items():
+            if value is None:
+                continue
+            target = self.inputs.get(role)
+            if target is None:
+                if role in REQUIRED_INPUTS:
+                    raise WorkflowTemplateError(f"工作流 {self.title} 未声明参数: {role}")
+                continue
+            node_id, input_name = target
+            workflow[node_id]["inputs"][input_name] = value
+        return workflow
+
+
+def _read_json(path: Path) -> Any:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_template(path: Path) -> WorkflowTemplate:
+    """读取模板与映射文件，并校验映射中的节点与输入都存在"""
+    name = path.name[:-len('.json')]
+    mapping_path = path.with_name(name + MAPPING_SUFFIX)
+    if not mapping_path.exists():
+        raise WorkflowTemplateError(f"缺少映射文件: {mapping_path.name}")
+    try:
+        workflow = _read_json(path)
+        mapping = _read_json(mapping_path)
+    except (OSError, ValueError) as e:
+        raise WorkflowTemplateError(f"读取失败: {e}")
+    if not isinstance(workflow, dict) or not all(isinstance(n, dict) and 'inputs' in n for n in workflow.values()):
+        raise WorkflowTemplateError("不是 ComfyUI API 格式的工作流（请在 ComfyUI 中使用“导出(API)”）")
+
+    inputs = {}
+    for role, target in (mapping.get('inputs') or {}).items():
+        if role not in REQUIRED_INPUTS + OPTIONAL_INPUTS:
+            raise WorkflowTemplateError(f"未知参数: {role}")
+        if not isinstance(target, (list, tuple)) or len(target) != 2:
+            raise WorkflowTemplateError(f"参数 {role} 的映射应为 [节点ID, 输入名]")
+        node_id, input_name = str(target[0]), str(target[1])
+        node = workflow.get(node_id)
+        if node is None:
+            raise WorkflowTemplateError(f"参数 {role} 指向的节点 {node_id} 不存在")
+        if input_name not in node['inputs']:
+            raise WorkflowTemplateError(f"节点 {node_id}（{node.get('class_type', '')}）没有输入 {input_name}")
+        inputs[role] = (node_id, input_name)
+    missing = [role for role in REQUIRED_INPUTS if role not in inputs]
+    if missing:
+        raise WorkflowTemplateError(f"映射缺少必需参数: {', '.join(missing)}")
+
+    output_node = mapping.get('output_node')
+    if output_node is not None:
+        output_node = str(output_node)
+        if output_node not in workflow:
+            raise WorkflowTemplateError(f"输出节点 {output_node} 不存在")
+    return WorkflowTemplate(
+        name=name,
+        title=mapping.get('title') or name,
+        path=str(path),
+        workflow=workflow,
+        inputs=inputs,
+        output_node=output_node,
+    )
+
+
+class WorkflowRegistry:
+    """加载并缓存所有工作流模板"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._templates: Dict[str, WorkflowTemplate] = {}
+        self.errors: Dict[str, str] = {}  # 文件名 -> 加载失败原因
+        self._loaded = False
+
+    @staticmethod
+    def builtin_path() -> Path:
+        return Path(__file__).parent.parent / f"{DEFAULT_WORKFLOW}.json"
+
+    @staticmethod
+    def user_dir() -> Path:
+        return Path(db_manager.app_data_dir) / 'workflows'
+
+    def load(self, reload: bool = False):
+        """读取内置模板与用户模板目录（只读取一次，reload=True 时重新读取）"""
+        with self._lock:
+            if self._loaded and not reload:
+                return
+            paths = [self.builtin_path()]
+            user_dir = self.user_dir()
+            if user_dir.is_dir():
+                paths += sorted(p for p in user_dir.glob('*.json') if not p.name.endswith(MAPPING_SUFFIX))
+
+            templates, errors = {}, {}
+            for path in paths:
+                try:
+                    template = load_template(path)
+                except WorkflowTemplateError as e:
+                    errors[path.name] = str(e)
+                    logger.error(f"工作流模板无效，已忽略: {path} - {e}")
+                    continue
+                if template.name in templates:
+                    errors[path.name] = "与已有模板重名"
+                    logger.warning(f"工作流模板重名，已忽略: {path}")
+                    continue
+                templates[template.name] = template
+            self._templates, self.errors = templates, errors
+            self._loaded = True
+            logger.info(f"已加载 {len(templates)} 个工作流模板: {', '.join(templates)}")
+
+    def templates(self) -> List[WorkflowTemplate]:
+        self.load()
+        return list(self._templates.values())
+
+    def get(self, name: Optional[str] = None) -> WorkflowTemplate:
+        """按名称获取模板，未指定时返回内置模板"""
+        self.load()
+        name = name or DEFAULT_WORKFLOW
+        template = self._templates.get(name)
+        if template is None:
+            reason = self.errors.get(f"{name}.json")
+            raise WorkflowTemplateError(f"工作流模板 {name} 不可用" + (f": {reason}" if reason else ""))
+        return template
+
+
+workflow_registry = WorkflowRegistry()